@@ -0,0 +1,34 @@
+import argparse
+import asyncio
+from database import connect_to_mongo, close_mongo_connection
+from services.achievement_service import AchievementService
+
+def print_progress(progress):
+    print(f"{progress['users']} users, {progress['exercises']} exercises "
+          f"({progress['exercises_per_second']:.0f}/s), {progress['skipped']} skipped, {progress['awarded']} awarded, "
+          f"{progress['tagged']} tagged, {progress['merged']} merged; checkpoint {progress['last_user_id']}")
+
+async def backfill(users_per_chunk, batch_size, restart):
+    await connect_to_mongo()
+    try:
+        achievement_service = AchievementService()
+        stats = await achievement_service.backfill_achievements(
+            users_per_chunk=users_per_chunk,
+            batch_size=batch_size,
+            restart=restart,
+            on_progress=print_progress
+        )
+        resumed = f" (resumed after {stats['resumed_after']})" if stats["resumed_after"] is not None else ""
+        print(f"Backfilled achievements for {stats['users']} users{resumed} in {stats['elapsed_seconds']:.1f}s: "
+              f"{stats['awarded']} awarded, {stats['tagged']} legacy awards tagged, {stats['merged']} duplicates removed, "
+              f"{stats['skipped']} exercises with unparseable timestamps skipped")
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute achievement counters and award missing achievements")
+    parser.add_argument("--users-per-chunk", type=int, default=500, help="Users written per bulk write")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Cursor batch size")
+    parser.add_argument("--restart", action="store_true", help="Ignore the saved checkpoint and start over")
+    args = parser.parse_args()
+    asyncio.run(backfill(args.users_per_chunk, args.batch_size, args.restart))
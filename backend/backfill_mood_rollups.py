@@ -0,0 +1,19 @@
+import argparse
+import asyncio
+from database import connect_to_mongo, close_mongo_connection
+from services.mood_service import MoodService
+
+async def backfill(user_id=None):
+    await connect_to_mongo()
+    try:
+        mood_service = MoodService()
+        await mood_service.backfill_daily_rollups(user_id)
+        print("Daily mood rollups backfilled successfully!")
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the mood_daily rollups from mood_history")
+    parser.add_argument("--user-id", help="Only backfill rollups for this user")
+    args = parser.parse_args()
+    asyncio.run(backfill(args.user_id))
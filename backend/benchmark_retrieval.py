@@ -0,0 +1,71 @@
+import argparse
+import logging
+import random
+import time
+import numpy as np
+from services.retrieval_service import CHROMA_PERSIST_DIRECTORY
+from services.vector_index import LocalIndexStore, open_collection
+
+logging.basicConfig(level=logging.INFO)
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+def load_queries(path, exact, sample, seed):
+    """Embed the queries in a file (one per line), or sample stored chunk vectors."""
+    if path:
+        from services.embeddings import get_embeddings
+        with open(path) as f:
+            texts = [line.strip() for line in f if line.strip()]
+        embeddings = get_embeddings()
+        return np.asarray([embeddings.embed_query(text) for text in texts], dtype=np.float32)
+    rows = random.Random(seed).sample(range(len(exact)), min(sample, len(exact)))
+    return np.asarray(exact.vectors[sorted(rows)], dtype=np.float32)
+
+def benchmark(persist_dir, queries_path, sample, k, seed):
+    collection = open_collection(persist_dir)
+    store = LocalIndexStore(persist_dir, collection)
+
+    backends = []
+    for name in ("numpy", "chroma", "hnsw"):
+        started_at = time.perf_counter()
+        backend = store.load(name)
+        if backend.name != name:
+            print(f"Skipping {name}: not available")
+            continue
+        backends.append((backend, time.perf_counter() - started_at))
+
+    exact = backends[0][0]
+    queries = load_queries(queries_path, exact, sample, seed)
+    if not len(queries):
+        print("No vectors to query; ingest documents first")
+        return
+
+    # Exact brute-force results are the ground truth for recall
+    truth = [{id_ for id_, _, _ in results} for results in exact.search_batch(queries, k)]
+
+    print(f"\n{len(exact)} chunks, {len(queries)} queries, k={k}\n")
+    print(f"{'backend':<8} {'load_s':>8} {f'recall@{k}':>10} {'mean_ms':>9} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8}")
+    for backend, load_time in backends:
+        latencies = []
+        recall = 0.0
+        for query, expected in zip(queries, truth):
+            started_at = time.perf_counter()
+            results = backend.search(query, k)
+            latencies.append(1000 * (time.perf_counter() - started_at))
+            if expected:
+                recall += len(expected & {id_ for id_, _, _ in results}) / len(expected)
+        print(
+            f"{backend.name:<8} {load_time:>8.2f} {recall / len(queries):>10.3f} {float(np.mean(latencies)):>9.3f} "
+            f"{percentile(latencies, 50):>8.3f} {percentile(latencies, 95):>8.3f} {percentile(latencies, 99):>8.3f}"
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare recall@k and query latency of the vector backends")
+    parser.add_argument("--persist-dir", default=CHROMA_PERSIST_DIRECTORY, help="Chroma persist directory")
+    parser.add_argument("--queries", help="File with one query per line; defaults to sampling stored chunks")
+    parser.add_argument("--sample", type=int, default=200, help="Number of stored chunks to use as queries")
+    parser.add_argument("--k", type=int, default=4, help="Number of neighbours to retrieve")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for sampling queries")
+    args = parser.parse_args()
+    benchmark(args.persist_dir, args.queries, args.sample, args.k, args.seed)
@@ -3,6 +3,7 @@ from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
 import logging
 from typing import Optional
+from indexes import ensure_indexes
 
 # Load environment variables
 load_dotenv()
@@ -54,10 +55,8 @@ async def connect_to_mongo():
         chat_history = db.chat_history
         achievements = db.achievements
         
-        # Create indexes
-        await users.create_index("email", unique=True)
-        await chat_history.create_index([("user_id", 1), ("timestamp", -1)])
-        await mood_entries.create_index([("user_id", 1), ("timestamp", -1)])
+        # Create any declared index that is missing
+        await ensure_indexes(db)
         
         logger.info("Successfully connected to MongoDB")
         
@@ -0,0 +1,178 @@
+import logging
+from datetime import datetime
+from typing import Any, Dict, List
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Idempotency keys of events applied by /sync; entries saved directly have none
+_CLIENT_KEY = IndexModel(
+    [("user_id", ASCENDING), ("client_key", ASCENDING)],
+    unique=True,
+    partialFilterExpression={"client_key": {"$type": "string"}}
+)
+
+# Every index the services rely on, by collection. Names are left to pymongo's
+# default (e.g. user_id_1_timestamp_-1) so indexes created by earlier
+# releases are recognised instead of duplicated.
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True),
+    ],
+    "chat_history": [
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING)]),
+    ],
+    "chat_summaries": [
+        IndexModel([("user_id", ASCENDING)], unique=True),
+    ],
+    "mood_history": [
+        # History pages sort on (timestamp, _id); supersedes user_id_1_timestamp_-1
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)]),
+        _CLIENT_KEY,
+    ],
+    "mood_daily": [
+        IndexModel([("user_id", ASCENDING), ("day", ASCENDING)], unique=True),
+    ],
+    "progress": [
+        IndexModel([("user_id", ASCENDING), ("category", ASCENDING), ("timestamp", DESCENDING)]),
+        _CLIENT_KEY,
+    ],
+    "category_progress": [
+        IndexModel([("user_id", ASCENDING), ("category", ASCENDING)], unique=True),
+    ],
+    "exercises": [
+        IndexModel([("user_id", ASCENDING), ("timestamp", ASCENDING)]),
+        _CLIENT_KEY,
+    ],
+    "achievements": [
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING)]),
+        # Rule awards are unique per user; manually created achievements have no rule_id
+        IndexModel(
+            [("user_id", ASCENDING), ("rule_id", ASCENDING)],
+            unique=True,
+            partialFilterExpression={"rule_id": {"$type": "string"}}
+        ),
+    ],
+    "achievement_counters": [
+        IndexModel([("user_id", ASCENDING)], unique=True),
+    ],
+}
+
+
+def query_shapes() -> List[Dict[str, Any]]:
+    """The filters, sorts and pipelines the services run, with sample values, for explain()."""
+    user_id = ObjectId()
+    users = [ObjectId(), ObjectId()]
+    now = datetime.utcnow()
+    return [
+        {"name": "login", "collection": "users",
+         "filter": {"email": "someone@example.com", "user_type": "student"}},
+        {"name": "chat history", "collection": "chat_history",
+         "filter": {"user_id": user_id}, "sort": {"timestamp": -1}},
+        {"name": "chat summary", "collection": "chat_summaries",
+         "filter": {"user_id": user_id}},
+        {"name": "mood history page", "collection": "mood_history",
+         "filter": {"user_id": user_id, "$or": [
+             {"timestamp": {"$lt": now}}, {"timestamp": now, "_id": {"$lt": ObjectId()}}
+         ]}, "sort": {"timestamp": -1, "_id": -1}},
+        {"name": "dashboard recent moods", "collection": "mood_history", "pipeline": [
+            {"$match": {"user_id": {"$in": users}, "timestamp": {"$gte": now}}},
+            {"$sort": {"user_id": 1, "timestamp": -1}}
+        ]},
+        {"name": "daily mood rollups", "collection": "mood_daily",
+         "filter": {"user_id": user_id, "day": {"$gte": now}}, "sort": {"day": 1}},
+        {"name": "child progress", "collection": "progress",
+         "filter": {"user_id": user_id}},
+        {"name": "category totals fallback", "collection": "progress", "pipeline": [
+            {"$match": {"user_id": user_id, "category": "meditation"}},
+            {"$group": {"_id": None, "total_minutes": {"$sum": "$duration"}}}
+        ]},
+        {"name": "progress overview", "collection": "category_progress",
+         "filter": {"user_id": user_id}},
+        {"name": "category totals", "collection": "category_progress",
+         "filter": {"user_id": user_id, "category": "meditation"}},
+        {"name": "user exercises", "collection": "exercises",
+         "filter": {"user_id": user_id}, "sort": {"timestamp": -1}},
+        {"name": "achievement backfill", "collection": "exercises",
+         "filter": {"completed": True}, "sort": {"user_id": 1, "timestamp": 1}},
+        {"name": "user achievements", "collection": "achievements",
+         "filter": {"user_id": user_id}, "sort": {"timestamp": -1}},
+        {"name": "child category achievements", "collection": "achievements",
+         "filter": {"user_id": user_id, "category": "meditation"}},
+        {"name": "dashboard achievements", "collection": "achievements", "pipeline": [
+            {"$match": {"user_id": {"$in": users}}},
+            {"$group": {"_id": "$user_id", "total": {"$sum": 1}}}
+        ]},
+        {"name": "achievement counters", "collection": "achievement_counters",
+         "filter": {"user_id": user_id}},
+    ]
+
+
+async def ensure_indexes(db) -> Dict[str, List[str]]:
+    """
+    Create every declared index that does not exist yet; safe to run on every start.
+
+    A collection whose indexes cannot be built (e.g. duplicates blocking a
+    unique index) is logged and skipped so the others are still applied.
+    """
+    applied = {}
+    for collection, models in INDEXES.items():
+        try:
+            applied[collection] = await db[collection].create_indexes(models)
+        except OperationFailure as e:
+            logger.error(f"Failed to create indexes on {collection}: {str(e)}")
+    return applied
+
+
+async def undeclared_indexes(db) -> Dict[str, List[str]]:
+    """Indexes present in the database but missing from INDEXES, candidates for dropping."""
+    declared = {
+        collection: {model.document["name"] for model in models} | {"_id_"}
+        for collection, models in INDEXES.items()
+    }
+    extra = {}
+    for collection in await db.list_collection_names():
+        names = [index["name"] async for index in db[collection].list_indexes()]
+        unknown = [name for name in names if name not in declared.get(collection, {"_id_"})]
+        if unknown:
+            extra[collection] = unknown
+    return extra
+
+
+def _winning_stages(node: Any, in_winning_plan: bool = False) -> List[str]:
+    """Stage names of the winning plan(s) anywhere in an explain() result."""
+    stages = []
+    if isinstance(node, dict):
+        if in_winning_plan and isinstance(node.get("stage"), str):
+            stages.append(node["stage"])
+        for key, value in node.items():
+            if key == "rejectedPlans":
+                continue
+            stages.extend(_winning_stages(value, in_winning_plan or key == "winningPlan"))
+    elif isinstance(node, list):
+        for item in node:
+            stages.extend(_winning_stages(item, in_winning_plan))
+    return stages
+
+
+async def audit_queries(db) -> List[Dict[str, Any]]:
+    """Explain every query shape and flag the ones whose winning plan scans a whole collection."""
+    report = []
+    for shape in query_shapes():
+        if "pipeline" in shape:
+            command = {"aggregate": shape["collection"], "pipeline": shape["pipeline"], "cursor": {}}
+        else:
+            command = {"find": shape["collection"], "filter": shape["filter"]}
+            if shape.get("sort"):
+                command["sort"] = shape["sort"]
+        explain = await db.command("explain", command, verbosity="queryPlanner")
+        stages = _winning_stages(explain)
+        report.append({
+            "name": shape["name"],
+            "collection": shape["collection"],
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages
+        })
+    return report
@@ -0,0 +1,21 @@
+import argparse
+import logging
+from services.ingestion import DocumentIngestor, DOCUMENTS_DIRECTORY, INGEST_WORKERS, INGEST_EMBED_BATCH_SIZE
+from services.retrieval_service import CHROMA_PERSIST_DIRECTORY
+
+logging.basicConfig(level=logging.INFO)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync the PDF library into the Chroma vector store")
+    parser.add_argument("--data-dir", default=DOCUMENTS_DIRECTORY, help="Directory of PDF files to ingest")
+    parser.add_argument("--persist-dir", default=CHROMA_PERSIST_DIRECTORY, help="Chroma persist directory")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="PDF parsing processes")
+    parser.add_argument("--batch-size", type=int, default=INGEST_EMBED_BATCH_SIZE, help="Chunks per embedding batch")
+    parser.add_argument("--full", action="store_true", help="Re-check every file, ignoring the manifest")
+    args = parser.parse_args()
+
+    ingestor = DocumentIngestor(args.persist_dir, args.data_dir, args.workers, args.batch_size)
+    stats = ingestor.run(full=args.full)
+    print(f"Ingested {stats['ingested']} files ({stats['unchanged']} unchanged, {stats['removed']} removed, "
+          f"{stats['failed']} failed); embedded {stats['chunks_embedded']} chunks, "
+          f"reused {stats['chunks_reused']}, deleted {stats['chunks_deleted']}")
@@ -1,14 +1,16 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+import time
+_import_started_at = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, Depends, Query, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, AsyncIterator
 from datetime import datetime, timedelta
 import os
+import json
 import logging
-from langchain_groq import ChatGroq
-from langchain.schema import HumanMessage, SystemMessage
 from dotenv import load_dotenv
 from services.auth_service import AuthService
 from services.mood_service import MoodService
@@ -20,6 +22,13 @@ from passlib.context import CryptContext
 from services.progress_service import ProgressService
 from services.achievement_service import AchievementService
 from services.exercise_service import ExerciseService
+from services.dashboard_service import DashboardService
+from services.sync_service import SyncError, SyncService
+from services.retrieval_service import RetrievalService
+from services.embeddings import embedding_cache_stats, get_embeddings
+from services.llm_provider import get_chat_model
+from services.context_builder import count_tokens
+from services.warmup import WarmUp
 
 # Enhanced logging
 logging.basicConfig(
@@ -28,10 +37,14 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Heavy ML libraries are imported on first use or by the warm-up, not here
+IMPORT_SECONDS = time.perf_counter() - _import_started_at
+
 # Load environment variables
 load_dotenv(override=True)
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key")
+# /metrics exposes internals, so it is off unless enabled and always needs a token
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"
 
 # Initialize services
 auth_service = None
@@ -40,6 +53,9 @@ chat_service = None
 progress_service = None
 achievement_service = None
 exercise_service = None
+dashboard_service = None
+sync_service = None
+warmup = None
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -105,6 +121,22 @@ async def get_exercise_service() -> ExerciseService:
         )
     return exercise_service
 
+async def get_dashboard_service() -> DashboardService:
+    if dashboard_service is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Dashboard service not initialized"
+        )
+    return dashboard_service
+
+async def get_sync_service() -> SyncService:
+    if sync_service is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Sync service not initialized"
+        )
+    return sync_service
+
 @app.on_event("startup")
 async def startup_db_client():
     """Initialize database connection and services on startup."""
@@ -113,15 +145,30 @@ async def startup_db_client():
         await connect_to_mongo()
         
         # Initialize services after database connection
-        global auth_service, mood_service, chat_service, progress_service, achievement_service, exercise_service
+        global auth_service, mood_service, chat_service, progress_service, achievement_service, exercise_service, dashboard_service, sync_service, warmup
         auth_service = AuthService()
         mood_service = MoodService()
-        chat_service = ChatService(GROQ_API_KEY)
+        retrieval_service = RetrievalService()
+        chat_service = ChatService(retrieval=retrieval_service)
         progress_service = ProgressService()
         achievement_service = AchievementService()
         exercise_service = ExerciseService()
+        dashboard_service = DashboardService()
+        sync_service = SyncService(mood_service)
         
-        logger.info("Database connection and services initialized successfully")
+        # Load models after startup so /backendHealth answers immediately
+        warmup = WarmUp([
+            ("chat_model", get_chat_model),
+            ("tokenizer", lambda: count_tokens("warm up")),
+            ("embeddings", lambda: get_embeddings().embed_query("warm up")),
+            ("retrieval", retrieval_service.load_sync)
+        ])
+        warmup.start()
+        if warmup.status == "disabled":
+            # Other models load on first use, but nothing else loads the vector store
+            await retrieval_service.load()
+        
+        logger.info(f"Database connection and services initialized successfully ({IMPORT_SECONDS:.2f}s of imports)")
     except Exception as e:
         logger.error(f"Failed to initialize application: {str(e)}")
         # Close any partial connections
@@ -132,6 +179,12 @@ async def startup_db_client():
 async def shutdown_db_client():
     """Close database connection on shutdown."""
     try:
+        if warmup is not None:
+            await warmup.cancel()
+        if auth_service is not None:
+            auth_service.hasher.shutdown()
+        if chat_service is not None:
+            await chat_service.drain()
         await close_mongo_connection()
         logger.info("Database connection closed successfully")
     except Exception as e:
@@ -221,6 +274,45 @@ emergency_contacts = [
     }
 ]
 
+async def sse_response(tokens: AsyncIterator[str], extra: Optional[dict] = None) -> StreamingResponse:
+    """
+    Wrap a token stream as Server-Sent Events, ending with a done event.
+
+    The first token is awaited before the response starts, so errors raised
+    up to then, such as a 503 from the LLM gateway, keep their status code.
+    """
+    try:
+        head = [await tokens.__anext__()]
+    except StopAsyncIteration:
+        head = []
+
+    async def event_source():
+        chunks = []
+        for token in head:
+            chunks.append(token)
+            yield f"data: {json.dumps({'token': token})}\n\n"
+        async for token in tokens:
+            chunks.append(token)
+            yield f"data: {json.dumps({'token': token})}\n\n"
+        final_event = {"done": True, "response": "".join(chunks)}
+        final_event.update(extra or {})
+        yield f"data: {json.dumps(final_event)}\n\n"
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Entry ids in page cursors; entries sharing a timestamp are told apart by _id
+OBJECT_ID_PATTERN = "^[0-9a-fA-F]{24}$"
+
+def set_next_page_cursor(response: Response, entries: list, limit: int):
+    """Advertise the (timestamp, _id) cursor for the next (older) page when this page is full."""
+    if entries and len(entries) >= limit:
+        response.headers["X-Next-Before"] = entries[-1]["timestamp"]
+        response.headers["X-Next-Before-Id"] = entries[-1]["_id"]
+
 @app.get("/test")
 async def test_endpoint():
     return {"status": "ok", "message": "Backend server is running"}
@@ -228,6 +320,7 @@ async def test_endpoint():
 @app.post("/chat")
 async def chat(
     request: ChatRequest,
+    stream: bool = False,
     token: str = Depends(oauth2_scheme),
     auth_service: AuthService = Depends(get_auth_service),
     chat_service: ChatService = Depends(get_chat_service)
@@ -242,6 +335,13 @@ async def chat(
                 headers={"WWW-Authenticate": "Bearer"},
             )
 
+        if stream:
+            return await sse_response(chat_service.stream_response(
+                user_id=str(current_user.id),
+                message=request.text,
+                user_type=current_user.user_type
+            ))
+
         # Get response from chat service
         response = await chat_service.get_response(
             user_id=str(current_user.id),
@@ -262,10 +362,19 @@ async def chat(
         )
 
 @app.post("/chat/public")
-async def public_chat(request: ChatRequest, chat_service: ChatService = Depends(get_chat_service)):
+async def public_chat(
+    request: ChatRequest,
+    stream: bool = False,
+    chat_service: ChatService = Depends(get_chat_service)
+):
     try:
+        if stream:
+            return await sse_response(chat_service.stream_public_chat(request.text))
+
         response = await chat_service.public_chat(request.text)
         return {"response": response}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in public chat: {str(e)}")
         raise HTTPException(
@@ -276,13 +385,15 @@ async def public_chat(request: ChatRequest, chat_service: ChatService = Depends(
 @app.post("/chat/mood")
 async def mood_chat(
     request: ChatRequest,
+    stream: bool = False,
     token: str = Depends(oauth2_scheme),
     auth_service: AuthService = Depends(get_auth_service),
     chat_service: ChatService = Depends(get_chat_service),
     mood_service: MoodService = Depends(get_mood_service)
 ):
     try:
-        user_id = await auth_service.get_current_user(token)
+        current_user = await auth_service.get_current_user(token)
+        user_id = str(current_user.id)
         
         # Get user's latest mood
         mood_history = await mood_service.get_mood_history(user_id, limit=1)
@@ -290,23 +401,33 @@ async def mood_chat(
             raise HTTPException(status_code=404, detail="No mood entry found")
             
         latest_mood = mood_history[0]
+        mood_context = {
+            "mood": latest_mood["mood"],
+            "timestamp": latest_mood["timestamp"]
+        }
         
-        # Enhance chat message with mood context
-        enhanced_message = f"Current mood: {latest_mood['mood']}. {request.text}"
+        if stream:
+            return await sse_response(
+                chat_service.stream_response(
+                    user_id=user_id,
+                    message=request.text,
+                    user_type="student",  # Mood chat is always for students
+                    mood=latest_mood["mood"]
+                ),
+                extra={"mood_context": mood_context}
+            )
         
-        # Get response from chat service
+        # Get response from chat service, with the mood passed as prompt context
         response = await chat_service.get_response(
             user_id=user_id,
-            message=enhanced_message,
-            user_type="student"  # Mood chat is always for students
+            message=request.text,
+            user_type="student",  # Mood chat is always for students
+            mood=latest_mood["mood"]
         )
         
         return {
             "response": response,
-            "mood_context": {
-                "mood": latest_mood["mood"],
-                "timestamp": latest_mood["timestamp"].isoformat()
-            }
+            "mood_context": mood_context
         }
         
     except HTTPException as e:
@@ -489,9 +610,11 @@ async def save_mood(
                 headers={"WWW-Authenticate": "Bearer"},
             )
 
-        # Validate required fields
+        # Validate required fields; the mood is also a key of the daily rollup
         if not mood_data.get("mood"):
             raise HTTPException(status_code=400, detail="Mood is required")
+        if not isinstance(mood_data["mood"], str):
+            raise HTTPException(status_code=400, detail="Mood must be a string")
 
         # Save mood entry using user ID
         saved_entry = await mood_service.save_mood_entry(str(current_user.id), mood_data)
@@ -505,6 +628,14 @@ async def save_mood(
 
 @app.get("/mood/history")
 async def get_mood_history(
+    response: Response,
+    limit: int = Query(10, ge=1, le=100),
+    before: Optional[datetime] = None,
+    after: Optional[datetime] = None,
+    before_id: Optional[str] = Query(None, pattern=OBJECT_ID_PATTERN),
+    after_id: Optional[str] = Query(None, pattern=OBJECT_ID_PATTERN),
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
     token: str = Depends(oauth2_scheme),
     auth_service: AuthService = Depends(get_auth_service),
     mood_service: MoodService = Depends(get_mood_service)
@@ -524,8 +655,12 @@ async def get_mood_history(
         logger.info(f"Fetching mood history for user ID: {user_id}")
         
         # Get mood history
-        history = await mood_service.get_mood_history(user_id)
+        history = await mood_service.get_mood_history(
+            user_id, limit=limit, before=before, after=after, start=from_, end=to,
+            before_id=before_id, after_id=after_id
+        )
         logger.info(f"Retrieved {len(history)} mood entries")
+        set_next_page_cursor(response, history, limit)
         return history
     except Exception as e:
         logger.error(f"Error getting mood history: {str(e)}")
@@ -565,49 +700,68 @@ async def get_emergency_contacts():
 async def get_children_progress(
     parent_id: str,
     auth_service: AuthService = Depends(get_auth_service),
-    mood_service: MoodService = Depends(get_mood_service)
+    dashboard_service: DashboardService = Depends(get_dashboard_service)
 ):
     try:
         # Get parent user
         parent = await auth_service.get_user_by_id(parent_id)
-        if not parent or parent["user_type"] != "parent":
+        if not parent or parent.user_type != "parent":
             raise HTTPException(status_code=404, detail="Parent not found")
         
-        children_data = []
-        for child_id in parent.get("linked_children", []):
-            child = await auth_service.get_user_by_id(child_id)
-            if child:
-                # Get child's mood history
-                mood_history = await mood_service.get_child_mood_history(str(child_id))
-                
-                # Get child's achievements
-                db = get_database()
-                achievements = await db.achievements.find({"user_id": ObjectId(child_id)}).to_list(None)
-                
-                # Calculate stats
-                total_sessions = sum(1 for a in achievements if a.get("type") == "session")
-                total_minutes = sum(a.get("duration", 0) for a in achievements)
-                categories_used = len(set(a.get("category") for a in achievements))
-                last_session = max((a.get("timestamp") for a in achievements if a.get("timestamp")), default=None)
-                
-                children_data.append({
-                    "id": str(child["_id"]),
-                    "name": f"{child['name']} {child['last_name']}",
-                    "email": child["email"],
-                    "mood_history": mood_history,
-                    "stats": {
-                        "totalSessions": total_sessions,
-                        "totalMinutes": total_minutes,
-                        "categoriesUsed": categories_used,
-                        "lastSession": last_session
-                    }
-                })
+        dashboard = await dashboard_service.get_parent_dashboard(parent.linked_children or [])
+        children_data = [{
+            "id": child["id"],
+            "name": child["name"],
+            "email": child["email"],
+            "mood_history": child["mood"]["recent"],
+            "stats": child["stats"]
+        } for child in dashboard]
         
         return {"children": children_data}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting children progress: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch children's progress")
 
+@app.get("/parent/dashboard")
+async def get_parent_dashboard(
+    mood_days: int = Query(14, ge=1, le=90),
+    mood_limit: int = Query(20, ge=1, le=100),
+    token: str = Depends(oauth2_scheme),
+    auth_service: AuthService = Depends(get_auth_service),
+    dashboard_service: DashboardService = Depends(get_dashboard_service)
+):
+    """Get summaries for all of a parent's linked children in one request."""
+    try:
+        current_user = await auth_service.get_current_user(token)
+        if not current_user:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Not authenticated",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+
+        if current_user.user_type != "parent":
+            raise HTTPException(status_code=403, detail="Only parents can access the dashboard")
+
+        children = await dashboard_service.get_parent_dashboard(
+            current_user.linked_children or [],
+            mood_days=mood_days,
+            mood_limit=mood_limit
+        )
+        return {
+            "children": children,
+            "window": {"mood_days": mood_days, "mood_limit": mood_limit},
+            "generated_at": datetime.utcnow().isoformat()
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting parent dashboard: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to load parent dashboard")
+
 @app.get("/auth/me")
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     try:
@@ -651,26 +805,7 @@ async def get_linked_children(
         
         logger.info(f"Fetching linked children for parent: {current_user.email}")
         
-        children = []
-        for child_id in current_user.linked_children or []:
-            try:
-                # Convert ObjectId to string if needed
-                child_id_str = str(child_id) if isinstance(child_id, ObjectId) else child_id
-                logger.info(f"Fetching child with ID: {child_id_str}")
-                
-                child = await auth_service.get_user_by_id(child_id_str)
-                if child:
-                    logger.info(f"Found child: {child.email}")
-                    children.append({
-                        "id": str(child.id),
-                        "name": f"{child.name} {child.last_name}",
-                        "email": child.email
-                    })
-                else:
-                    logger.warning(f"Child not found for ID: {child_id_str}")
-            except Exception as child_error:
-                logger.error(f"Error fetching child {child_id}: {str(child_error)}")
-                continue
+        children = await auth_service.get_children_by_ids(current_user.linked_children or [])
         
         logger.info(f"Returning {len(children)} linked children")
         return {"children": children}
@@ -687,6 +822,14 @@ async def get_linked_children(
 @app.get("/parent/child/{child_id}/mood/history")
 async def get_child_mood_history(
     child_id: str,
+    response: Response,
+    limit: int = Query(50, ge=1, le=100),
+    before: Optional[datetime] = None,
+    after: Optional[datetime] = None,
+    before_id: Optional[str] = Query(None, pattern=OBJECT_ID_PATTERN),
+    after_id: Optional[str] = Query(None, pattern=OBJECT_ID_PATTERN),
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
     token: str = Depends(oauth2_scheme),
     auth_service: AuthService = Depends(get_auth_service),
     mood_service: MoodService = Depends(get_mood_service)
@@ -719,8 +862,12 @@ async def get_child_mood_history(
         
         # Get child's mood history
         logger.info(f"Fetching mood history for child: {child_id_str}")
-        entries = await mood_service.get_child_mood_history(child_id_str)
+        entries = await mood_service.get_child_mood_history(
+            child_id_str, limit=limit, before=before, after=after, start=from_, end=to,
+            before_id=before_id, after_id=after_id
+        )
         logger.info(f"Found {len(entries)} mood entries for child")
+        set_next_page_cursor(response, entries, limit)
         return entries
         
     except HTTPException:
@@ -794,26 +941,20 @@ async def get_child_achievements(
 async def get_child_category_stats(
     child_id: str,
     category: str,
-    auth: AuthService = Depends(get_auth_service)
+    token: str = Depends(oauth2_scheme),
+    auth: AuthService = Depends(get_auth_service),
+    progress_service: ProgressService = Depends(get_progress_service)
 ):
     try:
-        current_user = await auth.get_current_user()
+        current_user = await auth.get_current_user(token)
         # Verify parent has access to this child
-        parent = await auth.get_user_by_id(current_user)
-        if not parent or parent["user_type"] != "parent" or child_id not in parent.get("linked_children", []):
+        if current_user.user_type != "parent" or child_id not in [str(linked_id) for linked_id in current_user.linked_children]:
             raise HTTPException(status_code=403, detail="Not authorized to access this child's data")
         
-        db = get_database()
-        achievements = await db.achievements.find({
-            "user_id": ObjectId(child_id),
-            "category": category
-        }).to_list(None)
-        
-        return {
-            "totalSessions": sum(1 for a in achievements if a.get("type") == "session"),
-            "totalMinutes": sum(a.get("duration", 0) for a in achievements),
-            "lastSession": max((a.get("timestamp") for a in achievements if a.get("timestamp")), default=None)
-        }
+        # Sessions and minutes come from completed progress, not from awards
+        return await progress_service.get_child_category_stats(child_id, category)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting child category stats: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch child's category statistics")
@@ -889,59 +1030,66 @@ async def get_therapeutic_exercises(category: Optional[str] = None):
 # Add new endpoint for mood tracking insights
 @app.get("/mood/insights")
 async def get_mood_insights(
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    timezone: str = "UTC",
+    token: str = Depends(oauth2_scheme),
     auth: AuthService = Depends(get_auth_service),
     mood: MoodService = Depends(get_mood_service)
 ):
     try:
-        current_user = await auth.get_current_user()
-        mood_history = await mood.get_mood_history(current_user)
+        current_user = await auth.get_current_user(token)
+        insights = await mood.get_mood_insights(str(current_user.id), start=from_, end=to, timezone=timezone)
         
-        # Calculate insights
-        total_entries = len(mood_history)
-        if total_entries == 0:
+        if insights["total_entries"] == 0:
             return {"message": "No mood entries found"}
             
-        mood_counts = {}
-        for entry in mood_history:
-            mood_counts[entry["mood"]] = mood_counts.get(entry["mood"], 0) + 1
-            
-        # Calculate most common mood
-        most_common_mood = max(mood_counts.items(), key=lambda x: x[1])[0]
-        
-        # Calculate mood trends
-        mood_trend = []
-        for entry in mood_history:
-            mood_trend.append({
-                "date": entry["timestamp"],
-                "mood": entry["mood"]
-            })
-            
         return {
-            "total_entries": total_entries,
-            "mood_distribution": mood_counts,
-            "most_common_mood": most_common_mood,
-            "mood_trend": mood_trend,
+            **insights,
             "last_updated": datetime.utcnow().isoformat()
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting mood insights: {e}")
         raise HTTPException(status_code=500, detail="Failed to generate mood insights")
 
+@app.get("/mood/daily")
+async def get_daily_mood(
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    token: str = Depends(oauth2_scheme),
+    auth: AuthService = Depends(get_auth_service),
+    mood: MoodService = Depends(get_mood_service)
+):
+    """Get per-day mood counts for trend charts, defaulting to the last 30 days."""
+    try:
+        current_user = await auth.get_current_user(token)
+        start = from_ or datetime.utcnow() - timedelta(days=30)
+        days = await mood.get_daily_rollups(str(current_user.id), start=start, end=to)
+        return {"days": days}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting daily mood: {e}")
+        raise HTTPException(status_code=500, detail="Failed to get daily mood")
+
 # Add new endpoint for personalized recommendations
 @app.get("/recommendations")
 async def get_personalized_recommendations(
+    token: str = Depends(oauth2_scheme),
     auth: AuthService = Depends(get_auth_service),
     mood: MoodService = Depends(get_mood_service)
 ):
     try:
-        current_user = await auth.get_current_user()
-        mood_history = await mood.get_mood_history(current_user)
+        current_user = await auth.get_current_user(token)
+        latest_mood = await mood.get_latest_mood(str(current_user.id))
         
-        if not mood_history:
+        if not latest_mood:
             return {"message": "No mood history available for recommendations"}
             
         # Get recent mood
-        recent_mood = mood_history[-1]["mood"]
+        recent_mood = latest_mood["mood"]
         
         # Generate recommendations based on mood
         recommendations = {
@@ -1008,6 +1156,8 @@ async def get_personalized_recommendations(
             "recommendations": recommendations.get(recent_mood, []),
             "timestamp": datetime.utcnow().isoformat()
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting personalized recommendations: {e}")
         raise HTTPException(status_code=500, detail="Failed to generate recommendations")
@@ -1228,6 +1378,14 @@ async def get_child_category_stats(
 @app.get("/mood/child/{child_id}")
 async def get_child_mood_history(
     child_id: str,
+    response: Response,
+    limit: int = Query(50, ge=1, le=100),
+    before: Optional[datetime] = None,
+    after: Optional[datetime] = None,
+    before_id: Optional[str] = Query(None, pattern=OBJECT_ID_PATTERN),
+    after_id: Optional[str] = Query(None, pattern=OBJECT_ID_PATTERN),
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
     token: str = Depends(oauth2_scheme),
     auth_service: AuthService = Depends(get_auth_service),
     progress_service: ProgressService = Depends(get_progress_service)
@@ -1243,18 +1401,21 @@ async def get_child_mood_history(
                 headers={"WWW-Authenticate": "Bearer"},
             )
 
-        # Get user data
-        user_data = await auth_service.get_user_by_id(current_user)
-        if not user_data or user_data["user_type"] != "parent":
+        if current_user.user_type != "parent":
             raise HTTPException(status_code=403, detail="Only parents can access child mood history")
         
         # Verify child is linked to parent
-        child = await auth_service.get_user_by_id(child_id)
-        if not child or child_id not in user_data.get("linked_children", []):
+        if child_id not in [str(linked_id) for linked_id in current_user.linked_children]:
             raise HTTPException(status_code=404, detail="Child not found or not linked to parent")
 
-        entries = await progress_service.get_child_mood_history(child_id)
+        entries = await progress_service.get_child_mood_history(
+            child_id, limit=limit, before=before, after=after, start=from_, end=to,
+            before_id=before_id, after_id=after_id
+        )
+        set_next_page_cursor(response, entries, limit)
         return entries
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting child mood history: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to get child mood history")
@@ -1351,6 +1512,34 @@ async def refresh_token(
 async def backend_health():
     return {"status": "OK"}
 
+@app.get("/metrics")
+async def get_metrics(
+    token: str = Depends(oauth2_scheme),
+    auth_service: AuthService = Depends(get_auth_service),
+    chat_service: ChatService = Depends(get_chat_service)
+):
+    """Expose in-process cache and worker pool metrics to authenticated users when METRICS_ENABLED is set."""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    await auth_service.get_current_user(token)
+    return {
+        "auth": {
+            "cache": auth_service.cache_stats(),
+            "password_hashing": auth_service.hasher.stats()
+        },
+        "chat": {
+            "public_response_cache": chat_service.response_cache.stats(),
+            "llm_gateway": chat_service.gateway.stats(),
+            "retrieval": chat_service.retrieval.stats(),
+            "stages": chat_service.latency.stats()
+        },
+        "embedding_cache": embedding_cache_stats(),
+        "startup": {
+            "import_seconds": IMPORT_SECONDS,
+            "warmup": warmup.stats() if warmup is not None else None
+        }
+    }
+
 @app.post("/exercises")
 async def create_exercise(
     exercise_data: dict,
@@ -1384,6 +1573,8 @@ async def create_exercise(
             "message": "Exercise completed successfully"
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating exercise: {str(e)}")
         raise HTTPException(
@@ -1391,6 +1582,34 @@ async def create_exercise(
             detail=f"Failed to create exercise: {str(e)}"
         )
 
+@app.post("/sync")
+async def sync_events(
+    events: List[dict],
+    token: str = Depends(oauth2_scheme),
+    auth_service: AuthService = Depends(get_auth_service),
+    sync_service: SyncService = Depends(get_sync_service)
+):
+    """Apply mood, progress and exercise events queued offline, in one batch."""
+    try:
+        # Get current user from token
+        current_user = await auth_service.get_current_user(token)
+        if not current_user:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Not authenticated",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+
+        return await sync_service.sync(str(current_user.id), events)
+
+    except HTTPException:
+        raise
+    except SyncError as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error syncing events: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to sync events: {str(e)}")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000, log_level="debug")
\ No newline at end of file
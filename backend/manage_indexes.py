@@ -0,0 +1,39 @@
+import argparse
+import asyncio
+import sys
+from database import connect_to_mongo, close_mongo_connection, get_database
+from indexes import INDEXES, audit_queries, ensure_indexes, undeclared_indexes
+
+async def apply():
+    db = get_database()
+    applied = await ensure_indexes(db)
+    for collection in INDEXES:
+        names = applied.get(collection)
+        print(f"{collection}: {', '.join(names) if names is not None else 'FAILED, see log'}")
+    for collection, names in (await undeclared_indexes(db)).items():
+        print(f"{collection}: not declared in indexes.py: {', '.join(names)}")
+    return len(applied) == len(INDEXES)
+
+async def audit():
+    report = await audit_queries(get_database())
+    for entry in report:
+        flag = "COLLSCAN" if entry["collscan"] else "ok"
+        print(f"{flag:<9} {entry['collection']:<22} {entry['name']:<30} {' > '.join(entry['stages'])}")
+    scans = sum(entry["collscan"] for entry in report)
+    print(f"\n{len(report)} query shapes, {scans} collection scans")
+    return scans == 0
+
+async def main(command):
+    await connect_to_mongo()
+    try:
+        return await (apply() if command == "apply" else audit())
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply the declared MongoDB indexes or audit query plans")
+    parser.add_argument("command", choices=["apply", "audit"],
+                        help="apply: create missing indexes; audit: explain() every query shape and flag COLLSCANs")
+    args = parser.parse_args()
+    # Non-zero exit when an index failed to build or a query scans a collection
+    sys.exit(0 if asyncio.run(main(args.command)) else 1)
@@ -0,0 +1,31 @@
+import argparse
+import asyncio
+from database import connect_to_mongo, close_mongo_connection, get_database
+from services.achievement_service import BACKFILL_CHECKPOINT_ID
+from services.documents import FIELD_TYPES, migrate_field_types
+
+async def migrate(collections=None, dry_run=False):
+    await connect_to_mongo()
+    try:
+        db = get_database()
+        report = await migrate_field_types(db, collections, dry_run=dry_run)
+        for collection, fields in report.items():
+            for field, counts in fields.items():
+                summary = ", ".join(f"{name} {count}" for name, count in counts.items())
+                print(f"{collection}.{field} -> {FIELD_TYPES[collection][field]}: {summary}")
+        if not dry_run:
+            # A saved checkpoint holds a string user id, which no longer orders against ObjectIds
+            await db.backfill_checkpoints.delete_one({"_id": BACKFILL_CHECKPOINT_ID})
+            if any(counts.get("collisions_removed") for fields in report.values() for counts in fields.values()):
+                print("Duplicates written by new code were removed; run backfill_achievements.py --restart to recompute counters")
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert string user ids and timestamps to ObjectId and BSON dates; "
+                                                 "run before deploying code that writes them")
+    parser.add_argument("--collection", action="append", choices=sorted(FIELD_TYPES),
+                        help="Only migrate this collection (repeatable)")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the values that would be converted")
+    args = parser.parse_args()
+    asyncio.run(migrate(args.collection, args.dry_run))
@@ -1,7 +1,6 @@
-from langchain_groq import ChatGroq
 from dotenv import load_dotenv
-import os
 import logging
+from services.llm_provider import get_chat_model
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
@@ -9,13 +8,6 @@ logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv(override=True)
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
-if not GROQ_API_KEY:
-    raise ValueError("GROQ_API_KEY not found in environment variables")
-
-llm = ChatGroq(
-    temperature=0,
-    groq_api_key=GROQ_API_KEY,
-    model_name="llama-3.3-70b-versatile"
-)
\ No newline at end of file
+# The shared client selected by LLM_PROVIDER
+llm = get_chat_model()
@@ -1,13 +1,9 @@
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.document_loaders import PyPDFLoader, DirectoryLoader
-from langchain_chroma import Chroma
-from langchain.chains import RetrievalQA
-from langchain.prompts import PromptTemplate
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_groq import ChatGroq
 import os
 from dotenv import load_dotenv
 import logging
+from services.llm_provider import get_chat_model
+from services.ingestion import DocumentIngestor
+from services.retrieval_service import RetrievalService
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
@@ -15,55 +11,42 @@ logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv(override=True)
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-
-if not GROQ_API_KEY:
-    raise ValueError("GROQ_API_KEY not found in environment variables")
 
 def initialize_llm():
     try:
-        llm = ChatGroq(
-            temperature=0,
-            groq_api_key=GROQ_API_KEY,
-            model_name="llama-3.3-70b-versatile"
-        )
-        logger.info(f"LLM initialized with API key: {GROQ_API_KEY[:10]}...")
+        llm = get_chat_model()
+        logger.info(f"LLM initialized: {type(llm).__name__}")
         return llm
     except Exception as e:
         logger.error(f"Error initializing LLM: {str(e)}")
         raise
 
-def create_vector_db():
+def create_vector_db(db_path="chroma_db/"):
     # Make sure the data directory exists
     if not os.path.exists("data"):
         os.makedirs("data")
         print("Please add your PDF files to the 'data' directory")
         return None
 
-    loader = DirectoryLoader("data/", glob="*.pdf", loader_cls=PyPDFLoader)
-    documents = loader.load()
-    
-    if not documents:
+    # Only new or changed PDFs are parsed and embedded; removed ones are dropped
+    stats = DocumentIngestor(db_path, "data").run()
+    if not stats["files"]:
         print("No PDF files found in data directory")
         return None
 
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-    texts = text_splitter.split_documents(documents)
-    
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-    
-    vector_db = Chroma.from_documents(
-        documents=texts,
-        embedding=embeddings,
-        persist_directory="./chroma_db"
-    )
-    return vector_db
+    # Cached, MMR-reranked retrieval over the freshly synced store
+    retrieval = RetrievalService(persist_directory=db_path)
+    retrieval.load_sync()
+    return retrieval if retrieval.ready else None
 
-def setup_qa_chain(vector_db, llm):
-    if not vector_db:
+def setup_qa_chain(retrieval, llm):
+    if not retrieval:
         return None
+
+    from langchain.chains import RetrievalQA
+    from langchain.prompts import PromptTemplate
         
-    retriever = vector_db.as_retriever()
+    retriever = retrieval.as_retriever()
     prompt_templates = """You are a compassionate mental health chatbot. Respond thoughtfully to the following question:
     {context}
     User: {question}
@@ -86,17 +69,13 @@ def main():
 
     db_path = "chroma_db/"
     
-    if not os.path.exists(db_path):
-        vector_db = create_vector_db()
-    else:
-        try:
-            embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-            vector_db = Chroma(persist_directory=db_path, embedding_function=embeddings)
-        except Exception as e:
-            print(f"Error loading existing database: {e}")
-            return
+    try:
+        retrieval = create_vector_db(db_path)
+    except Exception as e:
+        print(f"Error updating vector database: {e}")
+        return
 
-    qa_chain = setup_qa_chain(vector_db, llm)
+    qa_chain = setup_qa_chain(retrieval, llm)
     if not qa_chain:
         print("Failed to initialize QA chain")
         return
@@ -0,0 +1,35 @@
+import argparse
+import subprocess
+import sys
+
+def profile(module, top):
+    """Import a module in a fresh interpreter with -X importtime and summarize the slowest imports."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True
+    )
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+
+    if result.returncode != 0:
+        print(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "Import failed")
+
+    # Top-level entries are the ones without indentation in the tree
+    total_us = sum(cumulative for cumulative, _, name in rows if not name.startswith("  "))
+    print(f"Importing {module} took {total_us / 1e6:.2f}s across {len(rows)} modules\n")
+    print(f"{'cumulative_ms':>14} {'self_ms':>9}  module")
+    for cumulative, self_us, name in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative / 1000:>14.1f} {self_us / 1000:>9.1f}  {name.strip()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report the slowest imports at application start")
+    parser.add_argument("--module", default="main", help="Module to import")
+    parser.add_argument("--top", type=int, default=25, help="Number of modules to list")
+    args = parser.parse_args()
+    profile(args.module, args.top)
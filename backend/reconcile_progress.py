@@ -0,0 +1,20 @@
+import argparse
+import asyncio
+from database import connect_to_mongo, close_mongo_connection
+from services.progress_service import ProgressService
+
+async def reconcile(user_id=None):
+    await connect_to_mongo()
+    try:
+        progress_service = ProgressService()
+        stats = await progress_service.rebuild_category_progress(user_id)
+        print(f"Reconciled {stats['groups']} category counters "
+              f"({stats['modified']} corrected, {stats['upserted']} created)")
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild category_progress counters from progress entries")
+    parser.add_argument("--user-id", help="Only reconcile counters for this user")
+    args = parser.parse_args()
+    asyncio.run(reconcile(args.user_id))
@@ -1,22 +1,70 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional
 from datetime import datetime
+import time
+from bson import ObjectId
+from pymongo import DeleteOne, InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
 from database import get_database
+from .documents import object_id, serialize, utc_datetime
+from .mood_service import rollup_key
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Each rule is awarded once, when the user's running total of completed
+# sessions or minutes in the category first reaches the threshold
+ACHIEVEMENT_RULES = [
+    {"id": "meditation-beginner", "category": "meditation", "metric": "sessions", "threshold": 1,
+     "title": "Meditation Beginner", "description": "Completed your first meditation session"},
+    {"id": "meditation-explorer", "category": "meditation", "metric": "minutes", "threshold": 60,
+     "title": "Meditation Explorer", "description": "Completed 1 hour of meditation"},
+    {"id": "meditation-master", "category": "meditation", "metric": "minutes", "threshold": 300,
+     "title": "Meditation Master", "description": "Completed 5 hours of meditation"},
+    {"id": "anxiety-fighter", "category": "anxiety-management", "metric": "sessions", "threshold": 1,
+     "title": "Anxiety Fighter", "description": "Started your anxiety management journey"},
+    {"id": "anxiety-warrior", "category": "anxiety-management", "metric": "sessions", "threshold": 5,
+     "title": "Anxiety Warrior", "description": "Completed 5 anxiety management exercises"},
+    {"id": "sleep-seeker", "category": "sleep-hygiene", "metric": "sessions", "threshold": 1,
+     "title": "Sleep Seeker", "description": "Started improving your sleep habits"},
+    {"id": "sleep-master", "category": "sleep-hygiene", "metric": "minutes", "threshold": 120,
+     "title": "Sleep Master", "description": "Completed 2 hours of sleep hygiene exercises"},
+    {"id": "stress-reliever", "category": "stress-relief", "metric": "sessions", "threshold": 1,
+     "title": "Stress Reliever", "description": "Started managing your stress"},
+    {"id": "stress-expert", "category": "stress-relief", "metric": "sessions", "threshold": 10,
+     "title": "Stress Management Expert", "description": "Completed 10 stress relief exercises"},
+    {"id": "self-care-starter", "category": "self-care", "metric": "sessions", "threshold": 1,
+     "title": "Self-Care Starter", "description": "Started your self-care journey"},
+    {"id": "self-care-champion", "category": "self-care", "metric": "minutes", "threshold": 180,
+     "title": "Self-Care Champion", "description": "Dedicated 3 hours to self-care"},
+]
+
+RULES_BY_CATEGORY: Dict[str, List[Dict[str, Any]]] = {}
+for _rule in ACHIEVEMENT_RULES:
+    RULES_BY_CATEGORY.setdefault(_rule["category"], []).append(_rule)
+
+BACKFILL_CHECKPOINT_ID = "achievements"
+
+def crossed_rules(category: str, before: Dict[str, float], after: Dict[str, float]) -> List[Dict[str, Any]]:
+    """Rules whose threshold lies between the counters before and after one completion."""
+    return [
+        rule for rule in RULES_BY_CATEGORY.get(category, [])
+        if before[rule["metric"]] < rule["threshold"] <= after[rule["metric"]]
+    ]
+
 class AchievementService:
     def __init__(self):
         self.db = get_database()
         self.achievements_collection = self.db.achievements
+        # One document per user: {"categories": {<category>: {"sessions", "minutes"}}, "seeded": bool}
+        self.counters_collection = self.db.achievement_counters
 
     async def get_user_achievements(self, user_id: str) -> List[Dict[str, Any]]:
         try:
             achievements = await self.achievements_collection.find(
-                {"user_id": user_id}
+                {"user_id": object_id(user_id)}
             ).sort("timestamp", -1).to_list(length=None)
             
-            return achievements
+            return serialize(achievements)
         except Exception as e:
             logger.error(f"Error getting achievements for user {user_id}: {str(e)}")
             return []
@@ -24,15 +72,17 @@ class AchievementService:
     async def create_achievement(self, user_id: str, achievement_data: Dict[str, Any]) -> Dict[str, Any]:
         try:
             achievement = {
-                "_id": achievement_data.get("_id", str(datetime.utcnow().timestamp())),
-                "user_id": user_id,
+                "_id": achievement_data.get("_id") or ObjectId(),
+                "user_id": object_id(user_id),
                 "title": achievement_data["title"],
                 "description": achievement_data["description"],
                 "category": achievement_data["category"],
                 "duration": achievement_data.get("duration", 0),
-                "timestamp": datetime.utcnow().isoformat(),
+                "timestamp": datetime.utcnow(),
                 "exerciseId": achievement_data.get("exerciseId")
             }
+            if achievement_data.get("rule_id"):
+                achievement["rule_id"] = achievement_data["rule_id"]
             
             await self.achievements_collection.insert_one(achievement)
             return achievement
@@ -41,132 +91,312 @@ class AchievementService:
             raise
 
     async def check_and_create_achievements(self, user_id: str, exercise_data: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Check and create achievements based on completed exercises."""
+        """Record a completed exercise and award any rules it unlocks."""
         try:
-            category = exercise_data.get("category", "")
-            duration = exercise_data.get("duration", 0)
-            
-            # Get user's existing achievements in this category
-            existing_achievements = await self.achievements_collection.find({
-                "user_id": user_id,
-                "category": category
-            }).to_list(length=None)
-            
-            total_duration = sum(ach.get("duration", 0) for ach in existing_achievements)
-            total_sessions = len(existing_achievements)
-            
-            new_achievements = []
-            
-            # Category-specific achievements
-            if category == "meditation":
-                if total_duration == 0:
-                    new_achievements.append({
-                        "title": "Meditation Beginner",
-                        "description": "Completed your first meditation session",
-                        "category": category,
-                        "duration": duration
-                    })
-                elif total_duration >= 60 and total_duration - duration < 60:
-                    new_achievements.append({
-                        "title": "Meditation Explorer",
-                        "description": "Completed 1 hour of meditation",
-                        "category": category,
-                        "duration": duration
-                    })
-                elif total_duration >= 300 and total_duration - duration < 300:
-                    new_achievements.append({
-                        "title": "Meditation Master",
-                        "description": "Completed 5 hours of meditation",
-                        "category": category,
-                        "duration": duration
-                    })
-            
-            elif category == "anxiety-management":
-                if total_sessions == 0:
-                    new_achievements.append({
-                        "title": "Anxiety Fighter",
-                        "description": "Started your anxiety management journey",
-                        "category": category,
-                        "duration": duration
-                    })
-                elif total_sessions >= 5 and total_sessions - 1 < 5:
-                    new_achievements.append({
-                        "title": "Anxiety Warrior",
-                        "description": "Completed 5 anxiety management exercises",
-                        "category": category,
-                        "duration": duration
-                    })
-            
-            elif category == "sleep-hygiene":
-                if total_duration == 0:
-                    new_achievements.append({
-                        "title": "Sleep Seeker",
-                        "description": "Started improving your sleep habits",
-                        "category": category,
-                        "duration": duration
-                    })
-                elif total_duration >= 120 and total_duration - duration < 120:
-                    new_achievements.append({
-                        "title": "Sleep Master",
-                        "description": "Completed 2 hours of sleep hygiene exercises",
-                        "category": category,
-                        "duration": duration
-                    })
-            
-            elif category == "stress-relief":
-                if total_sessions == 0:
-                    new_achievements.append({
-                        "title": "Stress Reliever",
-                        "description": "Started managing your stress",
-                        "category": category,
-                        "duration": duration
-                    })
-                elif total_sessions >= 10 and total_sessions - 1 < 10:
-                    new_achievements.append({
-                        "title": "Stress Management Expert",
-                        "description": "Completed 10 stress relief exercises",
-                        "category": category,
-                        "duration": duration
-                    })
-            
-            elif category == "self-care":
-                if total_duration == 0:
-                    new_achievements.append({
-                        "title": "Self-Care Starter",
-                        "description": "Started your self-care journey",
-                        "category": category,
-                        "duration": duration
-                    })
-                elif total_duration >= 180 and total_duration - duration < 180:
-                    new_achievements.append({
-                        "title": "Self-Care Champion",
-                        "description": "Dedicated 3 hours to self-care",
-                        "category": category,
-                        "duration": duration
-                    })
-            
-            # Create all new achievements
-            created_achievements = []
-            for achievement_data in new_achievements:
-                achievement_data["exerciseId"] = exercise_data.get("_id")
-                created = await self.create_achievement(user_id, achievement_data)
-                created_achievements.append(created)
-            
-            return created_achievements
-            
+            return await self.record_completions(user_id, [exercise_data])
         except Exception as e:
             logger.error(f"Error checking achievements for user {user_id}: {str(e)}")
             return []
 
+    async def record_completions(self, user_id: str, exercises: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Record one or more completed exercises for a user and award the rules they unlock.
+
+        The user's counters are bumped for every category at once with one
+        atomic find_one_and_update. Subtracting the batch's own totals gives
+        the counters before it, and replaying the exercises in order from
+        there finds the one that moved each rule from below its threshold to
+        at or above it. Awards go out in one unordered insert; the unique
+        (user_id, rule_id) index makes awarding idempotent. A counters
+        document this call creates is first seeded with the user's earlier
+        completions.
+        """
+        if not exercises:
+            return []
+
+        increments: Dict[str, float] = {}
+        for exercise in exercises:
+            key = rollup_key(exercise.get("category", ""))
+            increments[f"categories.{key}.sessions"] = increments.get(f"categories.{key}.sessions", 0) + 1
+            increments[f"categories.{key}.minutes"] = (
+                increments.get(f"categories.{key}.minutes", 0) + (exercise.get("duration", 0) or 0)
+            )
+
+        user_id = object_id(user_id)
+        counters = await self.counters_collection.find_one_and_update(
+            {"user_id": user_id},
+            {"$inc": increments, "$set": {"updated_at": datetime.utcnow()}},
+            projection={"categories": 1, "seeded": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        if not counters.get("seeded"):
+            counters = await self._seed_counters(user_id, exercises)
+
+        running: Dict[str, Dict[str, float]] = {}
+        for field, amount in increments.items():
+            _, key, metric = field.split(".")
+            after = counters["categories"][key][metric]
+            running.setdefault(key, {})[metric] = after - amount
+
+        earned = []
+        for exercise in exercises:
+            category = exercise.get("category", "")
+            duration = exercise.get("duration", 0) or 0
+            current = running[rollup_key(category)]
+            before = dict(current)
+            current["sessions"] += 1
+            current["minutes"] += duration
+            for rule in crossed_rules(category, before, current):
+                earned.append({
+                    "_id": ObjectId(),
+                    "user_id": user_id,
+                    "rule_id": rule["id"],
+                    "title": rule["title"],
+                    "description": rule["description"],
+                    "category": category,
+                    "duration": duration,
+                    "timestamp": datetime.utcnow(),
+                    "exerciseId": exercise.get("_id")
+                })
+        if not earned:
+            return []
+
+        try:
+            await self.achievements_collection.insert_many(earned, ordered=False)
+            return earned
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != 11000 for error in errors):
+                raise
+            duplicates = {error["index"] for error in errors}
+            for index in sorted(duplicates):
+                logger.info(f"Achievement {earned[index]['rule_id']} already awarded to user {user_id}")
+            return [achievement for index, achievement in enumerate(earned) if index not in duplicates]
+
+    async def _seed_counters(self, user_id: ObjectId, exercises: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Add the user's completions from before counters existed to their counters document.
+
+        Without this, users with a history would start from zero and earn
+        their first-session awards a second time. Only one caller can flip
+        ``seeded``, so concurrent first completions seed once; the backfill
+        writes seeded documents, so this only runs for users it has not seen.
+        """
+        batch_ids = [exercise["_id"] for exercise in exercises if exercise.get("_id") is not None]
+        seed: Dict[str, float] = {}
+        async for group in self.db.exercises.aggregate([
+            {"$match": {"user_id": user_id, "completed": True, "_id": {"$nin": batch_ids}}},
+            {"$group": {
+                "_id": "$category",
+                "sessions": {"$sum": 1},
+                "minutes": {"$sum": {"$ifNull": ["$duration", 0]}}
+            }}
+        ]):
+            key = rollup_key(group["_id"] or "")
+            seed[f"categories.{key}.sessions"] = seed.get(f"categories.{key}.sessions", 0) + group["sessions"]
+            seed[f"categories.{key}.minutes"] = seed.get(f"categories.{key}.minutes", 0) + group["minutes"]
+
+        update = {"$set": {"seeded": True}}
+        if seed:
+            update["$inc"] = seed
+        counters = await self.counters_collection.find_one_and_update(
+            {"user_id": user_id, "seeded": {"$ne": True}},
+            update,
+            projection={"categories": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if counters is None:
+            # Another request seeded the document first
+            counters = await self.counters_collection.find_one({"user_id": user_id}, {"categories": 1})
+        elif seed:
+            logger.info(f"Seeded achievement counters for user {user_id} from earlier exercises")
+        return counters
+
+    async def backfill_achievements(
+        self,
+        users_per_chunk: int = 500,
+        batch_size: int = 1000,
+        restart: bool = False,
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Recompute every user's counters from their completed exercises and award missing rules.
+
+        Exercises are streamed in (user_id, timestamp) order, so each user's
+        history is replayed in one pass and awards keep the timestamp of the
+        exercise that earned them. Counters and awards are written with
+        unordered bulk writes every ``users_per_chunk`` users, after which
+        the last finished user_id is checkpointed; a rerun after an
+        interruption resumes after it unless ``restart`` is set. Legacy awards without a rule_id are
+        matched by title and tagged instead of duplicated; where the rule was
+        already awarded with a rule_id, the untagged copies are deleted.
+        Exercises whose timestamp cannot be parsed are skipped and counted
+        rather than stopping the run.
+
+        Completions recorded for a user while their chunk is in flight can be
+        overwritten by the recomputed counters, so run this while traffic is low,
+        and after migrate_types.py so every exercise's user_id is an ObjectId.
+        """
+        checkpoints = self.db.backfill_checkpoints
+        checkpoint = None
+        if restart:
+            await checkpoints.delete_one({"_id": BACKFILL_CHECKPOINT_ID})
+        else:
+            saved = await checkpoints.find_one({"_id": BACKFILL_CHECKPOINT_ID})
+            checkpoint = saved["last_user_id"] if saved else None
+
+        query = {"completed": True}
+        if checkpoint is not None:
+            query["user_id"] = {"$gt": checkpoint}
+        cursor = self.db.exercises.find(
+            query,
+            {"user_id": 1, "category": 1, "duration": 1, "timestamp": 1}
+        ).sort([("user_id", 1), ("timestamp", 1)]).batch_size(batch_size)
+
+        stats = {
+            "users": 0, "exercises": 0, "skipped": 0, "awarded": 0, "tagged": 0, "merged": 0,
+            "resumed_after": checkpoint
+        }
+        started_at = time.perf_counter()
+        chunk: Dict[str, Dict[str, Any]] = {}
+        current_user = None
+        replay = None
+
+        async for exercise in cursor:
+            try:
+                exercise["timestamp"] = utc_datetime(exercise["timestamp"]) if exercise.get("timestamp") else None
+            except ValueError:
+                # Left for migrate_types.py to report; the rest of the user's history still counts
+                logger.warning(f"Skipping exercise {exercise['_id']} with unparseable timestamp {exercise['timestamp']!r}")
+                stats["skipped"] += 1
+                continue
+            user_id = exercise["user_id"]
+            if user_id != current_user:
+                if len(chunk) >= users_per_chunk:
+                    await self._flush_backfill_chunk(chunk, stats, started_at, on_progress)
+                    chunk = {}
+                current_user = user_id
+                replay = chunk[user_id] = {"categories": {}, "earned": []}
+
+            category = exercise.get("category", "")
+            duration = exercise.get("duration", 0) or 0
+            counters = replay["categories"].setdefault(rollup_key(category), {"sessions": 0, "minutes": 0})
+            before = dict(counters)
+            counters["sessions"] += 1
+            counters["minutes"] += duration
+            for rule in crossed_rules(category, before, counters):
+                replay["earned"].append((rule, exercise, duration))
+            stats["exercises"] += 1
+
+        if chunk:
+            await self._flush_backfill_chunk(chunk, stats, started_at, on_progress)
+        # A finished run leaves no checkpoint, so the next run recomputes everyone
+        await checkpoints.delete_one({"_id": BACKFILL_CHECKPOINT_ID})
+        stats["elapsed_seconds"] = time.perf_counter() - started_at
+        return stats
+
+    async def _flush_backfill_chunk(
+        self,
+        chunk: Dict[str, Dict[str, Any]],
+        stats: Dict[str, Any],
+        started_at: float,
+        on_progress: Optional[Callable[[Dict[str, Any]], None]]
+    ):
+        user_ids = list(chunk)
+        now = datetime.utcnow()
+
+        # Existing awards for the whole chunk in one query
+        awarded = {}
+        async for achievement in self.achievements_collection.find(
+            {"user_id": {"$in": user_ids}},
+            {"user_id": 1, "rule_id": 1, "title": 1}
+        ):
+            awarded.setdefault(achievement["user_id"], []).append(achievement)
+
+        counter_writes = []
+        award_writes = []
+        for user_id, replay in chunk.items():
+            counter_writes.append(UpdateOne(
+                {"user_id": user_id},
+                {"$set": {"categories": replay["categories"], "seeded": True, "updated_at": now}},
+                upsert=True
+            ))
+            existing = awarded.get(user_id, [])
+            rule_ids = {achievement.get("rule_id") for achievement in existing}
+            legacy: Dict[str, List[Any]] = {}
+            for achievement in existing:
+                if not achievement.get("rule_id"):
+                    legacy.setdefault(achievement["title"], []).append(achievement["_id"])
+            for rule, exercise, duration in replay["earned"]:
+                copies = legacy.pop(rule["title"], [])
+                awarded_already = rule["id"] in rule_ids
+                if not awarded_already and copies:
+                    award_writes.append(UpdateOne(
+                        {"_id": copies.pop(0)},
+                        {"$set": {"rule_id": rule["id"]}}
+                    ))
+                    stats["tagged"] += 1
+                    awarded_already = True
+                # Untagged copies of an award that already has its rule_id are duplicates
+                for duplicate_id in copies:
+                    award_writes.append(DeleteOne({"_id": duplicate_id}))
+                    stats["merged"] += 1
+                if awarded_already:
+                    continue
+                award_writes.append(InsertOne({
+                    "_id": ObjectId(),
+                    "user_id": user_id,
+                    "rule_id": rule["id"],
+                    "title": rule["title"],
+                    "description": rule["description"],
+                    "category": rule["category"],
+                    "duration": duration,
+                    "timestamp": exercise["timestamp"] or now,
+                    "exerciseId": exercise["_id"]
+                }))
+                stats["awarded"] += 1
+
+        await self.counters_collection.bulk_write(counter_writes, ordered=False)
+        if award_writes:
+            try:
+                await self.achievements_collection.bulk_write(award_writes, ordered=False)
+            except BulkWriteError as e:
+                # Awards made concurrently by live traffic are fine; anything else is not
+                errors = e.details.get("writeErrors", [])
+                if any(error.get("code") != 11000 for error in errors):
+                    raise
+                stats["awarded"] -= len(errors)
+
+        await self.db.backfill_checkpoints.update_one(
+            {"_id": BACKFILL_CHECKPOINT_ID},
+            {"$set": {"last_user_id": user_ids[-1], "updated_at": now}},
+            upsert=True
+        )
+        stats["users"] += len(user_ids)
+        elapsed = time.perf_counter() - started_at
+        progress = {
+            **stats,
+            "last_user_id": user_ids[-1],
+            "elapsed_seconds": elapsed,
+            "exercises_per_second": stats["exercises"] / elapsed if elapsed else 0.0
+        }
+        logger.info(
+            f"Achievement backfill: {stats['users']} users, {stats['exercises']} exercises "
+            f"({progress['exercises_per_second']:.0f}/s), {stats['awarded']} awarded"
+        )
+        if on_progress is not None:
+            on_progress(progress)
+
     async def get_child_achievements(self, child_id: str) -> List[Dict[str, Any]]:
         """Get achievements for a child user."""
         try:
             achievements = await self.achievements_collection.find(
-                {"user_id": child_id}
+                {"user_id": object_id(child_id)}
             ).sort("timestamp", -1).to_list(length=None)
             
             logger.info(f"Retrieved {len(achievements)} achievements for child {child_id}")
-            return achievements
+            return serialize(achievements)
         except Exception as e:
             logger.error(f"Error getting achievements for child {child_id}: {str(e)}", exc_info=True)
             return [] 
\ No newline at end of file
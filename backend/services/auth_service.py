@@ -7,8 +7,11 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from bson import ObjectId
 import os
+import time
 from models import UserCreate, User
 from database import get_database
+from .cache import TTLCache
+from .password_hasher import PasswordHasher
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -18,6 +21,8 @@ logger = logging.getLogger(__name__)
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 7
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_MAX_SIZE = int(os.getenv("AUTH_CACHE_MAX_SIZE", "10000"))
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -26,6 +31,7 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 class AuthService:
     def __init__(self):
         self.pwd_context = pwd_context
+        self.hasher = PasswordHasher(pwd_context)
         self.secret_key = os.getenv("SECRET_KEY")
         if not self.secret_key:
             raise ValueError("SECRET_KEY not found in environment variables")
@@ -34,16 +40,30 @@ class AuthService:
         self.db = get_database()
         if self.db is None:
             raise ValueError("Database not initialized")
+
+        # Per-process caches: validated token -> user id, and user id -> User
+        self._token_cache = TTLCache(max_size=AUTH_CACHE_MAX_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+        self._user_cache = TTLCache(max_size=AUTH_CACHE_MAX_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
             
         logger.info("AuthService initialized")
 
-    def verify_password(self, plain_password: str, hashed_password: str) -> bool:
-        """Verify a password against its hash."""
-        return self.pwd_context.verify(plain_password, hashed_password)
+    def invalidate_user(self, user_id) -> None:
+        """Drop a cached user so the next request reloads it from the database."""
+        self._user_cache.pop(str(user_id))
+
+    def cache_stats(self) -> dict:
+        return {
+            "tokens": self._token_cache.stats(),
+            "users": self._user_cache.stats()
+        }
 
-    def get_password_hash(self, password: str) -> str:
-        """Generate password hash."""
-        return self.pwd_context.hash(password)
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        """Verify a password against its hash on the hashing pool."""
+        return await self.hasher.verify(plain_password, hashed_password)
+
+    async def get_password_hash(self, password: str) -> str:
+        """Generate password hash on the hashing pool."""
+        return await self.hasher.hash(password)
 
     async def create_user(self, user_data: UserCreate) -> dict:
         """Create a new user."""
@@ -54,7 +74,7 @@ class AuthService:
                 raise ValueError("Email already registered")
 
             # Hash password
-            hashed_password = self.get_password_hash(user_data.password)
+            hashed_password = await self.get_password_hash(user_data.password)
             
             # Create user document
             user_doc = {
@@ -83,6 +103,8 @@ class AuthService:
                         {"_id": child["_id"]},
                         {"$set": {"linked_parent": result.inserted_id}}
                     )
+                    self.invalidate_user(result.inserted_id)
+                    self.invalidate_user(child["_id"])
             
             return user_doc
 
@@ -104,7 +126,7 @@ class AuthService:
                 return None
 
             # Verify password
-            if not self.verify_password(password, user["hashed_password"]):
+            if not await self.verify_password(password, user["hashed_password"]):
                 logger.warning(f"Invalid password for user: {email}")
                 return None
 
@@ -117,6 +139,8 @@ class AuthService:
 
             return User(**user)
 
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Authentication error: {str(e)}")
             return None
@@ -168,16 +192,28 @@ class AuthService:
                     headers={"WWW-Authenticate": "Bearer"},
                 )
 
-            payload = jwt.decode(token, self.secret_key, algorithms=[ALGORITHM])
-            user_id = payload.get("user_id")
+            user_id = self._token_cache.get(token)
             if user_id is None:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Invalid token",
-                    headers={"WWW-Authenticate": "Bearer"},
-                )
+                payload = jwt.decode(token, self.secret_key, algorithms=[ALGORITHM])
+                user_id = payload.get("user_id")
+                if user_id is None:
+                    raise HTTPException(
+                        status_code=status.HTTP_401_UNAUTHORIZED,
+                        detail="Invalid token",
+                        headers={"WWW-Authenticate": "Bearer"},
+                    )
+
+                # Never keep a token cached past its own expiry
+                ttl = AUTH_CACHE_TTL_SECONDS
+                if payload.get("exp") is not None:
+                    ttl = min(ttl, payload["exp"] - time.time())
+                self._token_cache.set(token, user_id, ttl=ttl)
             
-            user = await self.get_user_by_id(user_id)
+            user = self._user_cache.get(str(user_id))
+            if user is None:
+                user = await self.get_user_by_id(user_id)
+                if user:
+                    self._user_cache.set(str(user_id), user)
             if not user:
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
@@ -232,6 +268,7 @@ class AuthService:
                 {"_id": ObjectId(user_id)},
                 {"$set": update_data}
             )
+            self.invalidate_user(user_id)
             if result.modified_count == 0:
                 return None
             return await self.db.users.find_one({"_id": ObjectId(user_id)})
@@ -245,6 +282,7 @@ class AuthService:
     async def delete_user(self, user_id: str) -> bool:
         try:
             result = await self.db.users.delete_one({"_id": ObjectId(user_id)})
+            self.invalidate_user(user_id)
             return result.deleted_count > 0
         except Exception as e:
             logger.error(f"Error deleting user: {e}")
@@ -261,17 +299,18 @@ class AuthService:
                 detail="User not found"
             )
 
-        if not self.verify_password(old_password, user["hashed_password"]):
+        if not await self.verify_password(old_password, user["hashed_password"]):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Incorrect password"
             )
 
-        hashed_password = self.get_password_hash(new_password)
+        hashed_password = await self.get_password_hash(new_password)
         result = await self.db.users.update_one(
             {"_id": ObjectId(user_id)},
             {"$set": {"hashed_password": hashed_password}}
         )
+        self.invalidate_user(user_id)
         return result.modified_count > 0
 
     async def get_linked_children(self, parent_id: str) -> list:
@@ -280,17 +319,25 @@ class AuthService:
             if not parent or parent.get("user_type") != "parent":
                 return []
 
-            children = []
-            for child_id in parent.get("linked_children", []):
-                child = await self.db.users.find_one({"_id": ObjectId(child_id)})
-                if child:
-                    children.append({
-                        "id": str(child["_id"]),
-                        "name": f"{child['name']} {child['last_name']}",
-                        "email": child["email"]
-                    })
-            return children
+            child_ids = [ObjectId(child_id) for child_id in parent.get("linked_children", [])]
+            return await self.get_children_by_ids(child_ids)
 
         except Exception as e:
             logger.error(f"Error fetching linked children: {str(e)}")
-            return [] 
\ No newline at end of file
+            return []
+
+    async def get_children_by_ids(self, child_ids: list) -> list:
+        """Fetch several children with a single $in query."""
+        object_ids = [ObjectId(child_id) for child_id in child_ids]
+        if not object_ids:
+            return []
+
+        children = await self.db.users.find(
+            {"_id": {"$in": object_ids}},
+            {"name": 1, "last_name": 1, "email": 1}
+        ).to_list(len(object_ids))
+        return [{
+            "id": str(child["_id"]),
+            "name": f"{child['name']} {child['last_name']}",
+            "email": child["email"]
+        } for child in children]
@@ -1,70 +1,329 @@
+import asyncio
 import logging
+import os
+import time
+from collections import deque
 from datetime import datetime
-from typing import Optional, List
-from fastapi import HTTPException
+from typing import Optional, List, AsyncIterator
+from fastapi import HTTPException, status
 from bson import ObjectId
 from database import get_database
-from langchain_groq import ChatGroq
-from langchain.schema import HumanMessage, SystemMessage
+from .cache import TTLCache
+from .context_builder import ContextBuilder
+from .latency import StageLatency
+from .llm_provider import get_chat_model
+from .llm_gateway import (
+    LLMGateway,
+    LLMOverloadedError,
+    PRIORITY_AUTHENTICATED,
+    PRIORITY_BACKGROUND,
+    PRIORITY_PUBLIC
+)
+from .response_cache import ResponseCache
+from .retrieval_service import RetrievalService
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+AUTHENTICATED_SYSTEM_MESSAGE = (
+    "You are a supportive mental health assistant. "
+    "Provide empathetic, helpful responses while maintaining professional boundaries. "
+    "If the user is in crisis, encourage them to seek professional help."
+)
+
+PUBLIC_SYSTEM_MESSAGE = (
+    "You are a supportive mental health assistant. "
+    "Provide general information and support while maintaining professional boundaries. "
+    "If the user is in crisis, encourage them to seek professional help."
+)
+
+FALLBACK_RESPONSE = "I apologize, but I'm having trouble processing your message. Please try again."
+CHAT_MEMORY_TURNS = int(os.getenv("CHAT_MEMORY_TURNS", "10"))
+CHAT_MEMORY_MAX_USERS = int(os.getenv("CHAT_MEMORY_MAX_USERS", "5000"))
+CHAT_MEMORY_TTL_SECONDS = float(os.getenv("CHAT_MEMORY_TTL_SECONDS", "1800"))
+
+SUMMARY_PROMPT = (
+    "You maintain a short running summary of a supportive mental health conversation. "
+    "Update the summary with the new exchanges below. Keep the facts, feelings and goals "
+    "the user shared that matter for future replies, in under 150 words.\n\n"
+    "Current summary:\n{summary}\n\nNew exchanges:\n{exchanges}\n\nUpdated summary:"
+)
+
 class ChatService:
-    def __init__(self, api_key: str):
-        self.chat = ChatGroq(
-            groq_api_key=api_key,
-            model_name="mixtral-8x7b-32768",
-            temperature=0.7,
-            max_tokens=1024
-        )
+    def __init__(self, chat_model=None, retrieval: Optional[RetrievalService] = None):
+        # Defaults to the process-wide model chosen by LLM_PROVIDER, created on first use
+        self._chat = chat_model
+        self.retrieval = retrieval or RetrievalService(enabled=False)
+        self.latency = StageLatency()
+        # All model calls share one concurrency limit and priority queue
+        self.gateway = LLMGateway(lambda: self.chat)
+        self.db = get_database()
+        # user id -> deque of the most recent turns, backed by chat_history
+        self._memory = TTLCache(max_size=CHAT_MEMORY_MAX_USERS, ttl=CHAT_MEMORY_TTL_SECONDS)
+        # user id -> running summary document from chat_summaries
+        self._summaries = TTLCache(max_size=CHAT_MEMORY_MAX_USERS, ttl=CHAT_MEMORY_TTL_SECONDS)
+        # user id -> [lock, tasks holding or waiting on it]; dropped when the last one leaves
+        self._summary_locks = {}
+        self.context_builder = ContextBuilder()
+        self.response_cache = ResponseCache()
+        self._pending_writes = set()
         logger.info("ChatService initialized")
 
-    async def get_response(self, user_id: str, message: str, user_type: str) -> str:
+    @property
+    def chat(self):
+        if self._chat is None:
+            self._chat = get_chat_model()
+        return self._chat
+
+    async def get_response(self, user_id: str, message: str, user_type: str, mood: Optional[str] = None) -> str:
         """Get a response from the chat model."""
         try:
-            # Create system message based on user type
-            system_message = (
-                "You are a supportive mental health assistant. "
-                "Provide empathetic, helpful responses while maintaining professional boundaries. "
-                "If the user is in crisis, encourage them to seek professional help."
-            )
-
             # Create messages
-            messages = [
-                SystemMessage(content=system_message),
-                HumanMessage(content=message)
-            ]
+            messages, overflow = await self._build_messages(user_id, message, mood)
 
             # Get response from model
-            response = await self.chat.ainvoke(messages)
+            started_at = time.perf_counter()
+            response = await self.gateway.invoke(messages, PRIORITY_AUTHENTICATED)
+            self.latency.record("llm", time.perf_counter() - started_at)
+            self._remember_turn(user_id, message, response.content, overflow)
             return response.content
 
+        except LLMOverloadedError as e:
+            logger.warning(f"Chat model overloaded: {str(e)}")
+            raise self._overloaded()
         except Exception as e:
             logger.error(f"Error getting chat response: {str(e)}")
-            return "I apologize, but I'm having trouble processing your message. Please try again."
+            return FALLBACK_RESPONSE
+
+    async def stream_response(self, user_id: str, message: str, user_type: str, mood: Optional[str] = None) -> AsyncIterator[str]:
+        """Stream a response from the chat model as it is generated."""
+        try:
+            messages, overflow = await self._build_messages(user_id, message, mood)
+        except Exception as e:
+            # Same answer as get_response, and nothing worth remembering
+            logger.error(f"Error building chat prompt: {str(e)}")
+            yield FALLBACK_RESPONSE
+            return
+
+        chunks = []
+        errors = []
+        started_at = time.perf_counter()
+        async for token in self._stream_tokens(messages, chunks, PRIORITY_AUTHENTICATED, errors):
+            if len(chunks) == 1:
+                self.latency.record("llm_first_token", time.perf_counter() - started_at)
+            yield token
+        self.latency.record("llm", time.perf_counter() - started_at)
+
+        # Hand the completed text to history persistence once the stream ends;
+        # a reply cut off part-way would end up in the history and summary
+        if chunks and not errors:
+            self._remember_turn(user_id, message, "".join(chunks), overflow)
+
+    async def stream_public_chat(self, message: str) -> AsyncIterator[str]:
+        """Stream a public chat response as it is generated."""
+        cached, cache_context = await self.response_cache.lookup(message)
+        if cached is not None:
+            yield cached
+            return
+
+        messages = self._public_messages(message)
+        chunks = []
+        errors = []
+        async for token in self._stream_tokens(messages, chunks, PRIORITY_PUBLIC, errors):
+            yield token
+
+        # Only complete answers are worth reusing
+        if chunks and not errors:
+            self.response_cache.store(cache_context, "".join(chunks))
+
+    def _public_messages(self, message: str) -> list:
+        from langchain.schema import HumanMessage, SystemMessage
+        return [
+            SystemMessage(content=PUBLIC_SYSTEM_MESSAGE),
+            HumanMessage(content=message)
+        ]
+
+    async def _stream_tokens(
+        self,
+        messages: list,
+        chunks: List[str],
+        priority: int,
+        errors: Optional[list] = None
+    ) -> AsyncIterator[str]:
+        """Yield non-empty tokens from the model stream, collecting them into chunks."""
+        try:
+            async for chunk in self.gateway.stream(messages, priority):
+                if chunk.content:
+                    chunks.append(chunk.content)
+                    yield chunk.content
+        except LLMOverloadedError as e:
+            # Admission fails before the first chunk, which the endpoint awaits
+            # before the response starts, so this still becomes a 503
+            logger.warning(f"Chat model overloaded: {str(e)}")
+            if errors is not None:
+                errors.append(e)
+            raise self._overloaded()
+        except Exception as e:
+            logger.error(f"Error streaming chat response: {str(e)}")
+            if errors is not None:
+                errors.append(e)
+            # Only fall back if nothing reached the client yet
+            if not chunks:
+                yield FALLBACK_RESPONSE
+
+    async def _build_messages(self, user_id: str, message: str, mood: Optional[str] = None):
+        """Pack the prompt within the token budget; also return turns that did not fit.
+
+        History, summary and retrieved passages are fetched concurrently, so
+        retrieval only adds latency when it is the slowest of the three.
+        """
+        started_at = time.perf_counter()
+        turns, summary, passages = await asyncio.gather(
+            self._timed("history", self._recent_turns(user_id)),
+            self._timed("summary", self._get_summary(user_id)),
+            self.retrieval.retrieve(message)
+        )
+        self.latency.record("context", time.perf_counter() - started_at)
+        return self.context_builder.build(
+            AUTHENTICATED_SYSTEM_MESSAGE,
+            list(turns),
+            message,
+            summary=summary.get("summary"),
+            mood=mood,
+            context=passages
+        )
+
+    async def _timed(self, stage: str, coroutine):
+        started_at = time.perf_counter()
+        try:
+            return await coroutine
+        finally:
+            self.latency.record(stage, time.perf_counter() - started_at)
+
+    async def _recent_turns(self, user_id: str) -> deque:
+        """Return the user's ring buffer, loading it from chat_history on a miss."""
+        turns = self._memory.get(user_id)
+        if turns is None:
+            history = await self.get_chat_history(user_id, limit=CHAT_MEMORY_TURNS)
+            turns = deque(history, maxlen=CHAT_MEMORY_TURNS)
+            self._memory.set(user_id, turns)
+        return turns
+
+    def _remember_turn(self, user_id: str, message: str, response: str, overflow: Optional[List[dict]] = None):
+        """Add a turn to the ring buffer and persist it off the response path."""
+        chat_doc = {
+            "user_id": ObjectId(user_id),
+            "message": message,
+            "response": response,
+            "timestamp": datetime.utcnow()
+        }
+        # Turns leaving the prompt, by budget or by ring buffer eviction, go into the summary
+        leaving = list(overflow or [])
+        turns = self._memory.get(user_id)
+        if turns is not None:
+            if len(turns) == turns.maxlen and not any(turn is turns[0] for turn in leaving):
+                leaving.insert(0, turns[0])
+            turns.append(chat_doc)
+
+        self._run_in_background(self._write_turn(chat_doc))
+        if leaving:
+            self._run_in_background(self._refresh_summary(user_id, leaving))
+
+    def _run_in_background(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self._pending_writes.add(task)
+        task.add_done_callback(self._pending_writes.discard)
+
+    async def _get_summary(self, user_id: str) -> dict:
+        """Return the user's running summary document, or an empty one."""
+        summary = self._summaries.get(user_id)
+        if summary is None:
+            summary = await self.db.chat_summaries.find_one(
+                {"user_id": ObjectId(user_id)},
+                {"_id": 0, "summary": 1, "summarized_until": 1}
+            ) or {}
+            self._summaries.set(user_id, summary)
+        return summary
+
+    async def _refresh_summary(self, user_id: str, turns: List[dict]):
+        """Fold turns that are no longer sent verbatim into the running summary."""
+        entry = self._summary_locks.setdefault(user_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                summary = await self._get_summary(user_id)
+                summarized_until = summary.get("summarized_until")
+                new_turns = [
+                    turn for turn in turns
+                    if summarized_until is None or turn["timestamp"] > summarized_until
+                ]
+                if not new_turns:
+                    return
+
+                exchanges = "\n".join(
+                    f"User: {turn['message']}\nAssistant: {turn['response']}" for turn in new_turns
+                )
+                prompt = SUMMARY_PROMPT.format(summary=summary.get("summary") or "(none)", exchanges=exchanges)
+                from langchain.schema import HumanMessage
+                result = await self.gateway.invoke([HumanMessage(content=prompt)], PRIORITY_BACKGROUND)
+
+                updated = {
+                    "summary": result.content.strip(),
+                    "summarized_until": max(turn["timestamp"] for turn in new_turns)
+                }
+                await self.db.chat_summaries.update_one(
+                    {"user_id": ObjectId(user_id)},
+                    {"$set": {**updated, "updated_at": datetime.utcnow()}},
+                    upsert=True
+                )
+                self._summaries.set(user_id, updated)
+        except Exception as e:
+            logger.error(f"Error refreshing chat summary for user {user_id}: {str(e)}")
+        finally:
+            # A released lock reads as unlocked before the woken waiter takes it,
+            # so count users instead of checking locked()
+            entry[1] -= 1
+            if not entry[1]:
+                self._summary_locks.pop(user_id, None)
+
+    async def _write_turn(self, chat_doc: dict):
+        try:
+            await self.db.chat_history.insert_one(chat_doc)
+        except Exception as e:
+            logger.error(f"Error persisting chat turn for user {chat_doc['user_id']}: {str(e)}")
+
+    async def drain(self):
+        """Wait for queued history writes, e.g. before shutdown."""
+        if self._pending_writes:
+            await asyncio.gather(*self._pending_writes, return_exceptions=True)
 
     async def public_chat(self, message: str) -> str:
-        """Handle public chat messages."""
+        """Handle public chat messages, reusing cached answers to repeated questions."""
         try:
-            system_message = (
-                "You are a supportive mental health assistant. "
-                "Provide general information and support while maintaining professional boundaries. "
-                "If the user is in crisis, encourage them to seek professional help."
-            )
+            cached, cache_context = await self.response_cache.lookup(message)
+            if cached is not None:
+                return cached
 
-            messages = [
-                SystemMessage(content=system_message),
-                HumanMessage(content=message)
-            ]
+            messages = self._public_messages(message)
 
-            response = await self.chat.ainvoke(messages)
+            response = await self.gateway.invoke(messages, PRIORITY_PUBLIC)
+            self.response_cache.store(cache_context, response.content)
             return response.content
 
+        except LLMOverloadedError as e:
+            logger.warning(f"Chat model overloaded: {str(e)}")
+            raise self._overloaded()
         except Exception as e:
             logger.error(f"Error in public chat: {str(e)}")
-            return "I apologize, but I'm having trouble processing your message. Please try again."
+            return FALLBACK_RESPONSE
+
+    def _overloaded(self) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The assistant is busy, please try again shortly",
+            headers={"Retry-After": "2"}
+        )
 
     async def save_chat_message(self, user_id: str, message: str, response: str):
         """Save chat message to database."""
@@ -95,7 +354,7 @@ class ChatService:
     async def get_chat_history(self, user_id: str, limit: int = 10) -> List[dict]:
         """Get chat history for a user."""
         try:
-            cursor = self.db.chat_messages.find(
+            cursor = self.db.chat_history.find(
                 {"user_id": ObjectId(user_id)}
             ).sort("timestamp", -1).limit(limit)
             
@@ -116,9 +375,12 @@ class ChatService:
     async def delete_chat_history(self, user_id: str) -> bool:
         """Delete all chat history for a user."""
         try:
-            result = await self.db.chat_messages.delete_many(
+            result = await self.db.chat_history.delete_many(
                 {"user_id": ObjectId(user_id)}
             )
+            await self.db.chat_summaries.delete_many({"user_id": ObjectId(user_id)})
+            self._memory.pop(user_id)
+            self._summaries.pop(user_id)
             logger.info(f"Deleted {result.deleted_count} messages for user {user_id}")
             return result.deleted_count > 0
         except Exception as e:
@@ -0,0 +1,97 @@
+import logging
+import os
+from typing import TYPE_CHECKING, Callable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from langchain.schema import BaseMessage
+
+logger = logging.getLogger(__name__)
+
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "3000"))
+
+# Fixed overhead per chat message for role markers and separators
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Loaded on first use; False once we know tiktoken is unavailable
+_encoding = None
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens with tiktoken when installed, otherwise estimate ~4 characters per token."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text))
+    return len(text) // 4 + 1
+
+
+class ContextBuilder:
+    """Packs a chat prompt into a fixed token budget.
+
+    The system message, optional mood line, running summary, retrieved
+    passages and the new user message are always sent. Remembered turns are added newest first until the
+    budget runs out; the ones that do not fit are returned so the caller can
+    fold them into the summary.
+    """
+
+    def __init__(self, token_budget: int = CHAT_CONTEXT_TOKEN_BUDGET, counter: Callable[[str], int] = count_tokens):
+        self.token_budget = token_budget
+        self.counter = counter
+
+    def build(
+        self,
+        system_message: str,
+        turns: List[dict],
+        message: str,
+        summary: Optional[str] = None,
+        mood: Optional[str] = None,
+        context: Optional[List[str]] = None
+    ) -> Tuple[List["BaseMessage"], List[dict]]:
+        from langchain.schema import AIMessage, HumanMessage, SystemMessage
+
+        system_content = system_message
+        if mood:
+            system_content += f"\nThe user's most recently logged mood is: {mood}."
+        if summary:
+            system_content += f"\nSummary of the earlier conversation: {summary}"
+        if context:
+            passages = "\n\n".join(context)
+            system_content += f"\nUse the following reference material when it is relevant:\n{passages}"
+
+        used = self._cost(system_content) + self._cost(message)
+        if used > self.token_budget:
+            logger.warning(f"Chat prompt needs {used} tokens before history, over the {self.token_budget} budget")
+
+        included = []
+        overflow = []
+        for index in range(len(turns) - 1, -1, -1):
+            turn = turns[index]
+            cost = self._cost(turn["message"]) + self._cost(turn["response"])
+            if used + cost > self.token_budget:
+                overflow = list(turns)[:index + 1]
+                break
+            used += cost
+            included.append(turn)
+        included.reverse()
+
+        messages = [SystemMessage(content=system_content)]
+        for turn in included:
+            messages.append(HumanMessage(content=turn["message"]))
+            messages.append(AIMessage(content=turn["response"]))
+        messages.append(HumanMessage(content=message))
+        return messages, overflow
+
+    def _cost(self, text: str) -> int:
+        return self.counter(text) + MESSAGE_OVERHEAD_TOKENS
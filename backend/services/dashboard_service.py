@@ -0,0 +1,151 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import List, Dict, Any
+from bson import ObjectId
+from database import get_database
+from .mood_service import rollup_day
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_MOOD_WINDOW_DAYS = 14
+DEFAULT_MOOD_LIMIT = 20
+
+class DashboardService:
+    def __init__(self):
+        self.db = get_database()
+        logger.info("DashboardService initialized")
+
+    async def get_parent_dashboard(
+        self,
+        child_ids: List[str],
+        mood_days: int = DEFAULT_MOOD_WINDOW_DAYS,
+        mood_limit: int = DEFAULT_MOOD_LIMIT
+    ) -> List[Dict[str, Any]]:
+        """
+        Build summaries for all linked children in a fixed number of round-trips.
+
+        Children are fetched with one $in query, then mood, progress and
+        achievement reads run concurrently, each batched across all children.
+        """
+        try:
+            object_ids = [ObjectId(child_id) for child_id in child_ids]
+            if not object_ids:
+                return []
+
+            children = await self.db.users.find(
+                {"_id": {"$in": object_ids}, "user_type": "student"},
+                {"name": 1, "last_name": 1, "email": 1}
+            ).to_list(len(object_ids))
+            if not children:
+                return []
+
+            found_ids = [child["_id"] for child in children]
+            since = datetime.utcnow() - timedelta(days=mood_days)
+            recent_moods, distributions, progress, achievements = await asyncio.gather(
+                self._recent_moods(found_ids, since, mood_limit),
+                self._mood_distributions(found_ids, since),
+                self._progress_summaries(found_ids),
+                self._achievement_summaries(found_ids)
+            )
+
+            dashboard = []
+            for child in children:
+                child_id = str(child["_id"])
+                dashboard.append({
+                    "id": child_id,
+                    "name": f"{child['name']} {child['last_name']}",
+                    "email": child["email"],
+                    "mood": {
+                        **distributions.get(child_id, {"entries": 0, "distribution": {}}),
+                        **recent_moods.get(child_id, {"latest": None, "recent": []})
+                    },
+                    "stats": progress.get(child_id, self._empty_progress_summary()),
+                    "achievements": achievements.get(child_id, {"total": 0, "latest": None})
+                })
+            return dashboard
+
+        except Exception as e:
+            logger.error(f"Error building parent dashboard: {str(e)}", exc_info=True)
+            raise
+
+    async def _recent_moods(self, child_ids: List[ObjectId], since: datetime, limit: int) -> Dict[str, Dict[str, Any]]:
+        """The latest mood entries within the window for every child, newest first."""
+        pipeline = [
+            {"$match": {"user_id": {"$in": child_ids}, "timestamp": {"$gte": since}}},
+            {"$sort": {"user_id": 1, "timestamp": -1}},
+            {"$group": {
+                "_id": "$user_id",
+                "recent": {"$push": {"_id": "$_id", "mood": "$mood", "note": "$note", "timestamp": "$timestamp"}}
+            }},
+            {"$project": {"recent": {"$slice": ["$recent", limit]}}}
+        ]
+
+        summaries = {}
+        async for group in self.db.mood_history.aggregate(pipeline):
+            recent = [{
+                "_id": str(entry["_id"]),
+                "mood": entry["mood"],
+                "note": entry.get("note", ""),
+                "timestamp": entry["timestamp"].isoformat()
+            } for entry in group["recent"]]
+
+            summaries[str(group["_id"])] = {
+                "latest": recent[0] if recent else None,
+                "recent": recent
+            }
+        return summaries
+
+    async def _mood_distributions(self, child_ids: List[ObjectId], since: datetime) -> Dict[str, Dict[str, Any]]:
+        """Mood counts per child over the window, read from the daily rollups."""
+        rollups = await self.db.mood_daily.find(
+            {"user_id": {"$in": child_ids}, "day": {"$gte": rollup_day(since)}},
+            {"_id": 0, "user_id": 1, "counts": 1, "entries": 1}
+        ).to_list(None)
+
+        summaries = {}
+        for rollup in rollups:
+            summary = summaries.setdefault(str(rollup["user_id"]), {"entries": 0, "distribution": {}})
+            summary["entries"] += rollup.get("entries", 0)
+            for mood, count in rollup.get("counts", {}).items():
+                summary["distribution"][mood] = summary["distribution"].get(mood, 0) + count
+        return summaries
+
+    async def _progress_summaries(self, child_ids: List[ObjectId]) -> Dict[str, Dict[str, Any]]:
+        """Totals per child from the pre-aggregated category counters."""
+        counters = await self.db.category_progress.find(
+            {"user_id": {"$in": child_ids}},
+            {"_id": 0, "user_id": 1, "category": 1, "total_sessions": 1, "total_minutes": 1, "last_session": 1}
+        ).to_list(None)
+
+        summaries = {}
+        for counter in counters:
+            summary = summaries.setdefault(str(counter["user_id"]), self._empty_progress_summary())
+            summary["totalSessions"] += counter.get("total_sessions", 0)
+            summary["totalMinutes"] += counter.get("total_minutes", 0)
+            summary["categoriesUsed"] += 1
+            last_session = counter.get("last_session")
+            if last_session and (summary["lastSession"] is None or last_session > summary["lastSession"]):
+                summary["lastSession"] = last_session
+        return summaries
+
+    async def _achievement_summaries(self, child_ids: List[ObjectId]) -> Dict[str, Dict[str, Any]]:
+        """Achievement counts per child."""
+        pipeline = [
+            {"$match": {"user_id": {"$in": child_ids}}},
+            {"$group": {
+                "_id": "$user_id",
+                "total": {"$sum": 1},
+                "latest": {"$max": "$timestamp"}
+            }}
+        ]
+
+        return {
+            str(group["_id"]): {"total": group["total"], "latest": group["latest"]}
+            async for group in self.db.achievements.aggregate(pipeline)
+        }
+
+    def _empty_progress_summary(self) -> Dict[str, Any]:
+        return {"totalSessions": 0, "totalMinutes": 0, "categoriesUsed": 0, "lastSession": None}
@@ -0,0 +1,178 @@
+import logging
+from datetime import datetime, timezone as dt_timezone
+from typing import Any, Dict, Iterable, List, Optional
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+from indexes import INDEXES
+
+logger = logging.getLogger(__name__)
+
+OBJECT_ID = "objectId"
+DATE = "date"
+
+# Stored BSON type of every id and date field, per collection. Writes go
+# through coerce(); migrate_field_types() converts documents written before.
+FIELD_TYPES: Dict[str, Dict[str, str]] = {
+    "mood_history": {"user_id": OBJECT_ID, "timestamp": DATE},
+    "mood_daily": {"user_id": OBJECT_ID, "day": DATE},
+    "chat_history": {"user_id": OBJECT_ID, "timestamp": DATE},
+    "progress": {"user_id": OBJECT_ID, "timestamp": DATE},
+    "category_progress": {"user_id": OBJECT_ID, "last_session": DATE},
+    "exercises": {"user_id": OBJECT_ID, "timestamp": DATE},
+    "achievements": {"user_id": OBJECT_ID, "timestamp": DATE},
+    "achievement_counters": {"user_id": OBJECT_ID},
+}
+
+# Python's isoformat() writes microseconds, but $dateFromString only parses milliseconds
+_MICROSECOND_TIMESTAMP = r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d{4,}$"
+_OBJECT_ID_STRING = r"^[0-9a-fA-F]{24}$"
+
+
+def object_id(value: Any) -> ObjectId:
+    """An id as ObjectId; raises ValueError for anything that is not one."""
+    if isinstance(value, ObjectId):
+        return value
+    if isinstance(value, str) and ObjectId.is_valid(value):
+        return ObjectId(value)
+    raise ValueError(f"Invalid ObjectId: {value}")
+
+
+def utc_datetime(value: Any) -> datetime:
+    """A datetime or ISO 8601 string as naive UTC, the way BSON dates come back from the driver."""
+    if isinstance(value, datetime):
+        timestamp = value
+    else:
+        try:
+            timestamp = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except ValueError:
+            raise ValueError(f"Invalid timestamp: {value}")
+    if timestamp.tzinfo:
+        timestamp = timestamp.astimezone(dt_timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def coerce(collection: str, document: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert the declared id and date fields of a document or filter in place and return it."""
+    for field, kind in FIELD_TYPES[collection].items():
+        value = document.get(field)
+        if value is None or isinstance(value, dict):
+            continue
+        document[field] = object_id(value) if kind == OBJECT_ID else utc_datetime(value)
+    return document
+
+
+def serialize(value: Any) -> Any:
+    """A document (or list of them) with ObjectIds as strings and datetimes as ISO strings, for responses."""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {key: serialize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [serialize(item) for item in value]
+    return value
+
+
+def _conversion(field: str, kind: str) -> Dict[str, Any]:
+    """Server-side expression converting a string field, leaving values it cannot parse untouched."""
+    if kind == OBJECT_ID:
+        return {"$convert": {"input": f"${field}", "to": "objectId", "onError": f"${field}"}}
+    return {"$dateFromString": {
+        "dateString": {"$cond": [
+            {"$regexMatch": {"input": f"${field}", "regex": _MICROSECOND_TIMESTAMP}},
+            {"$substrCP": [f"${field}", 0, 23]},
+            f"${field}"
+        ]},
+        "onError": f"${field}"
+    }}
+
+
+def _unique_keys(collection: str, field: str) -> List[Dict[str, Any]]:
+    """The declared unique indexes of a collection that include the field."""
+    return [
+        model.document for model in INDEXES.get(collection, [])
+        if model.document.get("unique") and field in model.document["key"]
+    ]
+
+
+async def _colliding_documents(db, collection: str, field: str) -> List[Any]:
+    """
+    _ids of documents whose string id would clash with an ObjectId-keyed copy under a unique index.
+
+    The copy is written by new code serving traffic before the migration ran,
+    e.g. a fresh achievement_counters document or a second award of a rule.
+    """
+    colliding = set()
+    for index in _unique_keys(collection, field):
+        keys = list(index["key"])
+        variables = {f"k{position}": f"${key}" for position, key in enumerate(keys)}
+        variables[f"k{keys.index(field)}"] = {"$toObjectId": f"${field}"}
+        pipeline = [
+            {"$match": {**index.get("partialFilterExpression", {}), field: {"$type": "string", "$regex": _OBJECT_ID_STRING}}},
+            {"$lookup": {
+                "from": collection,
+                "let": variables,
+                "pipeline": [
+                    {"$match": {"$expr": {"$and": [
+                        {"$eq": [f"${key}", f"$$k{position}"]} for position, key in enumerate(keys)
+                    ]}}},
+                    {"$limit": 1},
+                    {"$project": {"_id": 1}}
+                ],
+                "as": "converted"
+            }},
+            {"$match": {"converted": {"$ne": []}}},
+            {"$project": {"_id": 1}}
+        ]
+        async for document in db[collection].aggregate(pipeline):
+            colliding.add(document["_id"])
+    return list(colliding)
+
+
+async def migrate_field_types(db, collections: Optional[Iterable[str]] = None, dry_run: bool = False) -> Dict[str, Dict[str, Any]]:
+    """
+    Convert string ids and timestamps to ObjectId and BSON dates, entirely on the server.
+
+    Run this before code that writes ObjectIds takes traffic: until then
+    achievement counters restart from zero and existing exercises and
+    achievements are invisible to its queries.
+
+    Each field is one update_many with an aggregation pipeline, matching
+    only documents that still hold a convertible string, so the migration is
+    safe to re-run. Values that cannot be parsed are left as they are and
+    reported as remaining. String-keyed documents that would collide under a
+    unique index with an ObjectId-keyed copy written by new code are deleted
+    first (rerun backfill_achievements.py afterwards to recompute counters);
+    a field that still fails is reported with its error and the rest continue.
+    """
+    report = {}
+    for collection in collections or FIELD_TYPES:
+        fields = {}
+        for field, kind in FIELD_TYPES[collection].items():
+            query = {field: {"$type": "string"}}
+            if kind == OBJECT_ID:
+                query[field]["$regex"] = _OBJECT_ID_STRING
+            colliding = await _colliding_documents(db, collection, field) if kind == OBJECT_ID else []
+            if dry_run:
+                fields[field] = {"to_convert": await db[collection].count_documents(query), "collisions": len(colliding)}
+                continue
+            if colliding:
+                await db[collection].delete_many({"_id": {"$in": colliding}})
+                logger.warning(f"{collection}.{field}: removed {len(colliding)} string-keyed duplicates of converted documents")
+            try:
+                result = await db[collection].update_many(query, [{"$set": {field: _conversion(field, kind)}}])
+            except OperationFailure as e:
+                fields[field] = {"collisions_removed": len(colliding), "error": str(e)}
+                logger.error(f"{collection}.{field}: conversion failed: {str(e)}")
+                continue
+            remaining = await db[collection].count_documents({field: {"$type": "string"}})
+            fields[field] = {
+                "matched": result.matched_count,
+                "converted": result.modified_count,
+                "collisions_removed": len(colliding),
+                "remaining": remaining
+            }
+            logger.info(f"{collection}.{field}: converted {result.modified_count} values to {kind}, {remaining} left")
+        report[collection] = fields
+    return report
@@ -0,0 +1,143 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from array import array
+from typing import Dict, List
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache.sqlite3")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "500000"))
+
+# Check the size bound every this many inserts rather than on each one
+PRUNE_INTERVAL = 1000
+
+
+def text_key(text: str, kind: str = "document") -> str:
+    # Some models embed queries differently from documents, so they never share keys
+    return hashlib.sha256(f"{kind}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Disk-backed float32 embeddings keyed by the SHA-256 of the text.
+
+    Rows are stored per model version, and rows written by any other model
+    version are dropped when the cache opens, so switching models never
+    serves stale vectors. When the cache grows past ``max_entries`` the
+    oldest rows are evicted.
+    """
+
+    def __init__(self, model_version: str, path: str = EMBEDDING_CACHE_PATH, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.model_version = model_version
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, key TEXT NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, key))"
+        )
+        dropped = self._conn.execute("DELETE FROM embeddings WHERE model != ?", (model_version,)).rowcount
+        self._conn.commit()
+        if dropped:
+            logger.info(f"Dropped {dropped} cached embeddings from other model versions")
+        self._inserts = 0
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE model = ? AND key IN ({','.join('?' * len(batch))})",
+                    (self.model_version, *batch)
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+        self.hits += len(found)
+        self.misses += len(set(keys)) - len(found)
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]):
+        if not items:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, key, vector) VALUES (?, ?, ?)",
+                [(self.model_version, key, array("f", vector).tobytes()) for key, vector in items.items()]
+            )
+            self._inserts += len(items)
+            if self._inserts >= PRUNE_INTERVAL:
+                self._inserts = 0
+                self._prune()
+            self._conn.commit()
+
+    def _prune(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY rowid LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "model_version": self.model_version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps an embedding model so every text is only ever embedded once per model version."""
+
+    def __init__(self, model: Embeddings, cache: EmbeddingCache):
+        self.model = model
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [text_key(text) for text in texts]
+        found = self.cache.get_many(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        if missing:
+            # One batched model call for everything not cached yet
+            vectors = self.model.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = text_key(text, "query")
+        found = self.cache.get_many([key])
+        if key in found:
+            return found[key]
+        vector = self.model.embed_query(text)
+        self.cache.put_many({key: vector})
+        return vector
+
+    def stats(self) -> dict:
+        return self.cache.stats()
@@ -0,0 +1,48 @@
+import logging
+import os
+import threading
+from importlib.metadata import PackageNotFoundError, version
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_MODEL_REVISION = os.getenv("EMBEDDING_MODEL_REVISION")
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+
+_embeddings = None
+_lock = threading.Lock()
+
+def embedding_model_version() -> str:
+    """Identifies the model weights and library that produce the vectors."""
+    try:
+        library = version("sentence-transformers")
+    except PackageNotFoundError:
+        library = "unknown"
+    return f"{EMBEDDING_MODEL_NAME}@{EMBEDDING_MODEL_REVISION or 'default'}+sentence-transformers-{library}"
+
+def get_embeddings():
+    """Load the shared sentence-transformers embedding model once per process.
+
+    Unless EMBEDDING_CACHE_ENABLED is false the model is wrapped in the
+    persistent embedding cache, so ingestion, retrieval and the response
+    cache never embed the same text twice.
+    """
+    global _embeddings
+    if _embeddings is None:
+        with _lock:
+            if _embeddings is None:
+                from langchain_huggingface import HuggingFaceEmbeddings
+                model_kwargs = {"revision": EMBEDDING_MODEL_REVISION} if EMBEDDING_MODEL_REVISION else {}
+                embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME, model_kwargs=model_kwargs)
+                if EMBEDDING_CACHE_ENABLED:
+                    from .embedding_cache import CachedEmbeddings, EmbeddingCache
+                    embeddings = CachedEmbeddings(embeddings, EmbeddingCache(embedding_model_version()))
+                _embeddings = embeddings
+                logger.info(f"Loaded embedding model {EMBEDDING_MODEL_NAME}")
+    return _embeddings
+
+def embedding_cache_stats():
+    """Embedding cache metrics, or None when the model is not loaded or not cached."""
+    if _embeddings is None or not hasattr(_embeddings, "stats"):
+        return None
+    return _embeddings.stats()
@@ -1,7 +1,12 @@
-from typing import List, Dict, Any, Tuple
+import asyncio
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from database import get_database
 from .achievement_service import AchievementService
+from .documents import coerce, object_id, serialize
 import logging
 from bson import ObjectId
 
@@ -16,10 +21,10 @@ class ExerciseService:
     async def get_user_exercises(self, user_id: str) -> List[Dict[str, Any]]:
         try:
             exercises = await self.exercises_collection.find(
-                {"user_id": user_id}
+                {"user_id": object_id(user_id)}
             ).sort("timestamp", -1).to_list(length=None)
             
-            return exercises
+            return serialize(exercises)
         except Exception as e:
             logger.error(f"Error getting exercises for user {user_id}: {str(e)}")
             return []
@@ -37,47 +42,74 @@ class ExerciseService:
                 "category": exercise_data.get("category", "meditation"),
                 "duration": exercise_data.get("duration", 0),
                 "completed": exercise_data.get("completed", True),
-                "timestamp": exercise_data.get("timestamp", datetime.utcnow().isoformat()),
+                "timestamp": exercise_data.get("timestamp") or datetime.utcnow(),
                 "description": exercise_data.get("description", ""),
                 "difficulty": exercise_data.get("difficulty", "beginner"),
                 "steps": exercise_data.get("steps", [])
             }
+            try:
+                coerce("exercises", exercise)
+            except ValueError as e:
+                logger.error(f"Invalid exercise for user {user_id}: {str(e)}")
+                raise HTTPException(status_code=422, detail=str(e))
             
-            # Check if exercise already exists
-            existing_exercise = await self.exercises_collection.find_one({"_id": exercise_id})
-            if existing_exercise:
-                # Update existing exercise
-                await self.exercises_collection.update_one(
-                    {"_id": exercise_id},
-                    {"$set": exercise}
-                )
-                logger.info(f"Updated exercise {exercise_id} for user {user_id}")
+            if exercise_data.get("_id"):
+                # A client-chosen id may be a retry: one atomic upsert returns the previous
+                # version, so concurrent duplicates cannot both count as the first completion
+                previous = await self._upsert_exercise(exercise)
+                first_completion = exercise["completed"] and not (previous and previous.get("completed"))
+                achievements = []
+                if first_completion:
+                    achievements = await self._check_achievements(user_id, exercise)
             else:
-                # Insert new exercise
-                await self.exercises_collection.insert_one(exercise)
-                logger.info(f"Created exercise {exercise_id} for user {user_id}")
-            
-            # Check for achievements if exercise is completed
-            achievements = []
-            if exercise["completed"]:
-                try:
-                    achievements = await self.achievement_service.check_and_create_achievements(
-                        user_id,
-                        exercise
-                    )
-                    logger.info(f"Created {len(achievements)} achievements for exercise {exercise_id}")
-                except Exception as e:
-                    logger.error(f"Error creating achievements: {str(e)}")
+                # A server-generated id is always new, so both writes go out together
+                previous = None
+                _, achievements = await asyncio.gather(
+                    self._upsert_exercise(exercise),
+                    self._check_achievements(user_id, exercise) if exercise["completed"] else self._no_achievements()
+                )
+            logger.info(f"{'Updated' if previous else 'Created'} exercise {exercise_id} for user {user_id}")
             
-            return exercise, achievements
+            return serialize(exercise), serialize(achievements)
         except Exception as e:
             logger.error(f"Error creating exercise for user {user_id}: {str(e)}")
             raise
 
+    async def _upsert_exercise(self, exercise: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Insert or update in one round-trip; returns the previous version, or None if it is new.
+
+        The filter is scoped to the user, so an id that belongs to another
+        user's exercise fails the upsert's insert instead of taking it over.
+        """
+        fields = {key: value for key, value in exercise.items() if key != "_id"}
+        try:
+            return await self.exercises_collection.find_one_and_update(
+                {"_id": exercise["_id"], "user_id": exercise["user_id"]},
+                {"$set": fields},
+                projection={"completed": 1},
+                upsert=True,
+                return_document=ReturnDocument.BEFORE
+            )
+        except DuplicateKeyError:
+            logger.warning(f"Exercise id {exercise['_id']} already belongs to another user")
+            raise HTTPException(status_code=409, detail="Exercise id is already in use")
+
+    async def _check_achievements(self, user_id: str, exercise: Dict[str, Any]) -> List[Dict[str, Any]]:
+        try:
+            achievements = await self.achievement_service.check_and_create_achievements(user_id, exercise)
+            logger.info(f"Created {len(achievements)} achievements for exercise {exercise['_id']}")
+            return achievements
+        except Exception as e:
+            logger.error(f"Error creating achievements: {str(e)}")
+            return []
+
+    async def _no_achievements(self) -> List[Dict[str, Any]]:
+        return []
+
     async def get_exercise(self, exercise_id: str) -> Dict[str, Any]:
         try:
             exercise = await self.exercises_collection.find_one({"_id": exercise_id})
-            return exercise
+            return serialize(exercise)
         except Exception as e:
             logger.error(f"Error getting exercise {exercise_id}: {str(e)}")
             return None
@@ -86,10 +118,10 @@ class ExerciseService:
         try:
             result = await self.exercises_collection.find_one_and_update(
                 {"_id": exercise_id},
-                {"$set": update_data},
+                {"$set": coerce("exercises", dict(update_data))},
                 return_document=True
             )
-            return result
+            return serialize(result)
         except Exception as e:
             logger.error(f"Error updating exercise {exercise_id}: {str(e)}")
             raise 
\ No newline at end of file
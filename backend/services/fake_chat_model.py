@@ -0,0 +1,125 @@
+import asyncio
+import hashlib
+import random
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+LATENCY_DISTRIBUTIONS = ("constant", "uniform", "normal", "lognormal")
+
+# Canned supportive sentences the fake answers are assembled from
+RESPONSE_SENTENCES = [
+    "Thank you for sharing that with me.",
+    "It sounds like you are carrying a lot right now.",
+    "Your feelings are valid, and it is okay to take things one step at a time.",
+    "Try taking a few slow, deep breaths and notice how your body feels.",
+    "Would it help to talk about what has been on your mind today?",
+    "Small routines like a short walk or regular sleep can make a real difference.",
+    "If things ever feel overwhelming, reaching out to someone you trust can help.",
+    "You do not have to figure everything out at once.",
+]
+
+# One generator per process so a seeded run is reproducible across calls
+_rng = random.Random()
+
+
+class FakeLLMError(Exception):
+    """An injected upstream failure; carries an HTTP status like provider SDK errors do."""
+
+    def __init__(self, status_code: int, message: str = "Injected fake LLM error"):
+        super().__init__(f"{message} (status {status_code})")
+        self.status_code = status_code
+
+
+class FakeChatModel(BaseChatModel):
+    """A local chat model for offline benchmarks and load tests.
+
+    Replies are deterministic for a given prompt: canned sentences are picked
+    by hashing the last message. Time to first token follows the configured
+    latency distribution (``latency_ms`` is its mean, ``latency_jitter`` its
+    spread), every further token costs ``token_latency_ms``, and each call
+    fails before its first token with probability ``error_rate``.
+    """
+
+    latency_distribution: str = "lognormal"
+    latency_ms: float = 800.0
+    latency_jitter: float = 0.5
+    token_latency_ms: float = 20.0
+    response_tokens: int = 60
+    error_rate: float = 0.0
+    error_status_code: int = 503
+    seed: Optional[int] = None
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        if self.latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {self.latency_distribution}")
+        if self.seed is not None:
+            _rng.seed(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def sample_latency(self) -> float:
+        """Seconds until the first token."""
+        mean = self.latency_ms / 1000
+        jitter = self.latency_jitter
+        if self.latency_distribution == "uniform":
+            return _rng.uniform(mean * max(0.0, 1 - jitter), mean * (1 + jitter))
+        if self.latency_distribution == "normal":
+            return max(0.0, _rng.gauss(mean, mean * jitter))
+        if self.latency_distribution == "lognormal":
+            # Parameterized so the distribution's mean stays at latency_ms
+            return mean * _rng.lognormvariate(-jitter * jitter / 2, jitter)
+        return mean
+
+    def _maybe_fail(self):
+        if self.error_rate and _rng.random() < self.error_rate:
+            raise FakeLLMError(self.error_status_code)
+
+    def _tokens(self, messages: List[BaseMessage]) -> List[str]:
+        prompt = str(messages[-1].content) if messages else ""
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        words = []
+        index = 0
+        while len(words) < self.response_tokens:
+            sentence = RESPONSE_SENTENCES[digest[index % len(digest)] % len(RESPONSE_SENTENCES)]
+            words.extend(sentence.split())
+            index += 1
+        words = words[:self.response_tokens]
+        return [word if i == len(words) - 1 else word + " " for i, word in enumerate(words)]
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        tokens = self._tokens(messages)
+        time.sleep(self.sample_latency())
+        self._maybe_fail()
+        time.sleep(len(tokens) * self.token_latency_ms / 1000)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens)))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        tokens = self._tokens(messages)
+        await asyncio.sleep(self.sample_latency())
+        self._maybe_fail()
+        await asyncio.sleep(len(tokens) * self.token_latency_ms / 1000)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens)))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        tokens = self._tokens(messages)
+        time.sleep(self.sample_latency())
+        self._maybe_fail()
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(self.token_latency_ms / 1000)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        tokens = self._tokens(messages)
+        await asyncio.sleep(self.sample_latency())
+        self._maybe_fail()
+        for i, token in enumerate(tokens):
+            if i:
+                await asyncio.sleep(self.token_latency_ms / 1000)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
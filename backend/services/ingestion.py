@@ -0,0 +1,190 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+from .embeddings import get_embeddings
+from .vector_index import open_collection
+
+logger = logging.getLogger(__name__)
+
+DOCUMENTS_DIRECTORY = os.getenv("DOCUMENTS_DIRECTORY", "data")
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(min(4, os.cpu_count() or 1))))
+INGEST_EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "256"))
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+
+MANIFEST_FILE = "ingest_manifest.json"
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_id(source: str, text: str) -> str:
+    """Chunk ids are content hashes, so re-adding an unchanged chunk is a no-op."""
+    return hashlib.sha256(f"{source}\0{text}".encode("utf-8")).hexdigest()
+
+
+def parse_pdf(path: str, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP) -> List[dict]:
+    """Load and split one PDF. Runs in a worker process, so it only returns plain data."""
+    from langchain_community.document_loaders import PyPDFLoader
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    pages = PyPDFLoader(path).load()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    chunks = {}
+    for document in splitter.split_documents(pages):
+        metadata = {
+            key: value for key, value in document.metadata.items()
+            if isinstance(value, (str, int, float, bool))
+        }
+        metadata["source"] = path
+        chunks.setdefault(chunk_id(path, document.page_content), {
+            "text": document.page_content,
+            "metadata": metadata
+        })
+    return [{"id": key, **chunk} for key, chunk in chunks.items()]
+
+
+class DocumentIngestor:
+    """Incrementally syncs the PDFs in a directory into the Chroma store.
+
+    A manifest next to the store records each ingested file's content hash.
+    Unchanged files are skipped, changed and new files are parsed in a
+    process pool, and only chunks whose ids are not in the store yet are
+    embedded, in large batches. Vectors of removed files and outdated chunks
+    are deleted. A file is only written to the manifest after all of its
+    chunks are stored, so an interrupted run picks up where it left off.
+    """
+
+    def __init__(
+        self,
+        persist_directory: str,
+        documents_directory: str = DOCUMENTS_DIRECTORY,
+        workers: int = INGEST_WORKERS,
+        batch_size: int = INGEST_EMBED_BATCH_SIZE
+    ):
+        self.persist_directory = persist_directory
+        self.documents_directory = documents_directory
+        self.workers = workers
+        self.batch_size = batch_size
+        self.manifest_path = os.path.join(persist_directory, MANIFEST_FILE)
+        self.collection = None
+        self._chunker = f"recursive:{CHUNK_SIZE}:{CHUNK_OVERLAP}"
+
+    def run(self, full: bool = False) -> Dict[str, int]:
+        started_at = time.perf_counter()
+        os.makedirs(self.persist_directory, exist_ok=True)
+        self.collection = open_collection(self.persist_directory)
+        manifest = self._load_manifest()
+
+        stats = {
+            "files": 0, "unchanged": 0, "ingested": 0, "removed": 0, "failed": 0,
+            "chunks_embedded": 0, "chunks_reused": 0, "chunks_deleted": 0
+        }
+
+        paths = sorted(glob.glob(os.path.join(self.documents_directory, "*.pdf")))
+        stats["files"] = len(paths)
+        current = {}
+        for path in paths:
+            current[path] = file_hash(path)
+
+        for path in list(manifest["files"]):
+            if path not in current:
+                stats["chunks_deleted"] += self._delete_source(path)
+                del manifest["files"][path]
+                stats["removed"] += 1
+        if full or manifest.get("chunker") != self._chunker:
+            manifest = {"chunker": self._chunker, "files": {}}
+        self._save_manifest(manifest)
+
+        changed = [
+            path for path, digest in current.items()
+            if manifest["files"].get(path, {}).get("hash") != digest
+        ]
+        stats["unchanged"] = len(current) - len(changed)
+
+        pending_chunks = []
+        pending_files = []
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(parse_pdf, path): path for path in changed}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    chunks = future.result()
+                except Exception as e:
+                    logger.error(f"Failed to parse {path}: {str(e)}")
+                    stats["failed"] += 1
+                    continue
+
+                new_chunks = self._missing(chunks)
+                stats["chunks_reused"] += len(chunks) - len(new_chunks)
+                pending_chunks.extend(new_chunks)
+                pending_files.append((path, current[path], {chunk["id"] for chunk in chunks}))
+                if len(pending_chunks) >= self.batch_size:
+                    self._flush(pending_chunks, pending_files, manifest, stats)
+                    pending_chunks, pending_files = [], []
+
+        self._flush(pending_chunks, pending_files, manifest, stats)
+        logger.info(
+            f"Ingested {stats['ingested']} of {stats['files']} files in "
+            f"{time.perf_counter() - started_at:.1f}s: {stats}"
+        )
+        return stats
+
+    def _flush(self, chunks: List[dict], files: List[tuple], manifest: dict, stats: Dict[str, int]):
+        """Embed and store pending chunks, then record their files as done."""
+        embeddings = get_embeddings()
+        for start in range(0, len(chunks), self.batch_size):
+            batch = chunks[start:start + self.batch_size]
+            vectors = embeddings.embed_documents([chunk["text"] for chunk in batch])
+            self.collection.upsert(
+                ids=[chunk["id"] for chunk in batch],
+                embeddings=vectors,
+                documents=[chunk["text"] for chunk in batch],
+                metadatas=[chunk["metadata"] for chunk in batch]
+            )
+            stats["chunks_embedded"] += len(batch)
+
+        for path, digest, chunk_ids in files:
+            stats["chunks_deleted"] += self._delete_source(path, keep=chunk_ids)
+            manifest["files"][path] = {"hash": digest, "chunks": len(chunk_ids)}
+            stats["ingested"] += 1
+        if files:
+            self._save_manifest(manifest)
+
+    def _missing(self, chunks: List[dict]) -> List[dict]:
+        if not chunks:
+            return []
+        existing = set(self.collection.get(ids=[chunk["id"] for chunk in chunks], include=[])["ids"])
+        return [chunk for chunk in chunks if chunk["id"] not in existing]
+
+    def _delete_source(self, path: str, keep: Optional[set] = None) -> int:
+        """Delete a file's vectors except the ids in keep; also clears chunks from older, unmanifested builds."""
+        ids = self.collection.get(where={"source": path}, include=[])["ids"]
+        stale = [id_ for id_ in ids if not keep or id_ not in keep]
+        if stale:
+            self.collection.delete(ids=stale)
+        return len(stale)
+
+    def _load_manifest(self) -> dict:
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"chunker": self._chunker, "files": {}}
+
+    def _save_manifest(self, manifest: dict):
+        # Write then rename so a crash never leaves a half-written manifest
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
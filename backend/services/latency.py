@@ -0,0 +1,24 @@
+from typing import Dict
+
+
+class StageLatency:
+    """Running count, mean and max duration per named request stage."""
+
+    def __init__(self):
+        self._stages: Dict[str, list] = {}
+
+    def record(self, stage: str, seconds: float):
+        totals = self._stages.setdefault(stage, [0, 0.0, 0.0])
+        totals[0] += 1
+        totals[1] += seconds
+        totals[2] = max(totals[2], seconds)
+
+    def stats(self) -> dict:
+        return {
+            stage: {
+                "count": count,
+                "avg_ms": 1000 * total / count if count else 0.0,
+                "max_ms": 1000 * longest
+            }
+            for stage, (count, total, longest) in self._stages.items()
+        }
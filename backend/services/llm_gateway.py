@@ -0,0 +1,187 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import random
+import time
+from typing import Any, AsyncIterator, Callable, List
+
+logger = logging.getLogger(__name__)
+
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "100"))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "10"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "8"))
+
+# Lower values are served first
+PRIORITY_AUTHENTICATED = 0
+PRIORITY_PUBLIC = 1
+PRIORITY_BACKGROUND = 2
+
+
+class LLMOverloadedError(Exception):
+    """Raised when a call cannot get an LLM slot within the queue limits."""
+
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limits, upstream 5xx errors and timeouts are worth retrying."""
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(error, "response", None), "status_code", None)
+    if status_code is not None:
+        return status_code == 429 or status_code >= 500
+    name = type(error).__name__
+    return name in ("RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError", "TimeoutError")
+
+
+class LLMGateway:
+    """Admission control in front of a chat model.
+
+    At most ``max_in_flight`` calls run at once. Further callers wait in a
+    priority queue (authenticated chat before public chat before background
+    work) for up to ``queue_timeout`` seconds; when the queue already holds
+    ``max_queue`` callers new ones are rejected immediately. Retryable upstream
+    errors are retried with full-jitter exponential backoff.
+    """
+
+    def __init__(
+        self,
+        get_model: Callable[[], Any],
+        max_in_flight: int = LLM_MAX_IN_FLIGHT,
+        max_queue: int = LLM_MAX_QUEUE,
+        queue_timeout: float = LLM_QUEUE_TIMEOUT_SECONDS,
+        max_retries: int = LLM_MAX_RETRIES
+    ):
+        # Resolved per call so the model client can be created lazily
+        self.get_model = get_model
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self._waiters: List[tuple] = []
+        self._sequence = itertools.count()
+        self.in_flight = 0
+
+        # Metrics
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.retries = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    async def invoke(self, messages: list, priority: int = PRIORITY_AUTHENTICATED) -> Any:
+        """Call the model once a slot is free, retrying retryable failures."""
+        await self._acquire(priority)
+        try:
+            attempt = 0
+            while True:
+                try:
+                    result = await self.get_model().ainvoke(messages)
+                    self.completed += 1
+                    return result
+                except Exception as e:
+                    if attempt >= self.max_retries or not is_retryable(e):
+                        self.failed += 1
+                        raise
+                    attempt += 1
+                    await self._backoff(attempt, e)
+        finally:
+            self._release()
+
+    async def stream(self, messages: list, priority: int = PRIORITY_AUTHENTICATED) -> AsyncIterator[Any]:
+        """Stream from the model while holding a slot; retries only before the first chunk."""
+        await self._acquire(priority)
+        try:
+            attempt = 0
+            while True:
+                started = False
+                try:
+                    async for chunk in self.get_model().astream(messages):
+                        started = True
+                        yield chunk
+                    self.completed += 1
+                    return
+                except Exception as e:
+                    if started or attempt >= self.max_retries or not is_retryable(e):
+                        self.failed += 1
+                        raise
+                    attempt += 1
+                    await self._backoff(attempt, e)
+        finally:
+            self._release()
+
+    async def _acquire(self, priority: int):
+        # Slots are always handed to live waiters first, so a free slot means nobody is waiting
+        if self.in_flight < self.max_in_flight:
+            self.in_flight += 1
+            return
+
+        queue_depth = self._queue_depth()
+        if queue_depth >= self.max_queue:
+            self.rejected += 1
+            raise LLMOverloadedError(f"LLM queue is full ({queue_depth} waiting)")
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._sequence), future)
+        heapq.heappush(self._waiters, entry)
+        queued_at = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we gave up; pass it on
+                self._release()
+            else:
+                future.cancel()
+            self.timed_out += 1
+            raise LLMOverloadedError(f"Timed out after {self.queue_timeout}s waiting for an LLM slot")
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()
+            else:
+                future.cancel()
+            raise
+        finally:
+            waited = time.perf_counter() - queued_at
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+
+    def _release(self):
+        """Hand the slot to the highest-priority live waiter, or free it."""
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(True)
+                return
+        self.in_flight -= 1
+
+    def _queue_depth(self) -> int:
+        # Timed-out waiters stay in the heap until popped, so count only live ones
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    async def _backoff(self, attempt: int, error: Exception):
+        delay = random.uniform(0, min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * 2 ** attempt))
+        self.retries += 1
+        logger.warning(f"Retrying LLM call in {delay:.2f}s after {type(error).__name__}: {str(error)}")
+        await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        waits = self.completed + self.failed + self.timed_out
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": self._queue_depth(),
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "retries": self.retries,
+            "avg_queue_wait_ms": 1000 * self._total_wait / waits if waits else 0.0,
+            "max_queue_wait_ms": 1000 * self._max_wait
+        }
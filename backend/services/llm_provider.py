@@ -0,0 +1,63 @@
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LLM_PROVIDER = "groq"
+DEFAULT_LLM_MODEL_NAME = "llama-3.3-70b-versatile"
+
+_chat_model = None
+_lock = threading.Lock()
+
+
+def _create_groq_model():
+    from langchain_groq import ChatGroq
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key:
+        raise ValueError("GROQ_API_KEY not found in environment variables")
+    return ChatGroq(
+        groq_api_key=api_key,
+        model_name=os.getenv("LLM_MODEL_NAME", DEFAULT_LLM_MODEL_NAME),
+        temperature=float(os.getenv("LLM_TEMPERATURE", "0.7")),
+        max_tokens=int(os.getenv("LLM_MAX_TOKENS", "1024"))
+    )
+
+
+def _create_fake_model():
+    from .fake_chat_model import FakeChatModel
+    seed = os.getenv("FAKE_LLM_SEED")
+    return FakeChatModel(
+        latency_distribution=os.getenv("FAKE_LLM_LATENCY_DISTRIBUTION", "lognormal"),
+        latency_ms=float(os.getenv("FAKE_LLM_LATENCY_MS", "800")),
+        latency_jitter=float(os.getenv("FAKE_LLM_LATENCY_JITTER", "0.5")),
+        token_latency_ms=float(os.getenv("FAKE_LLM_TOKEN_LATENCY_MS", "20")),
+        response_tokens=int(os.getenv("FAKE_LLM_RESPONSE_TOKENS", "60")),
+        error_rate=float(os.getenv("FAKE_LLM_ERROR_RATE", "0")),
+        error_status_code=int(os.getenv("FAKE_LLM_ERROR_STATUS", "503")),
+        seed=int(seed) if seed else None
+    )
+
+
+PROVIDERS = {
+    "groq": _create_groq_model,
+    "fake": _create_fake_model,
+}
+
+
+def get_chat_model():
+    """Create the chat model selected by LLM_PROVIDER once per process and share it.
+
+    Settings are read on first use, so scripts can load their .env file
+    before asking for the model.
+    """
+    global _chat_model
+    if _chat_model is None:
+        with _lock:
+            if _chat_model is None:
+                provider = os.getenv("LLM_PROVIDER", DEFAULT_LLM_PROVIDER).lower()
+                if provider not in PROVIDERS:
+                    raise ValueError(f"Unknown LLM_PROVIDER '{provider}', expected one of: {', '.join(PROVIDERS)}")
+                _chat_model = PROVIDERS[provider]()
+                logger.info(f"Initialized {provider} chat model")
+    return _chat_model
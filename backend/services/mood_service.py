@@ -1,17 +1,38 @@
 import logging
-from datetime import datetime
-from typing import List, Optional
+import asyncio
+import os
+from datetime import datetime, timezone as dt_timezone
+from typing import List, Optional, Dict, Any
 from fastapi import HTTPException
 from bson import ObjectId
 from database import get_database
+from .cache import TTLCache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+MAX_PAGE_SIZE = 100
+DEFAULT_CHILD_PAGE_SIZE = 50
+INSIGHTS_CACHE_TTL_SECONDS = float(os.getenv("INSIGHTS_CACHE_TTL_SECONDS", "300"))
+INSIGHTS_CACHE_MAX_USERS = int(os.getenv("INSIGHTS_CACHE_MAX_USERS", "5000"))
+INSIGHTS_RANGES_PER_USER = 16
+
+def rollup_day(timestamp: datetime) -> datetime:
+    """UTC midnight of the day a timestamp falls on."""
+    if timestamp.tzinfo:
+        timestamp = timestamp.astimezone(dt_timezone.utc)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+
+def rollup_key(mood: str) -> str:
+    """Make a mood label safe to use as a field name in the counts map."""
+    return mood.replace(".", "_").lstrip("$") or "unknown"
+
 class MoodService:
     def __init__(self):
         self.db = get_database()
+        # user id -> {(start, end, timezone): insights}
+        self._insights_cache = TTLCache(max_size=INSIGHTS_CACHE_MAX_USERS, ttl=INSIGHTS_CACHE_TTL_SECONDS)
         logger.info("MoodService initialized")
 
     async def save_mood_entry(self, user_id: str, mood_data: dict) -> dict:
@@ -25,8 +46,12 @@ class MoodService:
                 "timestamp": datetime.utcnow()
             }
             
-            # Insert into database
-            result = await self.db.mood_history.insert_one(mood_doc)
+            # Insert the entry and update its daily rollup concurrently
+            result, _ = await asyncio.gather(
+                self.db.mood_history.insert_one(mood_doc),
+                self._update_daily_rollup(mood_doc)
+            )
+            self.invalidate_insights(user_id)
             
             # Convert ObjectId to string for response
             response_doc = {
@@ -44,42 +69,42 @@ class MoodService:
             logger.error(f"Error saving mood entry: {str(e)}")
             raise
 
-    async def get_mood_history(self, user_id: str, limit: int = 10) -> list:
-        """Get mood history for a user."""
+    def invalidate_insights(self, user_id: str):
+        """Forget cached insights after the user's mood history changes."""
+        self._insights_cache.pop(str(user_id))
+
+    async def get_mood_history(
+        self,
+        user_id: str,
+        limit: int = 10,
+        before: Optional[datetime] = None,
+        after: Optional[datetime] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        before_id: Optional[str] = None,
+        after_id: Optional[str] = None
+    ) -> list:
+        """Get a page of mood history for a user, newest first."""
         try:
-            cursor = self.db.mood_history.find(
-                {"user_id": ObjectId(user_id)}
-            ).sort("timestamp", -1).limit(limit)
-            
-            mood_history = await cursor.to_list(None)
-            
-            # Convert ObjectIds to strings
-            for entry in mood_history:
-                entry["_id"] = str(entry["_id"])
-                entry["user_id"] = str(entry["user_id"])
-                entry["timestamp"] = entry["timestamp"].isoformat()
-            
-            return mood_history
-            
+            return await self._get_history_page(user_id, limit, before, after, start, end, before_id, after_id)
         except Exception as e:
             logger.error(f"Error getting mood history: {str(e)}")
             raise
 
-    async def get_child_mood_history(self, child_id: str) -> list:
-        """Get mood history for a child."""
+    async def get_child_mood_history(
+        self,
+        child_id: str,
+        limit: int = DEFAULT_CHILD_PAGE_SIZE,
+        before: Optional[datetime] = None,
+        after: Optional[datetime] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        before_id: Optional[str] = None,
+        after_id: Optional[str] = None
+    ) -> list:
+        """Get a page of mood history for a child, newest first."""
         try:
-            cursor = self.db.mood_history.find(
-                {"user_id": ObjectId(child_id)}
-            ).sort("timestamp", -1)
-            
-            mood_history = await cursor.to_list(None)
-            
-            # Convert ObjectIds to strings
-            for entry in mood_history:
-                entry["_id"] = str(entry["_id"])
-                entry["user_id"] = str(entry["user_id"])
-                entry["timestamp"] = entry["timestamp"].isoformat()
-            
+            mood_history = await self._get_history_page(child_id, limit, before, after, start, end, before_id, after_id)
             logger.info(f"Retrieved {len(mood_history)} mood entries for child {child_id}")
             return mood_history
             
@@ -87,6 +112,266 @@ class MoodService:
             logger.error(f"Error getting child mood history: {str(e)}", exc_info=True)
             raise
 
+    async def _get_history_page(
+        self,
+        user_id: str,
+        limit: int,
+        before: Optional[datetime],
+        after: Optional[datetime],
+        start: Optional[datetime],
+        end: Optional[datetime],
+        before_id: Optional[str] = None,
+        after_id: Optional[str] = None
+    ) -> list:
+        """
+        Read one page of entries through the (user_id, timestamp, _id) index.
+
+        `before`/`after` are exclusive cursors taken from the last/first entry of
+        the previous page; `start`/`end` bound the overall time range. Entries
+        often share a timestamp (sync batches, imports), so the cursor is the
+        (timestamp, _id) pair whenever the entry id is passed along with it.
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        timestamp_filter = {}
+        if start:
+            timestamp_filter["$gte"] = start
+        if end:
+            timestamp_filter["$lte"] = end
+
+        query = {"user_id": ObjectId(user_id)}
+        if timestamp_filter:
+            query["timestamp"] = timestamp_filter
+        cursors = []
+        if before:
+            cursors.append(self._page_cursor("$lt", before, before_id))
+        if after:
+            cursors.append(self._page_cursor("$gt", after, after_id))
+        if cursors:
+            query["$and"] = cursors
+
+        # Paging forward from `after` walks the index oldest-first
+        sort_direction = 1 if after and not before else -1
+        cursor = self.db.mood_history.find(query).sort(
+            [("timestamp", sort_direction), ("_id", sort_direction)]
+        ).limit(limit)
+        mood_history = await cursor.to_list(limit)
+        if sort_direction == 1:
+            mood_history.reverse()
+        
+        # Convert ObjectIds to strings
+        for entry in mood_history:
+            entry["_id"] = str(entry["_id"])
+            entry["user_id"] = str(entry["user_id"])
+            entry["timestamp"] = entry["timestamp"].isoformat()
+        
+        return mood_history
+
+    @staticmethod
+    def _page_cursor(operator: str, timestamp: datetime, entry_id: Optional[str]) -> Dict[str, Any]:
+        """Entries strictly past a cursor entry in (timestamp, _id) order."""
+        if not entry_id:
+            return {"timestamp": {operator: timestamp}}
+        return {"$or": [
+            {"timestamp": {operator: timestamp}},
+            {"timestamp": timestamp, "_id": {operator: ObjectId(entry_id)}}
+        ]}
+
+    async def get_mood_insights(
+        self,
+        user_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        timezone: str = "UTC"
+    ) -> Dict[str, Any]:
+        """Compute mood analytics for a date range with a single aggregation."""
+        cache_key = (start, end, timezone)
+        cached = self._insights_cache.get(str(user_id))
+        if cached and cache_key in cached:
+            return cached[cache_key]
+
+        try:
+            match = {"user_id": ObjectId(user_id)}
+            timestamp_filter = {}
+            if start:
+                timestamp_filter["$gte"] = start
+            if end:
+                timestamp_filter["$lte"] = end
+            if timestamp_filter:
+                match["timestamp"] = timestamp_filter
+
+            day = {"$dateTrunc": {"date": "$timestamp", "unit": "day", "timezone": timezone}}
+            week = {"$dateTrunc": {"date": "$timestamp", "unit": "week", "startOfWeek": "monday", "timezone": timezone}}
+            pipeline = [
+                {"$match": match},
+                {"$facet": {
+                    "distribution": [
+                        {"$group": {"_id": "$mood", "count": {"$sum": 1}}},
+                        {"$sort": {"count": -1, "_id": 1}}
+                    ],
+                    "daily": self._bucket_stages(day),
+                    "weekly": self._bucket_stages(week),
+                    "streaks": [
+                        {"$group": {"_id": day}},
+                        {"$setWindowFields": {
+                            "sortBy": {"_id": 1},
+                            "output": {"position": {"$documentNumber": {}}}
+                        }},
+                        # Consecutive days share the same anchor once their position is subtracted
+                        {"$group": {
+                            "_id": {"$dateSubtract": {"startDate": "$_id", "unit": "day", "amount": "$position", "timezone": timezone}},
+                            "start": {"$min": "$_id"},
+                            "end": {"$max": "$_id"},
+                            "days": {"$sum": 1}
+                        }},
+                        {"$sort": {"end": -1}},
+                        {"$addFields": {"today": {"$dateTrunc": {"date": "$$NOW", "unit": "day", "timezone": timezone}}}}
+                    ]
+                }}
+            ]
+
+            facets = (await self.db.mood_history.aggregate(pipeline).to_list(1))[0]
+            distribution = {group["_id"]: group["count"] for group in facets["distribution"]}
+            total_entries = sum(distribution.values())
+            insights = {"total_entries": total_entries}
+            if total_entries:
+                streaks = facets["streaks"]
+                latest = streaks[0]
+                # A streak is still current if its last day is today or yesterday
+                current_streak = latest["days"] if (latest["today"] - latest["end"]).days <= 1 else 0
+                insights.update({
+                    "mood_distribution": distribution,
+                    "most_common_mood": facets["distribution"][0]["_id"],
+                    "mood_trend": self._format_buckets(facets["daily"]),
+                    "weekly_trend": self._format_buckets(facets["weekly"]),
+                    "streaks": {
+                        "current": current_streak,
+                        "longest": max(streak["days"] for streak in streaks),
+                        "last_entry_day": latest["end"].isoformat()
+                    }
+                })
+
+            cached = cached if cached and len(cached) < INSIGHTS_RANGES_PER_USER else {}
+            cached[cache_key] = insights
+            self._insights_cache.set(str(user_id), cached)
+            return insights
+
+        except Exception as e:
+            logger.error(f"Error computing mood insights: {str(e)}", exc_info=True)
+            raise
+
+    def _bucket_stages(self, period: dict) -> list:
+        """Group entries into time buckets with a per-mood breakdown."""
+        return [
+            {"$group": {"_id": {"period": period, "mood": "$mood"}, "count": {"$sum": 1}}},
+            {"$group": {
+                "_id": "$_id.period",
+                "entries": {"$sum": "$count"},
+                "moods": {"$push": {"k": "$_id.mood", "v": "$count"}}
+            }},
+            {"$project": {"entries": 1, "moods": {"$arrayToObject": "$moods"}}},
+            {"$sort": {"_id": 1}}
+        ]
+
+    def _format_buckets(self, buckets: list) -> list:
+        return [{
+            "date": bucket["_id"].isoformat(),
+            "entries": bucket["entries"],
+            "moods": bucket["moods"]
+        } for bucket in buckets]
+
+    async def _update_daily_rollup(self, mood_doc: dict):
+        """Fold one entry into its (user_id, day) rollup document."""
+        timestamp = mood_doc["timestamp"]
+        await self.db.mood_daily.update_one(
+            {"user_id": mood_doc["user_id"], "day": rollup_day(timestamp)},
+            {
+                "$inc": {f"counts.{rollup_key(mood_doc['mood'])}": 1, "entries": 1},
+                "$min": {"first_timestamp": timestamp},
+                "$max": {"last_timestamp": timestamp}
+            },
+            upsert=True
+        )
+
+    async def get_daily_rollups(
+        self,
+        user_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """Get per-day mood counts for a user, oldest first."""
+        try:
+            query = {"user_id": ObjectId(user_id)}
+            day_filter = {}
+            if start:
+                day_filter["$gte"] = rollup_day(start)
+            if end:
+                day_filter["$lte"] = end
+            if day_filter:
+                query["day"] = day_filter
+
+            rollups = await self.db.mood_daily.find(query, {"_id": 0, "user_id": 0}).sort("day", 1).to_list(None)
+            for rollup in rollups:
+                rollup["day"] = rollup["day"].date().isoformat()
+                rollup["first_timestamp"] = rollup["first_timestamp"].isoformat()
+                rollup["last_timestamp"] = rollup["last_timestamp"].isoformat()
+            return rollups
+
+        except Exception as e:
+            logger.error(f"Error getting daily mood rollups: {str(e)}")
+            raise
+
+    async def backfill_daily_rollups(self, user_id: Optional[str] = None):
+        """
+        Rebuild mood_daily from mood_history entirely on the server.
+
+        Matching rollups are replaced, so the command is safe to re-run; entries
+        saved while it runs may need another pass.
+        """
+        match = {"user_id": ObjectId(user_id)} if user_id else {}
+        day = {"$dateTrunc": {"date": "$timestamp", "unit": "day"}}
+        # Same key as rollup_key(): dots replaced, leading "$" stripped, "unknown" if empty.
+        # Grouping on the key sums labels that map to the same one, as live $inc writes do.
+        key = {"$let": {
+            "vars": {"key": {"$ltrim": {
+                "input": {"$replaceAll": {"input": {"$ifNull": ["$mood", ""]}, "find": ".", "replacement": "_"}},
+                "chars": {"$literal": "$"}
+            }}},
+            "in": {"$cond": [{"$eq": ["$$key", ""]}, "unknown", "$$key"]}
+        }}
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": {"user_id": "$user_id", "day": day, "mood": key},
+                "count": {"$sum": 1},
+                "first_timestamp": {"$min": "$timestamp"},
+                "last_timestamp": {"$max": "$timestamp"}
+            }},
+            {"$group": {
+                "_id": {"user_id": "$_id.user_id", "day": "$_id.day"},
+                "counts": {"$push": {"k": "$_id.mood", "v": "$count"}},
+                "entries": {"$sum": "$count"},
+                "first_timestamp": {"$min": "$first_timestamp"},
+                "last_timestamp": {"$max": "$last_timestamp"}
+            }},
+            {"$project": {
+                "_id": 0,
+                "user_id": "$_id.user_id",
+                "day": "$_id.day",
+                "counts": {"$arrayToObject": "$counts"},
+                "entries": 1,
+                "first_timestamp": 1,
+                "last_timestamp": 1
+            }},
+            {"$merge": {
+                "into": "mood_daily",
+                "on": ["user_id", "day"],
+                "whenMatched": "replace",
+                "whenNotMatched": "insert"
+            }}
+        ]
+        await self.db.mood_history.aggregate(pipeline, allowDiskUse=True).to_list(None)
+        logger.info(f"Backfilled daily mood rollups for {'user ' + user_id if user_id else 'all users'}")
+
     async def get_latest_mood(self, user_id: str) -> dict:
         """Get the latest mood entry for a user."""
         try:
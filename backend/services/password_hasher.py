@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+logger = logging.getLogger(__name__)
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+PASSWORD_HASH_MAX_WAIT_SECONDS = float(os.getenv("PASSWORD_HASH_MAX_WAIT_SECONDS", "5"))
+
+
+class PasswordHasher:
+    """Runs bcrypt hashing and verification on a small dedicated thread pool.
+
+    bcrypt releases the GIL while hashing, so worker threads run in parallel
+    without blocking the event loop. At most ``max_workers`` jobs run at once;
+    up to ``max_queue`` further callers wait for a slot for at most
+    ``max_wait`` seconds, and anyone beyond that is rejected with a 503.
+    """
+
+    def __init__(
+        self,
+        pwd_context: CryptContext,
+        max_workers: int = PASSWORD_HASH_WORKERS,
+        max_queue: int = PASSWORD_HASH_MAX_QUEUE,
+        max_wait: float = PASSWORD_HASH_MAX_WAIT_SECONDS
+    ):
+        self.pwd_context = pwd_context
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self._slots = asyncio.Semaphore(max_workers)
+
+        # Metrics
+        self.queue_depth = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._total_wait = 0.0
+        self._total_hash_time = 0.0
+        self._max_hash_time = 0.0
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.pwd_context.hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(self.pwd_context.verify, plain_password, hashed_password)
+
+    async def _run(self, func, *args):
+        """Wait for a free worker slot, then run func on the pool."""
+        if self.queue_depth >= self.max_queue:
+            self.rejected += 1
+            logger.warning(f"Password hashing queue full ({self.queue_depth} waiting)")
+            raise self._overloaded()
+
+        queued_at = time.perf_counter()
+        self.queue_depth += 1
+        # Shielded so a timeout cannot cancel an acquire that has just succeeded
+        acquire = asyncio.ensure_future(self._slots.acquire())
+        try:
+            await asyncio.wait_for(asyncio.shield(acquire), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            self._abandon(acquire)
+            self.timed_out += 1
+            logger.warning(f"Timed out after {self.max_wait}s waiting for a password hashing slot")
+            raise self._overloaded()
+        except asyncio.CancelledError:
+            self._abandon(acquire)
+            raise
+        finally:
+            self.queue_depth -= 1
+
+        started_at = time.perf_counter()
+        self._total_wait += started_at - queued_at
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            elapsed = time.perf_counter() - started_at
+            self.in_flight -= 1
+            self.completed += 1
+            self._total_hash_time += elapsed
+            self._max_hash_time = max(self._max_hash_time, elapsed)
+            self._slots.release()
+
+    def _abandon(self, acquire: asyncio.Future):
+        """Stop waiting for a slot, handing it back if it was granted just as we gave up."""
+        acquire.cancel()
+        acquire.add_done_callback(self._return_slot)
+
+    def _return_slot(self, acquire: asyncio.Future):
+        if not acquire.cancelled():
+            self._slots.release()
+
+    def _overloaded(self) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication is busy, please try again shortly",
+            headers={"Retry-After": "1"}
+        )
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_wait_ms": 1000 * self._total_wait / self.completed if self.completed else 0.0,
+            "avg_hash_ms": 1000 * self._total_hash_time / self.completed if self.completed else 0.0,
+            "max_hash_ms": 1000 * self._max_hash_time
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -3,7 +3,10 @@ from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any
 from fastapi import HTTPException
 from bson import ObjectId
+from pymongo import UpdateOne
 from database import get_database
+from .documents import utc_datetime
+from .mood_service import MoodService
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -14,6 +17,7 @@ class ProgressService:
         self.db = get_database()
         self.progress_collection = self.db.progress
         self.category_progress_collection = self.db.category_progress
+        self.mood_service = MoodService()
         logger.info("ProgressService initialized")
 
     async def save_progress(self, progress_data: dict) -> dict:
@@ -60,13 +64,23 @@ class ProgressService:
                     detail="Invalid duration value"
                 )
 
+            # Timestamps are stored as BSON dates
+            try:
+                timestamp = utc_datetime(progress_data['timestamp']) if progress_data.get('timestamp') else datetime.utcnow()
+            except ValueError as e:
+                logger.error(f"Invalid timestamp value: {progress_data.get('timestamp')}")
+                raise HTTPException(
+                    status_code=422,
+                    detail=str(e)
+                )
+
             # Prepare progress entry
             progress_entry = {
                 'user_id': user_id_obj,
                 'type': progress_data['type'],
                 'category': progress_data['category'],
                 'duration': duration,
-                'timestamp': progress_data.get('timestamp', datetime.now().isoformat()),
+                'timestamp': timestamp,
             }
 
             if 'exercise_id' in progress_data:
@@ -109,64 +123,19 @@ class ProgressService:
                 detail=f"Failed to save progress: {str(e)}"
             )
 
-    async def _update_category_progress(self, user_id: ObjectId, category: str, duration: float, timestamp: str):
-        """Update the category progress collection with the new progress entry."""
+    async def _update_category_progress(self, user_id: ObjectId, category: str, duration: float, timestamp: datetime):
+        """Apply a new progress entry to the category counters in one atomic upsert."""
         try:
             logger.info(f"Updating category progress for user {user_id}, category {category}")
-            
-            # Find existing category progress
-            category_progress = await self.category_progress_collection.find_one({
-                "user_id": user_id,
-                "category": category
-            })
-
-            logger.info(f"Existing category progress found: {category_progress is not None}")
-
-            # Get all progress entries for this user and category
-            progress_entries = await self.progress_collection.find({
-                "user_id": user_id,
-                "category": category
-            }).to_list(None)
-
-            # Calculate accurate totals from progress entries
-            total_sessions = len(progress_entries)
-            total_minutes = sum(entry.get("duration", 0) for entry in progress_entries)
-            last_session = max(
-                (entry.get("timestamp") for entry in progress_entries),
-                default=timestamp
+            await self.category_progress_collection.update_one(
+                {"user_id": user_id, "category": category},
+                {
+                    "$inc": {"total_sessions": 1, "total_minutes": duration},
+                    "$max": {"last_session": timestamp}
+                },
+                upsert=True
             )
 
-            if category_progress:
-                # Update existing category progress with accurate totals
-                update_result = await self.category_progress_collection.update_one(
-                    {"_id": category_progress["_id"]},
-                    {
-                        "$set": {
-                            "total_sessions": total_sessions,
-                            "total_minutes": total_minutes,
-                            "last_session": last_session
-                        }
-                    }
-                )
-                logger.info(f"Updated existing category progress. Modified count: {update_result.modified_count}")
-            else:
-                # Create new category progress with accurate totals
-                insert_result = await self.category_progress_collection.insert_one({
-                    "user_id": user_id,
-                    "category": category,
-                    "total_sessions": total_sessions,
-                    "total_minutes": total_minutes,
-                    "last_session": last_session
-                })
-                logger.info(f"Created new category progress with ID: {insert_result.inserted_id}")
-
-            # Verify the update
-            updated_progress = await self.category_progress_collection.find_one({
-                "user_id": user_id,
-                "category": category
-            })
-            logger.info(f"Verified category progress after update: {updated_progress}")
-
         except Exception as e:
             logger.error(f"Error updating category progress: {str(e)}")
             raise HTTPException(
@@ -174,6 +143,51 @@ class ProgressService:
                 detail=f"Failed to update category progress: {str(e)}"
             )
 
+    async def rebuild_category_progress(self, user_id: Optional[str] = None, batch_size: int = 1000) -> Dict[str, int]:
+        """
+        Recompute category counters from the progress collection.
+
+        Meant to run offline to repair drift in the incremental counters; writes
+        racing with it may be overwritten by the recomputed totals.
+        """
+        match = {"user_id": ObjectId(user_id)} if user_id else {}
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": {"user_id": "$user_id", "category": "$category"},
+                "total_sessions": {"$sum": 1},
+                "total_minutes": {"$sum": "$duration"},
+                "last_session": {"$max": "$timestamp"}
+            }}
+        ]
+
+        stats = {"groups": 0, "upserted": 0, "modified": 0}
+        operations = []
+        async for group in self.progress_collection.aggregate(pipeline, allowDiskUse=True):
+            operations.append(UpdateOne(
+                {"user_id": group["_id"]["user_id"], "category": group["_id"]["category"]},
+                {"$set": {
+                    "total_sessions": group["total_sessions"],
+                    "total_minutes": group["total_minutes"],
+                    "last_session": group["last_session"]
+                }},
+                upsert=True
+            ))
+            if len(operations) >= batch_size:
+                await self._flush_category_rebuild(operations, stats)
+                operations = []
+        if operations:
+            await self._flush_category_rebuild(operations, stats)
+
+        logger.info(f"Rebuilt category progress: {stats}")
+        return stats
+
+    async def _flush_category_rebuild(self, operations: List[UpdateOne], stats: Dict[str, int]):
+        result = await self.category_progress_collection.bulk_write(operations, ordered=False)
+        stats["groups"] += len(operations)
+        stats["upserted"] += result.upserted_count
+        stats["modified"] += result.modified_count
+
     async def get_progress(self, user_id: str) -> Dict[str, Any]:
         try:
             # Convert string user_id to ObjectId
@@ -298,44 +312,62 @@ class ProgressService:
     async def get_child_category_stats(self, child_id: str, category: str) -> Dict:
         """Get category-specific progress for a child."""
         try:
-            entries = await self.db.progress.find({
-                "user_id": ObjectId(child_id),
-                "category": category
-            }).to_list(None)
-
-            if not entries:
+            totals = await self._read_category_totals(ObjectId(child_id), category)
+            if totals is None:
                 return {
                     "totalSessions": 0,
                     "totalMinutes": 0,
                     "lastSession": None
                 }
 
-            total_sessions = len(entries)
-            total_minutes = sum(entry.get("duration", 0) for entry in entries)
-            last_session = max(
-                (entry.get("timestamp") for entry in entries),
-                default=None
-            )
-
             return {
-                "totalSessions": total_sessions,
-                "totalMinutes": total_minutes,
-                "lastSession": last_session
+                "totalSessions": totals["total_sessions"],
+                "totalMinutes": totals["total_minutes"],
+                "lastSession": totals["last_session"]
             }
         except Exception as e:
             logger.error(f"Error getting child category stats: {str(e)}")
             raise
 
-    async def get_child_mood_history(self, child_id: str) -> List[Dict]:
-        """Get mood history for a specific child."""
-        try:
-            entries = await self.db.mood_entries.find({
-                "user_id": ObjectId(child_id)
-            }).sort("timestamp", -1).to_list(None)
-            return entries
-        except Exception as e:
-            logger.error(f"Error getting child mood history: {str(e)}")
-            raise
+    async def get_child_mood_history(self, child_id: str, **page) -> List[Dict]:
+        """Get a page of mood history for a specific child."""
+        return await self.mood_service.get_child_mood_history(child_id, **page)
+
+    async def _read_category_totals(self, user_id: ObjectId, category: str) -> Optional[Dict[str, Any]]:
+        """
+        Read category totals without writing anything.
+
+        Served from the pre-aggregated category_progress document, falling back
+        to a server-side $group over progress entries when it does not exist.
+        """
+        counters = await self.category_progress_collection.find_one(
+            {"user_id": user_id, "category": category},
+            {"_id": 0, "total_sessions": 1, "total_minutes": 1, "last_session": 1}
+        )
+        if counters:
+            return {
+                "total_sessions": counters.get("total_sessions", 0),
+                "total_minutes": counters.get("total_minutes", 0),
+                "last_session": counters.get("last_session")
+            }
+
+        groups = await self.progress_collection.aggregate([
+            {"$match": {"user_id": user_id, "category": category}},
+            {"$group": {
+                "_id": None,
+                "total_sessions": {"$sum": 1},
+                "total_minutes": {"$sum": "$duration"},
+                "last_session": {"$max": "$timestamp"}
+            }}
+        ]).to_list(1)
+        if not groups:
+            return None
+
+        return {
+            "total_sessions": groups[0]["total_sessions"],
+            "total_minutes": groups[0]["total_minutes"],
+            "last_session": groups[0]["last_session"]
+        }
 
     async def get_progress_by_category(self, user_id: str, category: str) -> Dict[str, Any]:
         """Get category-specific progress for a user."""
@@ -362,41 +394,14 @@ class ProgressService:
 
             logger.info(f"Getting progress for category {category} and user: {user_id}")
             
-            # Find all progress entries for this user and category
-            progress_entries = await self.progress_collection.find({
-                "user_id": user_id_obj,
-                "category": category
-            }).to_list(None)
-
-            if not progress_entries:
+            result = await self._read_category_totals(user_id_obj, category)
+            if result is None:
                 logger.info(f"No progress entries found for user {user_id} in category {category}")
                 return {
                     "total_sessions": 0,
                     "total_minutes": 0,
                     "last_session": None
                 }
-
-            # Calculate totals
-            total_sessions = len(progress_entries)
-            total_minutes = sum(entry.get("duration", 0) for entry in progress_entries)
-            last_session = max(
-                (entry.get("timestamp") for entry in progress_entries),
-                default=None
-            )
-
-            # Update category progress
-            await self._update_category_progress(
-                user_id_obj,
-                category,
-                total_minutes,
-                last_session
-            )
-
-            result = {
-                "total_sessions": total_sessions,
-                "total_minutes": total_minutes,
-                "last_session": last_session
-            }
             
             logger.info(f"Progress data for user {user_id} in category {category}: {result}")
             return result
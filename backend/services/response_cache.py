@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import os
+import re
+import time
+from typing import Optional, Tuple
+from .cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "86400"))
+RESPONSE_CACHE_MAX_SIZE = int(os.getenv("RESPONSE_CACHE_MAX_SIZE", "2000"))
+RESPONSE_CACHE_SEMANTIC = os.getenv("RESPONSE_CACHE_SEMANTIC", "true").lower() == "true"
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.92"))
+
+# Messages that may signal a crisis always get a fresh, individual answer
+CRISIS_PATTERN = re.compile(
+    r"suicid|kill (my ?self|me)|end (my|it all)|want to die|don'?t want to (live|be here)|"
+    r"self[- ]?harm|hurt(ing)? my ?self|cut(ting)? my ?self|overdose|no reason to live|"
+    r"better off dead|abuse|in danger|emergency",
+    re.IGNORECASE
+)
+
+def normalize_message(message: str) -> str:
+    """Lowercase, collapse whitespace and drop surrounding punctuation."""
+    return re.sub(r"\s+", " ", message.lower()).strip(" \t\n.,!?;:'\"")
+
+
+class SemanticIndex:
+    """A fixed-size ring of unit-normalized query vectors searched with one matrix product."""
+
+    def __init__(self, max_size: int, ttl: float):
+        import numpy as np
+        self.np = np
+        self.max_size = max_size
+        self.ttl = ttl
+        self._vectors = None
+        self._responses = [None] * max_size
+        self._expires_at = np.zeros(max_size)
+        self._next = 0
+
+    def search(self, vector) -> Tuple[Optional[str], float]:
+        if self._vectors is None:
+            return None, 0.0
+        scores = self._vectors @ vector
+        scores[self._expires_at <= time.monotonic()] = -1.0
+        best = int(self.np.argmax(scores))
+        return self._responses[best], float(scores[best])
+
+    def add(self, vector, response: str):
+        if self._vectors is None:
+            self._vectors = self.np.zeros((self.max_size, vector.shape[0]), dtype=self.np.float32)
+        slot = self._next
+        self._vectors[slot] = vector
+        self._responses[slot] = response
+        self._expires_at[slot] = time.monotonic() + self.ttl
+        self._next = (slot + 1) % self.max_size
+
+    def __len__(self) -> int:
+        return int((self._expires_at > time.monotonic()).sum())
+
+
+class ResponseCache:
+    """Two-layer cache for stateless public chat replies.
+
+    Exact matches on the normalized message are served from an LRU; otherwise
+    the message embedding is compared against recent cached questions and the
+    closest answer is reused when it clears the similarity threshold.
+    """
+
+    def __init__(
+        self,
+        max_size: int = RESPONSE_CACHE_MAX_SIZE,
+        ttl: float = RESPONSE_CACHE_TTL_SECONDS,
+        semantic: bool = RESPONSE_CACHE_SEMANTIC,
+        threshold: float = RESPONSE_CACHE_SIMILARITY
+    ):
+        self.exact = TTLCache(max_size=max_size, ttl=ttl)
+        self.threshold = threshold
+        self.semantic = None
+        if semantic:
+            try:
+                self.semantic = SemanticIndex(max_size, ttl)
+            except ImportError:
+                logger.warning("numpy is not installed; semantic response caching disabled")
+
+        # Metrics
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._embed_time = 0.0
+        self._embed_calls = 0
+
+    async def lookup(self, message: str) -> Tuple[Optional[str], Optional[dict]]:
+        """
+        Return (cached response, store context).
+
+        Pass the context to store() after generating a fresh response; it is
+        None when the message must not be cached.
+        """
+        if CRISIS_PATTERN.search(message):
+            self.bypassed += 1
+            return None, None
+
+        key = normalize_message(message)
+        response = self.exact.get(key)
+        if response is not None:
+            self.exact_hits += 1
+            return response, None
+
+        vector = None
+        if self.semantic is not None:
+            try:
+                vector = await self._embed(key)
+                response, score = self.semantic.search(vector)
+                if response is not None and score >= self.threshold:
+                    self.semantic_hits += 1
+                    self.exact.set(key, response)
+                    return response, None
+            except Exception as e:
+                logger.error(f"Semantic response cache lookup failed: {str(e)}")
+
+        self.misses += 1
+        return None, {"key": key, "vector": vector}
+
+    def store(self, context: Optional[dict], response: str):
+        if context is None:
+            return
+        self.exact.set(context["key"], response)
+        if self.semantic is not None and context["vector"] is not None:
+            self.semantic.add(context["vector"], response)
+
+    async def _embed(self, text: str):
+        from .embeddings import get_embeddings
+        started_at = time.perf_counter()
+        embedding = await asyncio.to_thread(get_embeddings().embed_query, text)
+        self._embed_time += time.perf_counter() - started_at
+        self._embed_calls += 1
+
+        vector = self.semantic.np.asarray(embedding, dtype=self.semantic.np.float32)
+        norm = self.semantic.np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def stats(self) -> dict:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+            "exact_entries": len(self.exact),
+            "semantic_entries": len(self.semantic) if self.semantic is not None else 0,
+            "similarity_threshold": self.threshold,
+            "avg_embed_ms": 1000 * self._embed_time / self._embed_calls if self._embed_calls else 0.0
+        }
@@ -0,0 +1,226 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import List
+from .cache import TTLCache
+from .context_builder import count_tokens
+from .embeddings import get_embeddings
+from .latency import StageLatency
+from .vector_index import VECTOR_BACKEND, LocalIndexStore, mmr, store_signature
+
+logger = logging.getLogger(__name__)
+
+RAG_ENABLED = os.getenv("RAG_ENABLED", "true").lower() == "true"
+CHROMA_PERSIST_DIRECTORY = os.getenv("CHROMA_PERSIST_DIRECTORY", "./chroma_db")
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "4"))
+RAG_CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "600"))
+RAG_TIMEOUT_SECONDS = float(os.getenv("RAG_TIMEOUT_SECONDS", "0.25"))
+RAG_MMR = os.getenv("RAG_MMR", "true").lower() == "true"
+RAG_MMR_FETCH_K = int(os.getenv("RAG_MMR_FETCH_K", "20"))
+RAG_MMR_LAMBDA = float(os.getenv("RAG_MMR_LAMBDA", "0.5"))
+RETRIEVAL_CACHE_MAX_SIZE = int(os.getenv("RETRIEVAL_CACHE_MAX_SIZE", "2048"))
+RETRIEVAL_CACHE_TTL_SECONDS = float(os.getenv("RETRIEVAL_CACHE_TTL_SECONDS", "3600"))
+# How often to check whether ingestion has changed the store
+RETRIEVAL_REFRESH_SECONDS = float(os.getenv("RETRIEVAL_REFRESH_SECONDS", "30"))
+
+# Query vectors are rounded to this many decimals to form cache keys
+CACHE_KEY_DECIMALS = 4
+
+
+class RetrievalService:
+    """Grounding passages for chat prompts from the vector store built by ingestion.
+
+    The embedding model and the search backend (Chroma itself, or an
+    in-process numpy or HNSW index exported from it, chosen by
+    VECTOR_BACKEND) are loaded once by load(). Each search embeds the query,
+    takes the top-k passages (reranked with maximal marginal relevance over
+    a wider candidate set when RAG_MMR is on) and caches them by normalized
+    query vector. The cache is cleared, and local indexes reloaded, when
+    ingestion changes the store. retrieve() keeps as many passages as fit
+    the context token budget and gives up after the timeout so the chat
+    reply is not held up.
+    """
+
+    def __init__(
+        self,
+        persist_directory: str = CHROMA_PERSIST_DIRECTORY,
+        top_k: int = RAG_TOP_K,
+        token_budget: int = RAG_CONTEXT_TOKEN_BUDGET,
+        timeout: float = RAG_TIMEOUT_SECONDS,
+        enabled: bool = RAG_ENABLED,
+        backend: str = VECTOR_BACKEND,
+        use_mmr: bool = RAG_MMR,
+        fetch_k: int = RAG_MMR_FETCH_K,
+        mmr_lambda: float = RAG_MMR_LAMBDA
+    ):
+        self.persist_directory = persist_directory
+        self.backend_name = backend
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self.timeout = timeout
+        self.enabled = enabled
+        self.use_mmr = use_mmr
+        self.fetch_k = max(fetch_k, top_k)
+        self.mmr_lambda = mmr_lambda
+        self.backend = None
+        self.store = None
+        self.cache = TTLCache(max_size=RETRIEVAL_CACHE_MAX_SIZE, ttl=RETRIEVAL_CACHE_TTL_SECONDS)
+        self.latency = StageLatency()
+        self._cache_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._signature = None
+        self._checked_at = 0.0
+
+        # Metrics
+        self.timed_out = 0
+        self.failed = 0
+        self.invalidations = 0
+
+    @property
+    def ready(self) -> bool:
+        return self.backend is not None
+
+    async def load(self):
+        """Load the embedding model and the search backend off the event loop."""
+        await asyncio.to_thread(self.load_sync)
+
+    def load_sync(self):
+        if not self.enabled:
+            logger.info("Retrieval disabled by RAG_ENABLED")
+            return
+        if not os.path.isdir(self.persist_directory):
+            logger.warning(f"No vector store at {self.persist_directory}; chat runs without retrieval")
+            return
+        try:
+            started_at = time.perf_counter()
+            # Run one query so the model weights are loaded before the first request
+            get_embeddings().embed_query("warm up")
+            self.store = LocalIndexStore(self.persist_directory)
+            self._signature = store_signature(self.persist_directory, self.store.collection)
+            self._checked_at = time.monotonic()
+            self.backend = self.store.load(self.backend_name)
+            logger.info(
+                f"Retrieval ready with the {self.backend.name} backend over {len(self.backend)} chunks "
+                f"in {time.perf_counter() - started_at:.2f}s"
+            )
+        except Exception as e:
+            logger.error(f"Failed to load vector store, chat runs without retrieval: {str(e)}")
+
+    async def retrieve(self, query: str) -> List[str]:
+        """Return ranked passages for the query within the token budget, or [] on timeout or error."""
+        if not self.ready:
+            return []
+        started_at = time.perf_counter()
+        try:
+            passages = await asyncio.wait_for(asyncio.to_thread(self.search, query), timeout=self.timeout)
+            return self._fit_budget(passages)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            logger.warning(f"Retrieval exceeded {self.timeout}s; answering without context")
+            return []
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Retrieval failed: {str(e)}")
+            return []
+        finally:
+            self.latency.record("retrieval", time.perf_counter() - started_at)
+
+    def search(self, query: str) -> List[str]:
+        """Blocking search: top-k passages for the query, from the cache when possible."""
+        import numpy as np
+        self._refresh_if_changed()
+
+        started_at = time.perf_counter()
+        vector = np.asarray(get_embeddings().embed_query(query), dtype=np.float32)
+        vector /= max(float(np.linalg.norm(vector)), 1e-12)
+        embedded_at = time.perf_counter()
+        self.latency.record("embed", embedded_at - started_at)
+
+        key = np.round(vector, CACHE_KEY_DECIMALS).tobytes()
+        with self._cache_lock:
+            passages = self.cache.get(key)
+        if passages is not None:
+            return passages
+
+        if self.use_mmr:
+            results, vectors = self.backend.search_with_vectors(vector, self.fetch_k)
+            searched_at = time.perf_counter()
+            order = mmr(vector, vectors, self.top_k, self.mmr_lambda)
+            passages = [results[i][1] for i in order]
+            self.latency.record("mmr", time.perf_counter() - searched_at)
+        else:
+            results = self.backend.search(vector, self.top_k)
+            searched_at = time.perf_counter()
+            passages = [text for _, text, _ in results]
+        self.latency.record("search", searched_at - embedded_at)
+
+        with self._cache_lock:
+            self.cache.set(key, passages)
+        return passages
+
+    def _refresh_if_changed(self):
+        """At most every RETRIEVAL_REFRESH_SECONDS, reload local indexes and drop cached results if the store changed."""
+        if time.monotonic() - self._checked_at < RETRIEVAL_REFRESH_SECONDS:
+            return
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            self._checked_at = time.monotonic()
+            signature = store_signature(self.persist_directory, self.store.collection)
+            if signature == self._signature:
+                return
+            if self.backend.name != "chroma":
+                self.backend = self.store.load(self.backend_name)
+            self.invalidate()
+            self._signature = signature
+            logger.info(f"Vector store changed; reloaded the {self.backend.name} backend")
+        except Exception as e:
+            logger.error(f"Failed to refresh the vector store: {str(e)}")
+        finally:
+            self._refresh_lock.release()
+
+    def invalidate(self):
+        """Forget cached results, e.g. after ingestion."""
+        with self._cache_lock:
+            self.cache.clear()
+        self.invalidations += 1
+
+    def _fit_budget(self, passages: List[str]) -> List[str]:
+        selected = []
+        used = 0
+        for passage in passages:
+            cost = count_tokens(passage)
+            if used + cost > self.token_budget:
+                break
+            used += cost
+            selected.append(passage)
+        return selected
+
+    def as_retriever(self):
+        """A LangChain retriever over search(), for chains such as RetrievalQA."""
+        from langchain_core.documents import Document
+        from langchain_core.retrievers import BaseRetriever
+
+        service = self
+
+        class CachedRetriever(BaseRetriever):
+            def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+                return [Document(page_content=passage) for passage in service.search(query)]
+
+        return CachedRetriever()
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "backend": self.backend.name if self.ready else self.backend_name,
+            "top_k": self.top_k,
+            "mmr": self.use_mmr,
+            "token_budget": self.token_budget,
+            "timed_out": self.timed_out,
+            "failed": self.failed,
+            "invalidations": self.invalidations,
+            "cache": self.cache.stats(),
+            "latency": self.latency.stats()
+        }
@@ -0,0 +1,317 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from database import get_database
+from .achievement_service import AchievementService
+from .documents import coerce, serialize
+from .mood_service import MoodService, rollup_day, rollup_key
+
+logger = logging.getLogger(__name__)
+
+SYNC_MAX_EVENTS = int(os.getenv("SYNC_MAX_EVENTS", "200"))
+MAX_KEY_LENGTH = 128
+PROGRESS_TYPES = ["exercise", "meditation", "mindfulness"]
+
+
+class SyncError(ValueError):
+    """An event in a sync batch that cannot be applied."""
+
+
+class SyncService:
+    """
+    Applies a batch of events queued by a client while it was offline.
+
+    Each event is {"key", "type", "data"} where type is mood, progress or
+    exercise and key is a client-generated idempotency key, stored on each
+    document as client_key under a unique (user_id, client_key) index. The
+    whole batch is validated in one pass. Mood and progress entries are
+    insert-only: one unordered bulk insert per collection, where events
+    applied by an earlier attempt come back as duplicate write errors.
+    Exercises may update one the client created earlier (e.g. marking it
+    completed), so they are upserted by (_id, user_id) after one read of the
+    previous state, which also tells real first completions from repeats.
+    Daily mood rollups, category counters and achievements are then updated
+    once for the whole batch, so the number of round-trips does not grow
+    with the batch size.
+    """
+
+    def __init__(self, mood_service: Optional[MoodService] = None):
+        self.db = get_database()
+        self.mood_service = mood_service or MoodService()
+        self.achievement_service = AchievementService()
+
+    async def sync(self, user_id: str, events: List[Any]) -> Dict[str, Any]:
+        if len(events) > SYNC_MAX_EVENTS:
+            raise SyncError(f"A sync batch holds at most {SYNC_MAX_EVENTS} events")
+
+        results, pending = self._validate(user_id, events)
+
+        # One unordered write per collection, all in flight together
+        collections = [name for name in ("mood_history", "progress") if pending.get(name)]
+        duplicates, completed = await asyncio.gather(
+            asyncio.gather(*[
+                self._insert(name, [document for _, document in pending[name]]) for name in collections
+            ]),
+            self._apply_exercises(pending.get("exercises", []), results)
+        )
+
+        created: Dict[str, List[Dict[str, Any]]] = {}
+        for name, skipped in zip(collections, duplicates):
+            for index, (position, document) in enumerate(pending[name]):
+                if index in skipped:
+                    results[position]["status"] = "duplicate"
+                    continue
+                results[position]["status"] = "created"
+                results[position]["id"] = str(document["_id"])
+                created.setdefault(name, []).append(document)
+
+        _, _, achievements = await asyncio.gather(
+            self._update_daily_rollups(created.get("mood_history", [])),
+            self._update_category_progress(created.get("progress", [])),
+            self._record_completions(user_id, completed)
+        )
+        if created.get("mood_history"):
+            self.mood_service.invalidate_insights(user_id)
+
+        totals = {"created": 0, "updated": 0, "duplicate": 0, "invalid": 0}
+        for result in results:
+            totals[result["status"]] += 1
+        logger.info(f"Synced {len(events)} events for user {user_id}: {totals}")
+        return {"results": results, "achievements": serialize(achievements), **totals}
+
+    def _validate(self, user_id: str, events: List[Any]) -> Tuple[List[Dict[str, Any]], Dict[str, List[Tuple[int, Dict[str, Any]]]]]:
+        """Build every document up front; returns per-event results and (position, document) pairs per collection."""
+        builders = {
+            "mood": ("mood_history", self._mood_document),
+            "progress": ("progress", self._progress_document),
+            "exercise": ("exercises", self._exercise_document)
+        }
+        results = []
+        pending: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {}
+        seen: Set[str] = set()
+        for position, event in enumerate(events):
+            event = event if isinstance(event, dict) else {}
+            key = event.get("key")
+            result = {"key": key, "type": event.get("type")}
+            results.append(result)
+            try:
+                if not isinstance(key, str) or not key or len(key) > MAX_KEY_LENGTH:
+                    raise SyncError(f"key must be a non-empty string of at most {MAX_KEY_LENGTH} characters")
+                if event.get("type") not in builders:
+                    raise SyncError(f"type must be one of: {', '.join(builders)}")
+                if not isinstance(event.get("data"), dict):
+                    raise SyncError("data must be an object")
+                if key in seen:
+                    result["status"] = "duplicate"
+                    continue
+                collection, build = builders[event["type"]]
+                document = build(user_id, key, event["data"])
+            except ValueError as e:
+                # SyncError, or an id or timestamp that does not parse
+                result["status"] = "invalid"
+                result["error"] = str(e)
+                continue
+            seen.add(key)
+            pending.setdefault(collection, []).append((position, document))
+        return results, pending
+
+    def _mood_document(self, user_id: str, key: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        if not data.get("mood") or not isinstance(data["mood"], str):
+            raise SyncError("Mood is required")
+        return coerce("mood_history", {
+            "_id": ObjectId(),
+            "user_id": user_id,
+            "mood": data["mood"],
+            "note": data.get("note", ""),
+            "timestamp": data.get("timestamp") or datetime.utcnow(),
+            "client_key": key
+        })
+
+    def _progress_document(self, user_id: str, key: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        if data.get("type") not in PROGRESS_TYPES:
+            raise SyncError(f"Invalid type. Must be one of: {', '.join(PROGRESS_TYPES)}")
+        if not data.get("category"):
+            raise SyncError("Missing required fields: category")
+        try:
+            duration = max(0, float(data.get("duration", 0)))
+        except (ValueError, TypeError):
+            raise SyncError("Invalid duration value")
+        document = coerce("progress", {
+            "_id": ObjectId(),
+            "user_id": user_id,
+            "type": data["type"],
+            "category": data["category"],
+            "duration": duration,
+            "timestamp": data.get("timestamp") or datetime.utcnow(),
+            "client_key": key
+        })
+        if "exercise_id" in data:
+            document["exercise_id"] = data["exercise_id"]
+        return document
+
+    def _exercise_document(self, user_id: str, key: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        if not data.get("name"):
+            raise SyncError("Exercise name is required")
+        try:
+            duration = max(0, float(data.get("duration", 0) or 0))
+        except (ValueError, TypeError):
+            raise SyncError("Invalid duration value")
+        # Same shape as ExerciseService.create_exercise
+        document = coerce("exercises", {
+            "user_id": user_id,
+            "name": data["name"],
+            "category": data.get("category", "meditation"),
+            "duration": duration,
+            "completed": data.get("completed", True),
+            "timestamp": data.get("timestamp") or datetime.utcnow(),
+            "description": data.get("description", ""),
+            "difficulty": data.get("difficulty", "beginner"),
+            "steps": data.get("steps", []),
+            "client_key": key
+        })
+        if data.get("_id"):
+            document["_id"] = data["_id"]
+        return document
+
+    async def _apply_exercises(self, pending: List[Tuple[int, Dict[str, Any]]], results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Upsert the batch's exercises and return the ones completed for the first time.
+
+        One read fetches the previous state of every exercise the batch names
+        or whose key was already applied, then one unordered bulk write
+        applies the rest. Upserts match on (_id, user_id), so an _id owned by
+        another user fails instead of being overwritten.
+        """
+        if not pending:
+            return []
+        user_id = pending[0][1]["user_id"]
+        ids = [document["_id"] for _, document in pending if "_id" in document]
+        keys = [document["client_key"] for _, document in pending]
+
+        completed_before: Dict[Any, bool] = {}
+        applied_keys: Set[str] = set()
+        async for exercise in self.db.exercises.find(
+            {"user_id": user_id, "$or": [{"_id": {"$in": ids}}, {"client_key": {"$in": keys}}]},
+            {"completed": 1, "client_key": 1}
+        ):
+            completed_before[exercise["_id"]] = bool(exercise.get("completed"))
+            applied_keys.add(exercise.get("client_key"))
+
+        operations = []
+        planned = []
+        for position, document in pending:
+            if document["client_key"] in applied_keys:
+                results[position]["status"] = "duplicate"
+                continue
+            document.setdefault("_id", str(ObjectId()))
+            exercise_id = document["_id"]
+            first_completion = document["completed"] and not completed_before.get(exercise_id, False)
+            planned.append((position, document, exercise_id in completed_before, first_completion))
+            # Later events in the batch see this one's state
+            completed_before[exercise_id] = bool(document["completed"])
+            fields = {field: value for field, value in document.items() if field != "_id"}
+            operations.append(UpdateOne({"_id": exercise_id, "user_id": user_id}, {"$set": fields}, upsert=True))
+        if not operations:
+            return []
+
+        failed: Dict[int, Dict[str, Any]] = {}
+        try:
+            await self.db.exercises.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != 11000 for error in errors):
+                raise
+            failed = {error["index"]: error for error in errors}
+
+        completions = []
+        for index, (position, document, existed, first_completion) in enumerate(planned):
+            error = failed.get(index)
+            if error is not None:
+                if "client_key" in (error.get("keyPattern") or {}):
+                    # Applied concurrently by another attempt
+                    results[position]["status"] = "duplicate"
+                else:
+                    results[position]["status"] = "invalid"
+                    results[position]["error"] = "Exercise id is already in use"
+                continue
+            results[position]["status"] = "updated" if existed else "created"
+            results[position]["id"] = str(document["_id"])
+            if first_completion:
+                completions.append(document)
+        return completions
+
+    async def _insert(self, collection: str, documents: List[Dict[str, Any]]) -> Set[int]:
+        """Unordered bulk insert; returns the indexes of documents that were already applied."""
+        try:
+            await self.db[collection].insert_many(documents, ordered=False)
+            return set()
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != 11000 for error in errors):
+                raise
+            return {error["index"] for error in errors}
+
+    async def _record_completions(self, user_id: str, exercises: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # As with single exercises, a failed award check must not fail the sync
+        try:
+            return await self.achievement_service.record_completions(user_id, exercises)
+        except Exception as e:
+            logger.error(f"Error creating achievements for synced exercises: {str(e)}")
+            return []
+
+    async def _update_daily_rollups(self, entries: List[Dict[str, Any]]):
+        """Fold new mood entries into their (user_id, day) rollups, one upsert per day touched."""
+        days: Dict[Tuple[ObjectId, datetime], Dict[str, Any]] = {}
+        for entry in entries:
+            timestamp = entry["timestamp"]
+            rollup = days.setdefault((entry["user_id"], rollup_day(timestamp)), {
+                "counts": {}, "entries": 0, "first_timestamp": timestamp, "last_timestamp": timestamp
+            })
+            field = f"counts.{rollup_key(entry['mood'])}"
+            rollup["counts"][field] = rollup["counts"].get(field, 0) + 1
+            rollup["entries"] += 1
+            rollup["first_timestamp"] = min(rollup["first_timestamp"], timestamp)
+            rollup["last_timestamp"] = max(rollup["last_timestamp"], timestamp)
+        if not days:
+            return
+        await self.db.mood_daily.bulk_write([
+            UpdateOne(
+                {"user_id": user_id, "day": day},
+                {
+                    "$inc": {**rollup["counts"], "entries": rollup["entries"]},
+                    "$min": {"first_timestamp": rollup["first_timestamp"]},
+                    "$max": {"last_timestamp": rollup["last_timestamp"]}
+                },
+                upsert=True
+            )
+            for (user_id, day), rollup in days.items()
+        ], ordered=False)
+
+    async def _update_category_progress(self, entries: List[Dict[str, Any]]):
+        """Apply new progress entries to the category counters, one upsert per category touched."""
+        categories: Dict[Tuple[ObjectId, str], Dict[str, Any]] = {}
+        for entry in entries:
+            totals = categories.setdefault((entry["user_id"], entry["category"]), {
+                "sessions": 0, "minutes": 0, "last_session": entry["timestamp"]
+            })
+            totals["sessions"] += 1
+            totals["minutes"] += entry["duration"]
+            totals["last_session"] = max(totals["last_session"], entry["timestamp"])
+        if not categories:
+            return
+        await self.db.category_progress.bulk_write([
+            UpdateOne(
+                {"user_id": user_id, "category": category},
+                {
+                    "$inc": {"total_sessions": totals["sessions"], "total_minutes": totals["minutes"]},
+                    "$max": {"last_session": totals["last_session"]}
+                },
+                upsert=True
+            )
+            for (user_id, category), totals in categories.items()
+        ], ordered=False)
@@ -0,0 +1,278 @@
+import hashlib
+import json
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import Any, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+CHROMA_COLLECTION_NAME = os.getenv("CHROMA_COLLECTION_NAME", "langchain")
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+
+INDEX_SUBDIRECTORY = "local_index"
+MANIFEST_FILE = "ingest_manifest.json"
+
+# (chunk id, passage text, similarity score)
+SearchResult = Tuple[str, str, float]
+
+
+def open_collection(persist_directory: str):
+    """The Chroma collection that ingestion writes and retrieval reads."""
+    import chromadb
+    client = chromadb.PersistentClient(path=persist_directory)
+    return client.get_or_create_collection(CHROMA_COLLECTION_NAME)
+
+
+def mmr(query, candidates, k: int, lambda_mult: float = 0.5) -> List[int]:
+    """Maximal marginal relevance over unit vectors; returns indices into candidates in pick order.
+
+    Each step picks the candidate maximizing
+    lambda * sim(query) - (1 - lambda) * max sim(already picked), keeping the
+    running max similarity as a vector so every step is one matrix column.
+    """
+    import numpy as np
+    candidates = np.asarray(candidates, dtype=np.float32)
+    if not len(candidates) or k <= 0:
+        return []
+    relevance = candidates @ np.asarray(query, dtype=np.float32)
+    similarity = candidates @ candidates.T
+    redundancy = np.full(len(candidates), -np.inf, dtype=np.float32)
+    available = np.ones(len(candidates), dtype=bool)
+    picked = []
+    for _ in range(min(k, len(candidates))):
+        if picked:
+            scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        else:
+            scores = relevance.copy()
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        picked.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, similarity[:, best])
+    return picked
+
+
+def store_signature(persist_directory: str, collection) -> str:
+    """Changes whenever ingestion changes the store, so exported indexes know they are stale."""
+    digest = hashlib.sha256(str(collection.count()).encode("utf-8"))
+    try:
+        with open(os.path.join(persist_directory, MANIFEST_FILE), "rb") as f:
+            digest.update(f.read())
+    except FileNotFoundError:
+        pass
+    return digest.hexdigest()
+
+
+class VectorBackend(ABC):
+    """Nearest-neighbour search over the ingested chunks."""
+
+    name = "base"
+
+    @abstractmethod
+    def search(self, vector, k: int) -> List[SearchResult]:
+        ...
+
+    @abstractmethod
+    def search_with_vectors(self, vector, k: int) -> Tuple[List[SearchResult], Any]:
+        """Like search, plus the unit vectors of the results as a (len(results), dim) matrix."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+
+class ChromaBackend(VectorBackend):
+    """Queries the Chroma collection directly."""
+
+    name = "chroma"
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def search(self, vector, k: int) -> List[SearchResult]:
+        return self._query(vector, k, include_vectors=False)[0]
+
+    def search_with_vectors(self, vector, k: int) -> Tuple[List[SearchResult], Any]:
+        import numpy as np
+        results, embeddings = self._query(vector, k, include_vectors=True)
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(results), -1)
+        return results, vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    def _query(self, vector, k: int, include_vectors: bool):
+        include = ["documents", "distances"] + (["embeddings"] if include_vectors else [])
+        result = self.collection.query(
+            query_embeddings=[list(map(float, vector))],
+            n_results=k,
+            include=include
+        )
+        # Chroma's default l2 distance on unit vectors is 2 - 2 * cosine
+        results = [
+            (id_, document, 1 - distance / 2)
+            for id_, document, distance in zip(result["ids"][0], result["documents"][0], result["distances"][0])
+        ]
+        return results, result["embeddings"][0] if include_vectors else None
+
+    def __len__(self) -> int:
+        return self.collection.count()
+
+
+class NumpyBackend(VectorBackend):
+    """Exact search: one matrix-vector product over a memory-mapped float32 matrix.
+
+    Fast and exact for corpora up to a few hundred thousand chunks; the
+    matrix is paged in by the OS rather than copied into the heap.
+    """
+
+    name = "numpy"
+
+    def __init__(self, vectors, ids: List[str], documents: List[str]):
+        import numpy as np
+        self.np = np
+        self.vectors = vectors
+        self.ids = ids
+        self.documents = documents
+        self._rows = {id_: row for row, id_ in enumerate(ids)}
+
+    def search(self, vector, k: int) -> List[SearchResult]:
+        return self.search_batch(self.np.asarray(vector, dtype=self.np.float32)[None, :], k)[0]
+
+    def search_with_vectors(self, vector, k: int) -> Tuple[List[SearchResult], Any]:
+        results = self.search(vector, k)
+        return results, self.np.asarray(self.vectors[[self._rows[id_] for id_, _, _ in results]])
+
+    def search_batch(self, queries, k: int) -> List[List[SearchResult]]:
+        """Score many queries with one matrix product."""
+        np = self.np
+        queries = np.asarray(queries, dtype=np.float32)
+        # An empty store exports a (0, 0) matrix, which no query can be multiplied with
+        k = min(k, len(self.ids))
+        if k <= 0:
+            return [[] for _ in range(len(queries))]
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        scores = queries @ self.vectors.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in enumerate(top):
+            ranked = candidates[np.argsort(-scores[row, candidates])]
+            results.append([(self.ids[i], self.documents[i], float(scores[row, i])) for i in ranked])
+        return results
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+class HNSWBackend(VectorBackend):
+    """Approximate search on an hnswlib graph, for corpora too large to scan."""
+
+    name = "hnsw"
+
+    def __init__(self, index, vectors, ids: List[str], documents: List[str]):
+        self.index = index
+        self.vectors = vectors
+        self.ids = ids
+        self.documents = documents
+
+    def search(self, vector, k: int) -> List[SearchResult]:
+        return self._query(vector, k)[0]
+
+    def search_with_vectors(self, vector, k: int) -> Tuple[List[SearchResult], Any]:
+        import numpy as np
+        results, labels = self._query(vector, k)
+        return results, np.asarray(self.vectors[labels], dtype=np.float32)
+
+    def _query(self, vector, k: int):
+        k = min(k, len(self.ids))
+        if k == 0:
+            return [], []
+        labels, distances = self.index.knn_query(vector, k=k)
+        labels = [int(label) for label in labels[0]]
+        # The cosine space reports 1 - cosine similarity
+        results = [
+            (self.ids[label], self.documents[label], 1 - float(distance))
+            for label, distance in zip(labels, distances[0])
+        ]
+        return results, labels
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+class LocalIndexStore:
+    """Exports the Chroma collection into in-process indexes under persist_directory/local_index.
+
+    The export is rebuilt whenever the store signature changes, i.e. after
+    ingestion adds or removes chunks.
+    """
+
+    def __init__(self, persist_directory: str, collection=None):
+        self.persist_directory = persist_directory
+        self.directory = os.path.join(persist_directory, INDEX_SUBDIRECTORY)
+        self.collection = collection if collection is not None else open_collection(persist_directory)
+
+    def load(self, backend: str) -> VectorBackend:
+        if backend == "chroma":
+            return ChromaBackend(self.collection)
+        if backend == "hnsw":
+            try:
+                import hnswlib  # noqa: F401
+            except ImportError:
+                logger.warning("hnswlib is not installed; using the numpy backend instead")
+                backend = "numpy"
+        if backend not in ("numpy", "hnsw"):
+            raise ValueError(f"Unknown vector backend '{backend}', expected chroma, numpy or hnsw")
+
+        self._ensure_export()
+        import numpy as np
+        vectors = np.load(os.path.join(self.directory, "vectors.npy"), mmap_mode="r")
+        with open(os.path.join(self.directory, "chunks.json")) as f:
+            chunks = json.load(f)
+        if backend == "numpy" or not len(vectors):
+            return NumpyBackend(vectors, chunks["ids"], chunks["documents"])
+        return HNSWBackend(self._load_hnsw(vectors), vectors, chunks["ids"], chunks["documents"])
+
+    def _ensure_export(self):
+        signature = store_signature(self.persist_directory, self.collection)
+        try:
+            with open(os.path.join(self.directory, "meta.json")) as f:
+                if json.load(f).get("signature") == signature:
+                    return
+        except FileNotFoundError:
+            pass
+        self.export(signature)
+
+    def export(self, signature: str):
+        import numpy as np
+        os.makedirs(self.directory, exist_ok=True)
+        data = self.collection.get(include=["embeddings", "documents"])
+        vectors = np.asarray(data["embeddings"], dtype=np.float32)
+        if not len(data["ids"]):
+            vectors = vectors.reshape(0, 0)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        np.save(os.path.join(self.directory, "vectors.npy"), vectors)
+        with open(os.path.join(self.directory, "chunks.json"), "w") as f:
+            json.dump({"ids": data["ids"], "documents": data["documents"]}, f)
+        hnsw_path = os.path.join(self.directory, "hnsw.bin")
+        if os.path.exists(hnsw_path):
+            os.remove(hnsw_path)
+        # Written last: a crash mid-export leaves the old signature, forcing a retry
+        with open(os.path.join(self.directory, "meta.json"), "w") as f:
+            json.dump({"signature": signature, "count": len(data["ids"])}, f)
+        logger.info(f"Exported {len(data['ids'])} vectors to {self.directory}")
+
+    def _load_hnsw(self, vectors):
+        import hnswlib
+        path = os.path.join(self.directory, "hnsw.bin")
+        index = hnswlib.Index(space="cosine", dim=vectors.shape[1])
+        if os.path.exists(path):
+            index.load_index(path, max_elements=len(vectors))
+        else:
+            index.init_index(max_elements=max(1, len(vectors)), M=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION)
+            if len(vectors):
+                index.add_items(vectors)
+            index.save_index(path)
+        index.set_ef(HNSW_EF_SEARCH)
+        return index
@@ -0,0 +1,58 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Callable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+
+
+class WarmUp:
+    """Loads heavy models in the background once the server is accepting requests.
+
+    Each stage is a blocking callable run in a worker thread, one after the
+    other so they do not compete for CPU with each other. Requests that need
+    a model before its stage finishes load it on demand; chat runs without
+    retrieval until the vector store is ready.
+    """
+
+    def __init__(self, stages: List[Tuple[str, Callable[[], object]]]):
+        self.stages = stages
+        self.status = "pending"
+        self.timings = {}
+        self.errors = {}
+        self._task = None
+
+    def start(self):
+        if not WARMUP_ENABLED:
+            self.status = "disabled"
+            return
+        self._task = asyncio.create_task(self.run())
+
+    async def run(self):
+        self.status = "running"
+        started_at = time.perf_counter()
+        for name, stage in self.stages:
+            stage_started_at = time.perf_counter()
+            try:
+                await asyncio.to_thread(stage)
+            except Exception as e:
+                self.errors[name] = str(e)
+                logger.error(f"Warm-up stage {name} failed: {str(e)}")
+            self.timings[name] = time.perf_counter() - stage_started_at
+        self.status = "done"
+        logger.info(f"Warm-up finished in {time.perf_counter() - started_at:.2f}s: {self.timings}")
+
+    async def cancel(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "status": self.status,
+            "stage_seconds": self.timings,
+            "errors": self.errors
+        }
@@ -0,0 +1,87 @@
+import os
+import sys
+
+import pytest
+
+# Tests import the backend the way the app runs it, from the backend directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """An in-memory database behind get_database(), fresh for every test."""
+    from mongomock_motor import AsyncMongoMockClient
+    import database
+    test_db = AsyncMongoMockClient()["psychaid_test"]
+    monkeypatch.setattr(database, "db", test_db)
+    return test_db
+
+
+@pytest.fixture
+def auth(db, monkeypatch):
+    monkeypatch.setenv("SECRET_KEY", "test-secret")
+    from services.auth_service import AuthService
+    return AuthService()
+
+
+@pytest.fixture
+def make_user(db, auth):
+    """Insert a user; returns its id and an access token for it."""
+    from bson import ObjectId
+
+    async def make(user_type="student", **fields):
+        document = {
+            "email": f"{ObjectId()}@psychaid.app",
+            "name": "Test",
+            "last_name": "User",
+            "user_type": user_type,
+            "hashed_password": "unused",
+            "linked_children": [],
+            **fields
+        }
+        result = await db.users.insert_one(document)
+        return result.inserted_id, auth.create_access_token({"user_id": str(result.inserted_id)})
+    return make
+
+
+@pytest.fixture
+async def client(auth, monkeypatch):
+    """An HTTP client for the app without its startup hook; set the services a test needs on main."""
+    import httpx
+    import main
+    monkeypatch.setattr(main, "auth_service", auth)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as http:
+        yield http
+
+
+class WordEmbeddings:
+    """A tiny deterministic embedding model: hashed bag of words, counting its calls."""
+
+    dimensions = 64
+
+    def __init__(self):
+        self.embedded = []
+
+    def _vector(self, text):
+        import hashlib
+        vector = [0.0] * self.dimensions
+        for word in text.lower().split():
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dimensions] += 1.0
+        return vector
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        self.embedded.append(text)
+        return self._vector(text)
+
+
+@pytest.fixture
+def embeddings(monkeypatch):
+    """Serve WordEmbeddings from get_embeddings() instead of loading sentence-transformers."""
+    import services.embeddings
+    model = WordEmbeddings()
+    monkeypatch.setattr(services.embeddings, "_embeddings", model)
+    return model
@@ -0,0 +1,46 @@
+import pytest
+from bson import ObjectId
+
+from indexes import INDEXES
+from services.achievement_service import AchievementService
+
+
+@pytest.fixture
+async def achievements(db):
+    await db.achievements.create_indexes(INDEXES["achievements"])
+    return AchievementService()
+
+
+def completion(category, duration):
+    return {"_id": ObjectId(), "category": category, "duration": duration}
+
+
+async def test_one_completion_can_unlock_several_rules_once(achievements, db):
+    user_id = str(ObjectId())
+    earned = await achievements.check_and_create_achievements(user_id, completion("meditation", 90))
+    assert [award["rule_id"] for award in earned] == ["meditation-beginner", "meditation-explorer"]
+
+    assert await achievements.check_and_create_achievements(user_id, completion("meditation", 10)) == []
+    counters = await db.achievement_counters.find_one({"user_id": ObjectId(user_id)})
+    assert counters["categories"]["meditation"] == {"sessions": 2, "minutes": 100}
+    assert await db.achievements.count_documents({"user_id": ObjectId(user_id)}) == 2
+
+
+async def test_counters_are_seeded_from_earlier_completions(achievements, db):
+    user_id = ObjectId()
+    await db.exercises.insert_many([
+        {"user_id": user_id, "category": "anxiety-management", "duration": 5, "completed": True} for _ in range(4)
+    ] + [{"user_id": user_id, "category": "anxiety-management", "duration": 5, "completed": False}])
+
+    earned = await achievements.check_and_create_achievements(str(user_id), completion("anxiety-management", 5))
+    assert [award["rule_id"] for award in earned] == ["anxiety-warrior"]
+
+
+async def test_an_award_made_concurrently_is_not_duplicated(achievements, db):
+    user_id = ObjectId()
+    await db.achievements.insert_one({
+        "user_id": user_id, "rule_id": "sleep-seeker", "title": "Sleep Seeker", "timestamp": None
+    })
+    earned = await achievements.check_and_create_achievements(str(user_id), completion("sleep-hygiene", 150))
+    assert [award["rule_id"] for award in earned] == ["sleep-master"]
+    assert await db.achievements.count_documents({"user_id": user_id, "rule_id": "sleep-seeker"}) == 1
@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from services.achievement_service import BACKFILL_CHECKPOINT_ID, AchievementService, crossed_rules
+
+
+def replay(category, durations, sessions=0, minutes=0):
+    """Rule ids awarded per exercise when a batch is replayed from the given counters."""
+    current = {"sessions": sessions, "minutes": minutes}
+    awarded = []
+    for duration in durations:
+        before = dict(current)
+        current["sessions"] += 1
+        current["minutes"] += duration
+        awarded.append([rule["id"] for rule in crossed_rules(category, before, current)])
+    return awarded
+
+
+def test_batch_awards_each_rule_to_the_exercise_that_crosses_it():
+    assert replay("meditation", [30, 30, 30]) == [
+        ["meditation-beginner"],
+        ["meditation-explorer"],
+        []
+    ]
+
+
+def test_one_exercise_can_cross_several_thresholds():
+    assert replay("meditation", [300]) == [
+        ["meditation-beginner", "meditation-explorer", "meditation-master"]
+    ]
+
+
+def test_batch_starting_above_a_threshold_does_not_award_it_again():
+    assert replay("anxiety-management", [10, 10], sessions=4) == [["anxiety-warrior"], []]
+
+
+def test_threshold_is_inclusive():
+    before = {"sessions": 1, "minutes": 59}
+    assert crossed_rules("meditation", before, {"sessions": 2, "minutes": 59}) == []
+    assert [rule["id"] for rule in crossed_rules("meditation", before, {"sessions": 2, "minutes": 60})] == [
+        "meditation-explorer"
+    ]
+
+
+def test_unknown_category_awards_nothing():
+    assert crossed_rules("juggling", {"sessions": 0, "minutes": 0}, {"sessions": 50, "minutes": 500}) == []
+
+
+def completed(user_id, category, duration, minutes_ago, **fields):
+    return {
+        "user_id": user_id, "category": category, "duration": duration, "completed": True,
+        "timestamp": datetime(2026, 3, 1) - timedelta(minutes=minutes_ago), **fields
+    }
+
+
+async def test_record_completions_awards_each_rule_once_per_batch(db):
+    user_id = ObjectId()
+    earned = await AchievementService().record_completions(str(user_id), [
+        {"_id": ObjectId(), "category": "meditation", "duration": 30},
+        {"_id": ObjectId(), "category": "meditation", "duration": 30},
+        {"_id": ObjectId(), "category": "stress-relief", "duration": 5}
+    ])
+    assert [award["rule_id"] for award in earned] == ["meditation-beginner", "meditation-explorer", "stress-reliever"]
+    counters = await db.achievement_counters.find_one({"user_id": user_id})
+    assert counters["categories"]["meditation"] == {"sessions": 2, "minutes": 60}
+
+
+async def test_backfill_replays_history_and_tags_legacy_awards(db):
+    user_id = ObjectId()
+    await db.exercises.insert_many([
+        completed(user_id, "meditation", 40, minutes_ago=30),
+        completed(user_id, "meditation", 40, minutes_ago=20),
+        completed(user_id, "meditation", 40, minutes_ago=10, timestamp="not a date"),
+    ])
+    # Awarded before rule ids existed, twice by the old race
+    legacy = [{"user_id": user_id, "title": "Meditation Beginner"} for _ in range(2)]
+    await db.achievements.insert_many(legacy)
+
+    stats = await AchievementService().backfill_achievements()
+    assert (stats["users"], stats["exercises"], stats["skipped"]) == (1, 2, 1)
+    assert (stats["tagged"], stats["merged"], stats["awarded"]) == (1, 1, 1)
+
+    awards = {award["rule_id"]: award async for award in db.achievements.find({"user_id": user_id})}
+    assert set(awards) == {"meditation-beginner", "meditation-explorer"}
+    # The award keeps the time of the exercise that earned it
+    assert awards["meditation-explorer"]["timestamp"] == datetime(2026, 3, 1) - timedelta(minutes=20)
+    counters = await db.achievement_counters.find_one({"user_id": user_id})
+    assert counters["seeded"] and counters["categories"]["meditation"] == {"sessions": 2, "minutes": 80}
+    assert await db.backfill_checkpoints.find_one({"_id": BACKFILL_CHECKPOINT_ID}) is None
+
+
+async def test_backfill_resumes_after_its_checkpoint(db):
+    first, second = sorted([ObjectId(), ObjectId()])
+    await db.exercises.insert_many([
+        completed(first, "self-care", 10, minutes_ago=5),
+        completed(second, "self-care", 10, minutes_ago=5)
+    ])
+    await db.backfill_checkpoints.insert_one({"_id": BACKFILL_CHECKPOINT_ID, "last_user_id": first})
+
+    progress = []
+    stats = await AchievementService().backfill_achievements(users_per_chunk=1, on_progress=progress.append)
+    assert stats["resumed_after"] == first
+    assert (stats["users"], stats["awarded"]) == (1, 1)
+    assert [update["last_user_id"] for update in progress] == [second]
+    assert await db.achievements.count_documents({"user_id": first}) == 0
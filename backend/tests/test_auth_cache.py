@@ -0,0 +1,50 @@
+import pytest
+from fastapi import HTTPException
+
+import main
+from services.chat_service import ChatService
+from services.fake_chat_model import FakeChatModel
+
+
+async def test_current_user_is_loaded_once_per_token(auth, make_user, monkeypatch):
+    user_id, token = await make_user()
+    loads = []
+    get_user_by_id = auth.get_user_by_id
+
+    async def counting(user_id):
+        loads.append(user_id)
+        return await get_user_by_id(user_id)
+    monkeypatch.setattr(auth, "get_user_by_id", counting)
+
+    first = await auth.get_current_user(token)
+    second = await auth.get_current_user(token)
+    assert first.id == second.id == str(user_id)
+    assert len(loads) == 1
+
+
+async def test_updating_a_user_drops_the_cached_copy(auth, make_user):
+    user_id, token = await make_user(name="Before")
+    assert (await auth.get_current_user(token)).name == "Before"
+    await auth.update_user(str(user_id), {"name": "After"})
+    assert (await auth.get_current_user(token)).name == "After"
+
+
+async def test_invalid_token_is_not_cached(auth):
+    for _ in range(2):
+        with pytest.raises(HTTPException) as raised:
+            await auth.get_current_user("not-a-jwt")
+        assert raised.value.status_code == 401
+    assert len(auth._token_cache) == 0
+
+
+async def test_metrics_are_hidden_unless_enabled(client, make_user, monkeypatch):
+    monkeypatch.setattr(main, "chat_service", ChatService(chat_model=FakeChatModel()))
+    _, token = await make_user()
+    headers = {"Authorization": f"Bearer {token}"}
+    assert (await client.get("/metrics", headers=headers)).status_code == 404
+
+    monkeypatch.setattr(main, "METRICS_ENABLED", True)
+    assert (await client.get("/metrics")).status_code == 401
+    response = await client.get("/metrics", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["auth"]["cache"]["users"]["size"] == 1
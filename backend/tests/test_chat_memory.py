@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+import services.chat_service as chat_module
+from services.chat_service import ChatService
+from services.fake_chat_model import FakeChatModel
+
+
+@pytest.fixture
+def chat(db):
+    model = FakeChatModel(latency_ms=0, latency_distribution="constant", token_latency_ms=0, response_tokens=3)
+    service = ChatService(chat_model=model)
+    service.prompts = []
+    invoke = service.gateway.invoke
+
+    async def recording_invoke(messages, priority):
+        service.prompts.append([message.content for message in messages])
+        return await invoke(messages, priority)
+
+    service.gateway.invoke = recording_invoke
+    return service
+
+
+async def add_turns(db, user_id, count):
+    start = datetime.utcnow() - timedelta(hours=1)
+    for index in range(count):
+        await db.chat_history.insert_one({
+            "user_id": ObjectId(user_id), "message": f"question {index}", "response": f"answer {index}",
+            "timestamp": start + timedelta(minutes=index)
+        })
+
+
+async def test_prompt_replays_history_loaded_once_from_the_database(chat, db):
+    user_id = str(ObjectId())
+    await add_turns(db, user_id, 2)
+
+    await chat.get_response(user_id, "hello again", "student")
+    assert chat.prompts[0][1:] == ["question 0", "answer 0", "question 1", "answer 1", "hello again"]
+
+    # Later prompts come from the in-memory buffer, not another query
+    await db.chat_history.delete_many({})
+    await chat.get_response(user_id, "and now?", "student")
+    assert chat.prompts[1][1:5] == ["question 0", "answer 0", "question 1", "answer 1"]
+    assert chat.prompts[1][5] == "hello again"
+    assert chat.prompts[1][-1] == "and now?"
+
+
+async def test_buffer_keeps_the_last_turns_and_every_turn_is_persisted(chat, db, monkeypatch):
+    monkeypatch.setattr(chat_module, "CHAT_MEMORY_TURNS", 2)
+    user_id = str(ObjectId())
+    for index in range(3):
+        await chat.get_response(user_id, f"message {index}", "student")
+    await chat.drain()
+
+    assert [turn["message"] for turn in chat._memory.get(user_id)] == ["message 1", "message 2"]
+    assert await db.chat_history.count_documents({"user_id": ObjectId(user_id)}) == 3
+    # Stored timestamps have millisecond precision, so back-to-back turns may tie
+    history = await chat.get_chat_history(user_id, limit=3)
+    assert sorted(turn["message"] for turn in history) == ["message 0", "message 1", "message 2"]
+
+
+async def test_deleting_history_forgets_the_buffer(chat, db):
+    user_id = str(ObjectId())
+    await chat.get_response(user_id, "remember me", "student")
+    await chat.drain()
+
+    assert await chat.delete_chat_history(user_id)
+    assert chat._memory.get(user_id) is None
+    await chat.get_response(user_id, "fresh start", "student")
+    assert chat.prompts[-1][1:] == ["fresh start"]
@@ -0,0 +1,74 @@
+import json
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from main import sse_response
+from services.chat_service import FALLBACK_RESPONSE, ChatService
+from services.fake_chat_model import FakeChatModel
+from services.llm_gateway import LLMGateway
+
+
+class Chunk:
+    def __init__(self, content):
+        self.content = content
+
+
+class BrokenModel:
+    """Streams one token, then fails."""
+
+    async def astream(self, messages):
+        yield Chunk("Hello ")
+        raise RuntimeError("connection reset")
+
+
+@pytest.fixture
+def chat(db):
+    model = FakeChatModel(latency_ms=0, latency_distribution="constant", token_latency_ms=0, response_tokens=5)
+    return ChatService(chat_model=model)
+
+
+async def events(response):
+    return [json.loads(frame[len("data: "):]) async for frame in response.body_iterator]
+
+
+async def test_stream_sends_tokens_then_done_and_remembers_the_turn(chat, db):
+    user_id = str(ObjectId())
+    response = await sse_response(chat.stream_response(user_id, "I feel anxious", "student"))
+    frames = await events(response)
+    tokens = [frame["token"] for frame in frames[:-1]]
+    assert len(tokens) == 5
+    assert frames[-1] == {"done": True, "response": "".join(tokens)}
+
+    await chat.drain()
+    saved = await db.chat_history.find_one({"user_id": ObjectId(user_id)})
+    assert saved["response"] == "".join(tokens)
+
+
+async def test_overloaded_gateway_answers_503_before_the_stream_starts(chat):
+    chat.gateway = LLMGateway(lambda: chat.chat, max_in_flight=0, max_queue=0)
+    with pytest.raises(HTTPException) as raised:
+        await sse_response(chat.stream_response(str(ObjectId()), "hello", "student"))
+    assert raised.value.status_code == 503
+    assert raised.value.headers["Retry-After"]
+
+
+async def test_prompt_failure_streams_the_fallback_and_saves_nothing(chat, db, monkeypatch):
+    async def unavailable(user_id):
+        raise RuntimeError("database unavailable")
+    monkeypatch.setattr(chat, "_get_summary", unavailable)
+
+    frames = await events(await sse_response(chat.stream_response(str(ObjectId()), "hello", "student")))
+    assert frames == [{"token": FALLBACK_RESPONSE}, {"done": True, "response": FALLBACK_RESPONSE}]
+    await chat.drain()
+    assert await db.chat_history.count_documents({}) == 0
+
+
+async def test_stream_cut_off_part_way_is_not_saved(chat, db):
+    chat.gateway = LLMGateway(lambda: BrokenModel(), max_retries=0)
+    frames = await events(await sse_response(chat.stream_response(str(ObjectId()), "hello", "student")))
+    assert frames[0] == {"token": "Hello "}
+    assert frames[-1]["done"]
+    await chat.drain()
+    assert await db.chat_history.count_documents({}) == 0
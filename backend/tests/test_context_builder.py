@@ -0,0 +1,91 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from services.chat_service import ChatService
+from services.context_builder import MESSAGE_OVERHEAD_TOKENS, ContextBuilder
+from services.fake_chat_model import FakeChatModel
+
+
+def words(text):
+    return len(text.split())
+
+
+def turn(index, minutes=0):
+    return {
+        "message": f"question {index}", "response": f"answer {index}",
+        "timestamp": datetime(2026, 3, 1) + timedelta(minutes=minutes or index)
+    }
+
+
+def test_newest_turns_fill_the_budget_and_older_ones_overflow():
+    # Fixed part: 1 + 1 words; every turn costs 2 + 2 words; overhead 4 per message
+    budget = 2 + 2 * MESSAGE_OVERHEAD_TOKENS + 2 * (4 + 2 * MESSAGE_OVERHEAD_TOKENS)
+    builder = ContextBuilder(token_budget=budget, counter=words)
+    turns = [turn(index) for index in range(4)]
+
+    messages, overflow = builder.build("system", turns, "hello")
+    assert [message.content for message in messages] == [
+        "system", "question 2", "answer 2", "question 3", "answer 3", "hello"
+    ]
+    assert overflow == turns[:2]
+
+
+def test_mood_summary_and_passages_go_into_the_system_message():
+    builder = ContextBuilder(token_budget=5, counter=words)
+    messages, overflow = builder.build(
+        "system", [turn(0)], "hello", summary="They talked about exams.", mood="anxious", context=["Breathe slowly."]
+    )
+    system = messages[0].content
+    assert "anxious" in system and "They talked about exams." in system and "Breathe slowly." in system
+    # Over budget before any history: the message is still sent, the turn is not
+    assert [message.content for message in messages[1:]] == ["hello"]
+    assert overflow == [turn(0)]
+
+
+@pytest.fixture
+def chat(db):
+    model = FakeChatModel(latency_ms=0, latency_distribution="constant", token_latency_ms=0, response_tokens=3)
+    return ChatService(chat_model=model)
+
+
+async def test_summary_folds_each_turn_in_once(chat, db):
+    user_id = str(ObjectId())
+    await chat._refresh_summary(user_id, [turn(0), turn(1)])
+    stored = await db.chat_summaries.find_one({"user_id": ObjectId(user_id)})
+    assert stored["summary"]
+    assert stored["summarized_until"] == turn(1)["timestamp"]
+
+    calls = []
+    invoke = chat.gateway.invoke
+
+    async def counting_invoke(messages, priority):
+        calls.append(messages[0].content)
+        return await invoke(messages, priority)
+
+    chat.gateway.invoke = counting_invoke
+    await chat._refresh_summary(user_id, [turn(1)])
+    assert calls == []
+    await chat._refresh_summary(user_id, [turn(1), turn(2)])
+    assert len(calls) == 1 and "question 2" in calls[0] and "question 1" not in calls[0]
+
+
+async def test_concurrent_refreshes_run_one_at_a_time_and_release_their_lock(chat):
+    user_id = str(ObjectId())
+    active = []
+    peak = []
+    invoke = chat.gateway.invoke
+
+    async def slow_invoke(messages, priority):
+        active.append(1)
+        peak.append(len(active))
+        await asyncio.sleep(0.01)
+        active.pop()
+        return await invoke(messages, priority)
+
+    chat.gateway.invoke = slow_invoke
+    await asyncio.gather(*(chat._refresh_summary(user_id, [turn(index)]) for index in range(1, 4)))
+    assert max(peak) == 1
+    assert chat._summary_locks == {}
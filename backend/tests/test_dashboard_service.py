@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from services.dashboard_service import DashboardService
+from services.mood_service import rollup_day
+
+
+class CountingCollection:
+    def __init__(self, collection, calls):
+        self._collection = collection
+        self._calls = calls
+
+    def __getattr__(self, name):
+        if name in ("find", "find_one", "aggregate"):
+            self._calls.append(name)
+        return getattr(self._collection, name)
+
+
+class CountingDatabase:
+    """Counts the queries a service sends, across all collections."""
+
+    def __init__(self, db):
+        self._db = db
+        self.calls = []
+
+    def __getattr__(self, name):
+        return CountingCollection(getattr(self._db, name), self.calls)
+
+
+async def add_child(db, name, moods=(), minutes=(), awards=0):
+    now = datetime.utcnow()
+    child_id = (await db.users.insert_one({
+        "name": name, "last_name": "Doe", "email": f"{name}@psychaid.app", "user_type": "student"
+    })).inserted_id
+    for days_ago, mood in moods:
+        timestamp = now - timedelta(days=days_ago)
+        await db.mood_history.insert_one({"user_id": child_id, "mood": mood, "note": "", "timestamp": timestamp})
+        await db.mood_daily.update_one(
+            {"user_id": child_id, "day": rollup_day(timestamp)},
+            {"$inc": {f"counts.{mood}": 1, "entries": 1}},
+            upsert=True
+        )
+    for category, total in minutes:
+        await db.category_progress.insert_one({
+            "user_id": child_id, "category": category, "total_sessions": 2, "total_minutes": total,
+            "last_session": now
+        })
+    for index in range(awards):
+        await db.achievements.insert_one({"user_id": child_id, "rule_id": f"rule-{index}", "timestamp": now})
+    return child_id
+
+
+async def test_dashboard_summarizes_every_linked_child(db):
+    anna = await add_child(db, "Anna", moods=[(1, "happy"), (0, "calm"), (30, "sad")],
+                           minutes=[("meditation", 30), ("self-care", 15)], awards=2)
+    ben = await add_child(db, "Ben")
+    parent = (await db.users.insert_one({"name": "Pat", "user_type": "parent"})).inserted_id
+
+    dashboard = await DashboardService().get_parent_dashboard([str(anna), str(ben), str(parent)])
+    by_name = {child["name"]: child for child in dashboard}
+    assert sorted(by_name) == ["Anna Doe", "Ben Doe"]
+
+    anna_summary = by_name["Anna Doe"]
+    assert [entry["mood"] for entry in anna_summary["mood"]["recent"]] == ["calm", "happy"]
+    assert anna_summary["mood"]["latest"]["mood"] == "calm"
+    assert anna_summary["mood"]["distribution"] == {"happy": 1, "calm": 1}
+    assert anna_summary["stats"]["totalMinutes"] == 45
+    assert anna_summary["stats"]["categoriesUsed"] == 2
+    assert anna_summary["achievements"]["total"] == 2
+
+    ben_summary = by_name["Ben Doe"]
+    assert ben_summary["mood"] == {"entries": 0, "distribution": {}, "latest": None, "recent": []}
+    assert ben_summary["stats"]["totalSessions"] == 0
+    assert ben_summary["achievements"] == {"total": 0, "latest": None}
+
+
+async def test_query_count_does_not_grow_with_children(db):
+    children = [await add_child(db, f"child{index}", moods=[(0, "happy")], minutes=[("meditation", 10)], awards=1)
+                for index in range(4)]
+    service = DashboardService()
+
+    service.db = CountingDatabase(db)
+    await service.get_parent_dashboard([str(children[0])])
+    one_child = len(service.db.calls)
+
+    service.db = CountingDatabase(db)
+    dashboard = await service.get_parent_dashboard([str(child) for child in children])
+    assert len(dashboard) == 4
+    assert len(service.db.calls) == one_child == 5
+
+
+async def test_mood_limit_caps_recent_entries(db):
+    child = await add_child(db, "Cleo", moods=[(day, "happy") for day in range(5)])
+    dashboard = await DashboardService().get_parent_dashboard([str(child)], mood_limit=2)
+    assert len(dashboard[0]["mood"]["recent"]) == 2
+    assert dashboard[0]["mood"]["entries"] == 5
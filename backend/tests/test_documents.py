@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+
+import main
+from services.documents import coerce, object_id, serialize, utc_datetime
+from services.exercise_service import ExerciseService
+from services.progress_service import ProgressService
+
+
+def test_utc_datetime_parses_z_suffix():
+    assert utc_datetime("2024-03-01T12:30:00Z") == datetime(2024, 3, 1, 12, 30)
+
+
+def test_utc_datetime_converts_offsets_to_naive_utc():
+    assert utc_datetime("2024-03-01T12:30:00+02:00") == datetime(2024, 3, 1, 10, 30)
+    aware = datetime(2024, 3, 1, 23, 0, tzinfo=timezone(timedelta(hours=-5)))
+    assert utc_datetime(aware) == datetime(2024, 3, 2, 4, 0)
+
+
+def test_utc_datetime_keeps_naive_values():
+    naive = datetime(2024, 3, 1, 12, 30, 0, 123456)
+    assert utc_datetime(naive) is naive
+    assert utc_datetime(naive.isoformat()) == naive
+
+
+def test_utc_datetime_rejects_garbage():
+    with pytest.raises(ValueError):
+        utc_datetime("yesterday")
+
+
+def test_coerce_converts_declared_fields_in_place():
+    user_id = ObjectId()
+    document = {"user_id": str(user_id), "timestamp": "2024-03-01T12:30:00Z", "mood": "calm"}
+    assert coerce("mood_history", document) is document
+    assert document == {"user_id": user_id, "timestamp": datetime(2024, 3, 1, 12, 30), "mood": "calm"}
+
+
+def test_coerce_leaves_operators_and_missing_fields_alone():
+    query = {"user_id": {"$in": ["a", "b"]}}
+    assert coerce("exercises", query) == {"user_id": {"$in": ["a", "b"]}}
+
+
+def test_coerce_rejects_invalid_ids():
+    with pytest.raises(ValueError):
+        coerce("exercises", {"user_id": "not-an-id"})
+    with pytest.raises(ValueError):
+        object_id(42)
+
+
+def test_serialize_round_trips_through_coerce():
+    document = coerce("progress", {"user_id": str(ObjectId()), "timestamp": "2024-03-01T12:30:00Z"})
+    assert coerce("progress", serialize(document)) == document
+
+
+async def test_exercises_are_stored_typed_and_malformed_timestamps_get_422(db, make_user, client, monkeypatch):
+    monkeypatch.setattr(main, "exercise_service", ExerciseService())
+    user_id, token = await make_user()
+    headers = {"Authorization": f"Bearer {token}"}
+
+    created = await client.post("/exercises", headers=headers, json={
+        "name": "Body scan", "duration": 5, "timestamp": "2024-03-01T12:30:00Z"
+    })
+    assert created.status_code == 200
+    stored = await db.exercises.find_one({"_id": created.json()["exercise"]["_id"]})
+    assert (stored["user_id"], stored["timestamp"]) == (user_id, datetime(2024, 3, 1, 12, 30))
+
+    rejected = await client.post("/exercises", headers=headers, json={"name": "Body scan", "timestamp": "yesterday"})
+    assert rejected.status_code == 422
+    assert await db.exercises.count_documents({}) == 1
+
+
+async def test_parents_read_category_stats_of_linked_children_only(db, make_user, client, monkeypatch):
+    monkeypatch.setattr(main, "progress_service", ProgressService())
+    child_id, child_token = await make_user()
+    _, parent_token = await make_user("parent", linked_children=[child_id])
+    _, stranger_token = await make_user("parent")
+    await db.category_progress.insert_one({
+        "user_id": child_id, "category": "meditation", "total_sessions": 3, "total_minutes": 45,
+        "last_session": datetime(2024, 3, 1)
+    })
+    path = f"/parent/child/{child_id}/category/meditation"
+
+    allowed = await client.get(path, headers={"Authorization": f"Bearer {parent_token}"})
+    assert allowed.status_code == 200
+    assert (allowed.json()["totalSessions"], allowed.json()["totalMinutes"]) == (3, 45)
+    for token in (stranger_token, child_token):
+        assert (await client.get(path, headers={"Authorization": f"Bearer {token}"})).status_code == 403
+    assert (await client.get(path)).status_code == 401
@@ -0,0 +1,71 @@
+import pytest
+
+import services.embedding_cache as embedding_cache
+from services.embedding_cache import CachedEmbeddings, EmbeddingCache, text_key
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "embeddings.sqlite3")
+
+
+class BatchRecorder:
+    """Records each batch the model is asked to embed."""
+
+    def __init__(self, model):
+        self.model = model
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        return self.model.embed_documents(texts)
+
+    def embed_query(self, text):
+        self.batches.append([text])
+        return self.model.embed_query(text)
+
+
+def test_only_uncached_texts_are_embedded_in_one_batch(embeddings, cache_path):
+    model = BatchRecorder(embeddings)
+    cached = CachedEmbeddings(model, EmbeddingCache("model-a", path=cache_path))
+
+    first = cached.embed_documents(["calm", "sleep", "calm"])
+    assert model.batches == [["calm", "sleep"]]
+    second = cached.embed_documents(["sleep", "focus", "calm"])
+    assert model.batches[1:] == [["focus"]]
+    assert second[0] == first[1] and second[2] == first[0]
+    assert cached.stats()["hits"] == 2
+
+
+def test_vectors_survive_a_restart_with_the_same_model(embeddings, cache_path):
+    CachedEmbeddings(embeddings, EmbeddingCache("model-a", path=cache_path)).embed_documents(["calm"])
+    model = BatchRecorder(embeddings)
+    reopened = CachedEmbeddings(model, EmbeddingCache("model-a", path=cache_path))
+    assert reopened.embed_documents(["calm"]) == embeddings.embed_documents(["calm"])
+    assert model.batches == []
+
+
+def test_another_model_version_drops_the_old_rows(embeddings, cache_path):
+    CachedEmbeddings(embeddings, EmbeddingCache("model-a", path=cache_path)).embed_documents(["calm"])
+    model = BatchRecorder(embeddings)
+    CachedEmbeddings(model, EmbeddingCache("model-b", path=cache_path)).embed_documents(["calm"])
+    assert model.batches == [["calm"]]
+    assert EmbeddingCache("model-a", path=cache_path).get_many([text_key("calm")]) == {}
+
+
+def test_queries_and_documents_never_share_keys(embeddings, cache_path):
+    model = BatchRecorder(embeddings)
+    cached = CachedEmbeddings(model, EmbeddingCache("model-a", path=cache_path))
+    cached.embed_documents(["calm"])
+    cached.embed_query("calm")
+    cached.embed_query("calm")
+    assert model.batches == [["calm"], ["calm"]]
+
+
+def test_oldest_rows_are_pruned_past_the_size_bound(cache_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "PRUNE_INTERVAL", 2)
+    cache = EmbeddingCache("model-a", path=cache_path, max_entries=3)
+    for index in range(6):
+        cache.put_many({f"key-{index}": [float(index)]})
+    assert sorted(cache.get_many([f"key-{index}" for index in range(6)])) == ["key-3", "key-4", "key-5"]
+    assert cache.get_many(["key-5"]) == {"key-5": [5.0]}
@@ -0,0 +1,85 @@
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+import main
+from indexes import INDEXES
+from services.exercise_service import ExerciseService
+
+
+class RecordingCollection:
+    """Records the exercises collection methods a call uses."""
+
+    def __init__(self, collection):
+        self._collection = collection
+        self.calls = []
+
+    def __getattr__(self, name):
+        self.calls.append(name)
+        return getattr(self._collection, name)
+
+
+@pytest.fixture
+async def exercises(db):
+    await db.achievements.create_indexes(INDEXES["achievements"])
+    service = ExerciseService()
+    service.exercises_collection = RecordingCollection(db.exercises)
+    return service
+
+
+def meditation(**fields):
+    return {"name": "Body scan", "category": "meditation", "duration": 10, **fields}
+
+
+async def test_a_client_id_is_upserted_in_one_round_trip_and_counted_once(exercises, db):
+    user_id = str(ObjectId())
+    exercise_id = str(ObjectId())
+
+    exercise, achievements = await exercises.create_exercise(user_id, meditation(_id=exercise_id))
+    assert exercises.exercises_collection.calls == ["find_one_and_update"]
+    assert exercise["_id"] == exercise_id
+    assert [award["rule_id"] for award in achievements] == ["meditation-beginner"]
+
+    # A retry updates the same document without another completion
+    _, achievements = await exercises.create_exercise(user_id, meditation(_id=exercise_id, duration=20))
+    assert achievements == []
+    stored = await db.exercises.find_one({"_id": exercise_id})
+    assert stored["duration"] == 20
+    counters = await db.achievement_counters.find_one({"user_id": ObjectId(user_id)})
+    assert counters["categories"]["meditation"]["sessions"] == 1
+
+
+async def test_another_users_exercise_id_is_rejected_with_409(exercises, db):
+    owner, intruder = str(ObjectId()), str(ObjectId())
+    exercise_id = str(ObjectId())
+    await exercises.create_exercise(owner, meditation(_id=exercise_id))
+
+    with pytest.raises(HTTPException) as rejected:
+        await exercises.create_exercise(intruder, meditation(_id=exercise_id, name="Taken over"))
+    assert rejected.value.status_code == 409
+    stored = await db.exercises.find_one({"_id": exercise_id})
+    assert (stored["user_id"], stored["name"]) == (ObjectId(owner), "Body scan")
+
+
+async def test_server_ids_write_the_exercise_and_awards_together(exercises, db):
+    user_id = str(ObjectId())
+    exercise, achievements = await exercises.create_exercise(user_id, meditation(duration=60))
+    assert await db.exercises.count_documents({"user_id": ObjectId(user_id)}) == 1
+    assert [award["rule_id"] for award in achievements] == ["meditation-beginner", "meditation-explorer"]
+
+    _, achievements = await exercises.create_exercise(user_id, meditation(completed=False))
+    assert achievements == []
+
+
+async def test_exercises_endpoint_answers_409_for_a_foreign_id(exercises, make_user, client, monkeypatch):
+    monkeypatch.setattr(main, "exercise_service", exercises)
+    owner, owner_token = await make_user()
+    _, intruder_token = await make_user()
+    exercise_id = str(ObjectId())
+
+    created = await client.post("/exercises", json=meditation(_id=exercise_id),
+                                headers={"Authorization": f"Bearer {owner_token}"})
+    assert created.status_code == 200
+    taken = await client.post("/exercises", json=meditation(_id=exercise_id),
+                              headers={"Authorization": f"Bearer {intruder_token}"})
+    assert taken.status_code == 409
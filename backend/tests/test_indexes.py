@@ -0,0 +1,60 @@
+from pymongo.errors import OperationFailure
+
+from indexes import INDEXES, _winning_stages, audit_queries, ensure_indexes, query_shapes, undeclared_indexes
+
+
+async def test_every_declared_index_is_created_once(db):
+    applied = await ensure_indexes(db)
+    assert set(applied) == set(INDEXES)
+    for collection, models in INDEXES.items():
+        names = {index["name"] async for index in db[collection].list_indexes()}
+        assert {model.document["name"] for model in models} <= names
+
+    await ensure_indexes(db)
+    assert await undeclared_indexes(db) == {}
+
+
+async def test_unknown_indexes_are_reported_for_dropping(db):
+    await ensure_indexes(db)
+    await db.mood_history.create_index([("user_id", 1), ("timestamp", -1)])
+    await db.scratch.create_index("anything")
+    assert await undeclared_indexes(db) == {
+        "mood_history": ["user_id_1_timestamp_-1"],
+        "scratch": ["anything_1"]
+    }
+
+
+async def test_one_failing_collection_does_not_block_the_others(db, monkeypatch):
+    create_indexes = type(db.users).create_indexes
+
+    async def failing(collection, models, *args, **kwargs):
+        if collection.name == "users":
+            raise OperationFailure("E11000 duplicate key error")
+        return await create_indexes(collection, models, *args, **kwargs)
+
+    monkeypatch.setattr(type(db.users), "create_indexes", failing)
+    applied = await ensure_indexes(db)
+    assert "users" not in applied
+    assert set(applied) == set(INDEXES) - {"users"}
+
+
+def test_winning_stages_skip_rejected_plans():
+    explain = {"queryPlanner": {
+        "winningPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}},
+        "rejectedPlans": [{"stage": "COLLSCAN"}]
+    }}
+    assert _winning_stages(explain) == ["FETCH", "IXSCAN"]
+    # Aggregations nest the plan under their stages
+    pipeline = {"stages": [{"$cursor": {"queryPlanner": {"winningPlan": {"stage": "COLLSCAN"}}}}]}
+    assert _winning_stages(pipeline) == ["COLLSCAN"]
+
+
+async def test_audit_flags_collection_scans():
+    class ExplainingDatabase:
+        async def command(self, name, command, verbosity):
+            scanned = command.get("find") == "users"
+            return {"queryPlanner": {"winningPlan": {"stage": "COLLSCAN" if scanned else "IXSCAN"}}}
+
+    report = await audit_queries(ExplainingDatabase())
+    assert len(report) == len(query_shapes())
+    assert {entry["name"] for entry in report if entry["collscan"]} == {"login"}
@@ -0,0 +1,124 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import services.ingestion as ingestion
+from services.ingestion import DocumentIngestor, chunk_id
+
+
+class MemoryCollection:
+    """The slice of the Chroma collection API the ingestor uses."""
+
+    def __init__(self):
+        self.rows = {}
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        for id_, document, metadata in zip(ids, documents, metadatas):
+            self.rows[id_] = (document, metadata)
+
+    def get(self, ids=None, where=None, include=None):
+        matches = [
+            id_ for id_, (_, metadata) in self.rows.items()
+            if (ids is None or id_ in ids) and (where is None or metadata["source"] == where["source"])
+        ]
+        return {"ids": matches}
+
+    def delete(self, ids):
+        for id_ in ids:
+            del self.rows[id_]
+
+
+def parse_lines(path):
+    """Stands in for parse_pdf: every line of the file is one chunk."""
+    with open(path) as f:
+        lines = [line.strip() for line in f if line.strip()]
+    return [{"id": chunk_id(path, line), "text": line, "metadata": {"source": path}} for line in lines]
+
+
+@pytest.fixture
+def library(tmp_path, embeddings, monkeypatch):
+    collection = MemoryCollection()
+    monkeypatch.setattr(ingestion, "open_collection", lambda persist_directory: collection)
+    monkeypatch.setattr(ingestion, "parse_pdf", parse_lines)
+    monkeypatch.setattr(ingestion, "ProcessPoolExecutor", ThreadPoolExecutor)
+    documents = tmp_path / "data"
+    documents.mkdir()
+    ingestor = DocumentIngestor(str(tmp_path / "store"), documents_directory=str(documents), workers=2)
+    return ingestor, documents, collection
+
+
+def write(directory, name, *lines):
+    (directory / name).write_text("\n".join(lines))
+    return str(directory / name)
+
+
+def test_unchanged_files_are_skipped(library, embeddings):
+    ingestor, documents, collection = library
+    write(documents, "sleep.pdf", "keep a regular bedtime", "avoid screens at night")
+    write(documents, "stress.pdf", "breathe slowly")
+
+    first = ingestor.run()
+    assert (first["ingested"], first["chunks_embedded"]) == (2, 3)
+    assert len(collection.rows) == 3
+
+    embedded = len(embeddings.embedded)
+    second = ingestor.run()
+    assert (second["unchanged"], second["ingested"], second["chunks_embedded"]) == (2, 0, 0)
+    assert len(embeddings.embedded) == embedded
+
+
+def test_changed_files_embed_only_new_chunks_and_drop_stale_ones(library, embeddings):
+    ingestor, documents, collection = library
+    path = write(documents, "sleep.pdf", "keep a regular bedtime", "avoid screens at night")
+    ingestor.run()
+
+    write(documents, "sleep.pdf", "keep a regular bedtime", "get morning daylight")
+    embeddings.embedded.clear()
+    stats = ingestor.run()
+    assert embeddings.embedded == ["get morning daylight"]
+    assert (stats["chunks_reused"], stats["chunks_deleted"]) == (1, 1)
+    assert sorted(document for document, _ in collection.rows.values()) == [
+        "get morning daylight", "keep a regular bedtime"
+    ]
+    with open(ingestor.manifest_path) as f:
+        assert json.load(f)["files"][path]["chunks"] == 2
+
+
+def test_removed_files_lose_their_vectors_and_manifest_entry(library):
+    ingestor, documents, collection = library
+    write(documents, "sleep.pdf", "keep a regular bedtime")
+    removed = write(documents, "stress.pdf", "breathe slowly", "take a short walk")
+    ingestor.run()
+
+    (documents / "stress.pdf").unlink()
+    stats = ingestor.run()
+    assert (stats["removed"], stats["chunks_deleted"]) == (1, 2)
+    assert [document for document, _ in collection.rows.values()] == ["keep a regular bedtime"]
+    with open(ingestor.manifest_path) as f:
+        assert removed not in json.load(f)["files"]
+
+
+def test_interrupted_runs_reuse_stored_chunks(library, embeddings):
+    ingestor, documents, collection = library
+    write(documents, "sleep.pdf", "keep a regular bedtime")
+    ingestor.run()
+    # Chunks were stored but the run died before recording the file
+    with open(ingestor.manifest_path, "w") as f:
+        json.dump({"chunker": ingestor._chunker, "files": {}}, f)
+
+    embeddings.embedded.clear()
+    stats = ingestor.run()
+    assert (stats["ingested"], stats["chunks_reused"], stats["chunks_embedded"]) == (1, 1, 0)
+    assert embeddings.embedded == []
+
+
+def test_a_new_chunker_or_full_run_reparses_everything(library):
+    ingestor, documents, _ = library
+    write(documents, "sleep.pdf", "keep a regular bedtime")
+    ingestor.run()
+    assert ingestor.run(full=True)["ingested"] == 1
+
+    ingestor._chunker = "recursive:800:80"
+    assert ingestor.run()["ingested"] == 1
+    assert ingestor.run()["unchanged"] == 1
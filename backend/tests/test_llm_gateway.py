@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+
+import services.llm_gateway as gateway_module
+from services.llm_gateway import (
+    LLMGateway,
+    LLMOverloadedError,
+    PRIORITY_AUTHENTICATED,
+    PRIORITY_BACKGROUND,
+    PRIORITY_PUBLIC,
+    is_retryable
+)
+
+
+class UpstreamError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+class GatedModel:
+    """Answers with the prompt once the gate opens, recording the order calls started in."""
+
+    def __init__(self, failures=()):
+        self.gate = asyncio.Event()
+        self.started = []
+        self.failures = list(failures)
+
+    async def ainvoke(self, messages):
+        self.started.append(messages)
+        await self.gate.wait()
+        if self.failures:
+            raise self.failures.pop(0)
+        return messages
+
+    async def astream(self, messages):
+        self.started.append(messages)
+        yield "first"
+        if self.failures:
+            raise self.failures.pop(0)
+        yield "second"
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(gateway_module, "LLM_RETRY_BASE_SECONDS", 0.0)
+
+
+async def test_waiters_are_served_by_priority_then_arrival():
+    model = GatedModel()
+    gateway = LLMGateway(lambda: model, max_in_flight=1, max_queue=10)
+    running = asyncio.create_task(gateway.invoke("running"))
+    await asyncio.sleep(0)
+    waiting = [
+        asyncio.create_task(gateway.invoke(name, priority))
+        for name, priority in [
+            ("background", PRIORITY_BACKGROUND), ("public 1", PRIORITY_PUBLIC),
+            ("user", PRIORITY_AUTHENTICATED), ("public 2", PRIORITY_PUBLIC)
+        ]
+    ]
+    await asyncio.sleep(0)
+    assert gateway.stats()["queue_depth"] == 4
+
+    model.gate.set()
+    await asyncio.gather(running, *waiting)
+    assert model.started == ["running", "user", "public 1", "public 2", "background"]
+    assert gateway.in_flight == 0
+
+
+async def test_full_queue_rejects_and_waiters_time_out():
+    model = GatedModel()
+    gateway = LLMGateway(lambda: model, max_in_flight=1, max_queue=1, queue_timeout=0.05)
+    running = asyncio.create_task(gateway.invoke("running"))
+    await asyncio.sleep(0)
+    queued = asyncio.create_task(gateway.invoke("queued"))
+    await asyncio.sleep(0)
+
+    with pytest.raises(LLMOverloadedError, match="full"):
+        await gateway.invoke("rejected")
+    with pytest.raises(LLMOverloadedError, match="Timed out"):
+        await queued
+
+    model.gate.set()
+    assert await running == "running"
+    stats = gateway.stats()
+    assert (stats["rejected"], stats["timed_out"], stats["in_flight"], stats["queue_depth"]) == (1, 1, 0, 0)
+    # The abandoned waiter did not keep a slot
+    assert await gateway.invoke("after") == "after"
+
+
+async def test_retryable_errors_are_retried_and_others_raised():
+    model = GatedModel(failures=[UpstreamError(429), UpstreamError(503)])
+    model.gate.set()
+    gateway = LLMGateway(lambda: model, max_retries=2)
+    assert await gateway.invoke("prompt") == "prompt"
+    assert gateway.stats()["retries"] == 2
+
+    model.failures = [UpstreamError(400)]
+    with pytest.raises(UpstreamError):
+        await gateway.invoke("prompt")
+    assert gateway.stats()["failed"] == 1
+    assert gateway.in_flight == 0
+
+
+async def test_streams_are_not_retried_after_the_first_chunk():
+    model = GatedModel(failures=[UpstreamError(503)])
+    gateway = LLMGateway(lambda: model)
+    chunks = []
+    with pytest.raises(UpstreamError):
+        async for chunk in gateway.stream("prompt"):
+            chunks.append(chunk)
+    assert chunks == ["first"]
+    assert len(model.started) == 1
+    assert gateway.in_flight == 0
+
+
+@pytest.mark.parametrize("error, retryable", [
+    (UpstreamError(429), True), (UpstreamError(502), True), (UpstreamError(404), False),
+    (asyncio.TimeoutError(), True), (ValueError("bad prompt"), False)
+])
+def test_is_retryable(error, retryable):
+    assert is_retryable(error) is retryable
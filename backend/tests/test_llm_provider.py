@@ -0,0 +1,62 @@
+import pytest
+from langchain_core.messages import HumanMessage
+
+import services.llm_provider as llm_provider
+from services.fake_chat_model import FakeChatModel, FakeLLMError
+
+
+@pytest.fixture
+def no_shared_model(monkeypatch):
+    monkeypatch.setattr(llm_provider, "_chat_model", None)
+
+
+def test_one_model_is_shared_per_process(no_shared_model, monkeypatch):
+    monkeypatch.setenv("LLM_PROVIDER", "Fake")
+    monkeypatch.setenv("FAKE_LLM_RESPONSE_TOKENS", "7")
+    model = llm_provider.get_chat_model()
+    assert isinstance(model, FakeChatModel)
+    assert model.response_tokens == 7
+    assert llm_provider.get_chat_model() is model
+
+
+def test_unknown_providers_are_rejected(no_shared_model, monkeypatch):
+    monkeypatch.setenv("LLM_PROVIDER", "nope")
+    with pytest.raises(ValueError, match="Unknown LLM_PROVIDER"):
+        llm_provider.get_chat_model()
+
+
+def fake(**fields):
+    return FakeChatModel(latency_ms=0, latency_distribution="constant", token_latency_ms=0, **fields)
+
+
+async def test_fake_replies_are_deterministic_per_prompt():
+    model = fake(response_tokens=12)
+    first = await model.ainvoke([HumanMessage(content="I can't sleep")])
+    again = await model.ainvoke([HumanMessage(content="I can't sleep")])
+    other = await model.ainvoke([HumanMessage(content="Exams are stressing me out")])
+    assert first.content == again.content != other.content
+    assert len(first.content.split()) == 12
+
+    streamed = [chunk.content async for chunk in model.astream([HumanMessage(content="I can't sleep")])]
+    assert len(streamed) == 12
+    assert "".join(streamed) == first.content
+
+
+async def test_injected_errors_carry_their_status():
+    model = fake(error_rate=1.0, error_status_code=429)
+    with pytest.raises(FakeLLMError) as raised:
+        await model.ainvoke([HumanMessage(content="hi")])
+    assert raised.value.status_code == 429
+
+
+@pytest.mark.parametrize("distribution", ["uniform", "normal", "lognormal"])
+def test_sampled_latencies_center_on_the_mean(distribution):
+    model = FakeChatModel(latency_distribution=distribution, latency_ms=100, latency_jitter=0.2, seed=7)
+    samples = [model.sample_latency() for _ in range(2000)]
+    assert min(samples) >= 0
+    assert sum(samples) / len(samples) == pytest.approx(0.1, rel=0.05)
+
+
+def test_unknown_latency_distributions_are_rejected():
+    with pytest.raises(ValueError):
+        FakeChatModel(latency_distribution="bimodal")
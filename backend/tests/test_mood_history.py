@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+import main
+from services.mood_service import MoodService
+
+BATCH_TIME = datetime(2026, 3, 1, 12, 0, 0)
+
+
+@pytest.fixture
+async def history(db):
+    """Seven entries, five of them synced in one batch with the same timestamp."""
+    user_id = ObjectId()
+    timestamps = [BATCH_TIME - timedelta(hours=1)] + [BATCH_TIME] * 5 + [BATCH_TIME + timedelta(hours=1)]
+    for index, timestamp in enumerate(timestamps):
+        await db.mood_history.insert_one({"user_id": user_id, "mood": f"mood{index}", "note": "", "timestamp": timestamp})
+    await db.mood_history.insert_one({"user_id": ObjectId(), "mood": "other", "note": "", "timestamp": BATCH_TIME})
+    return str(user_id)
+
+
+def newest_first(entries):
+    return sorted(entries, key=lambda entry: (entry["timestamp"], entry["_id"]), reverse=True)
+
+
+async def test_paging_backwards_through_shared_timestamps_visits_every_entry_once(history):
+    service = MoodService()
+    expected = await service.get_mood_history(history, limit=100)
+    assert len(expected) == 7
+    assert expected == newest_first(expected)
+
+    seen, before, before_id = [], None, None
+    while True:
+        page = await service.get_mood_history(history, limit=2, before=before, before_id=before_id)
+        seen.extend(page)
+        if len(page) < 2:
+            break
+        before, before_id = datetime.fromisoformat(page[-1]["timestamp"]), page[-1]["_id"]
+    assert [entry["_id"] for entry in seen] == [entry["_id"] for entry in expected]
+
+
+async def test_paging_forwards_returns_newer_entries_newest_first(history):
+    service = MoodService()
+    everything = await service.get_mood_history(history, limit=100)
+    oldest = everything[-1]
+
+    page = await service.get_mood_history(
+        history, limit=3, after=datetime.fromisoformat(oldest["timestamp"]), after_id=oldest["_id"]
+    )
+    assert [entry["_id"] for entry in page] == [entry["_id"] for entry in everything[-4:-1]]
+
+
+async def test_timestamp_only_cursor_still_skips_the_whole_batch(history):
+    page = await MoodService().get_mood_history(history, limit=10, before=BATCH_TIME)
+    assert [entry["mood"] for entry in page] == ["mood0"]
+
+
+async def test_history_endpoint_advertises_the_compound_cursor(db, make_user, client, monkeypatch):
+    user_id, token = await make_user()
+    for _ in range(3):
+        await db.mood_history.insert_one({"user_id": user_id, "mood": "calm", "note": "", "timestamp": BATCH_TIME})
+    monkeypatch.setattr(main, "mood_service", MoodService())
+    headers = {"Authorization": f"Bearer {token}"}
+
+    first = await client.get("/mood/history", params={"limit": 2}, headers=headers)
+    assert first.status_code == 200
+    assert first.headers["X-Next-Before-Id"] == first.json()[-1]["_id"]
+
+    second = await client.get("/mood/history", headers=headers, params={
+        "limit": 2,
+        "before": first.headers["X-Next-Before"],
+        "before_id": first.headers["X-Next-Before-Id"]
+    })
+    assert len(second.json()) == 1
+    assert "X-Next-Before" not in second.headers
+    ids = {entry["_id"] for entry in first.json() + second.json()}
+    assert len(ids) == 3
+
+    rejected = await client.get("/mood/history", params={"before_id": "not-an-id"}, headers=headers)
+    assert rejected.status_code == 422
@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from services.mood_service import MoodService
+
+TODAY = datetime(2026, 3, 10)
+
+
+class CannedAggregation:
+    """Stands in for the server-side $facet pipeline, which mongomock cannot run."""
+
+    def __init__(self, facets):
+        self.facets = facets
+        self.pipelines = []
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        return self
+
+    async def to_list(self, length):
+        return [self.facets]
+
+    async def insert_one(self, document):
+        return type("InsertResult", (), {"inserted_id": ObjectId()})()
+
+
+class CannedDatabase:
+    def __init__(self, db, facets):
+        self.mood_history = CannedAggregation(facets)
+        self.mood_daily = db.mood_daily
+
+
+def facets(last_day):
+    return {
+        "distribution": [{"_id": "happy", "count": 3}, {"_id": "sad", "count": 1}],
+        "daily": [{"_id": TODAY - timedelta(days=1), "entries": 2, "moods": {"happy": 2}}],
+        "weekly": [{"_id": TODAY - timedelta(days=7), "entries": 4, "moods": {"happy": 3, "sad": 1}}],
+        "streaks": [
+            {"_id": last_day, "start": last_day - timedelta(days=1), "end": last_day, "days": 2, "today": TODAY},
+            {"_id": TODAY, "start": TODAY - timedelta(days=9), "end": TODAY - timedelta(days=6), "days": 4, "today": TODAY}
+        ]
+    }
+
+
+async def test_insights_are_shaped_from_one_aggregation(db):
+    service = MoodService()
+    service.db = CannedDatabase(db, facets(last_day=TODAY - timedelta(days=1)))
+    insights = await service.get_mood_insights(str(ObjectId()), timezone="Europe/Berlin")
+
+    pipeline, = service.db.mood_history.pipelines
+    assert [next(iter(stage)) for stage in pipeline] == ["$match", "$facet"]
+    assert insights["total_entries"] == 4
+    assert insights["most_common_mood"] == "happy"
+    assert insights["mood_distribution"] == {"happy": 3, "sad": 1}
+    assert insights["mood_trend"] == [{"date": "2026-03-09T00:00:00", "entries": 2, "moods": {"happy": 2}}]
+    assert insights["streaks"] == {"current": 2, "longest": 4, "last_entry_day": "2026-03-09T00:00:00"}
+
+
+async def test_streak_older_than_yesterday_is_not_current(db):
+    service = MoodService()
+    service.db = CannedDatabase(db, facets(last_day=TODAY - timedelta(days=2)))
+    insights = await service.get_mood_insights(str(ObjectId()))
+    assert insights["streaks"]["current"] == 0
+
+
+async def test_empty_history_has_only_a_total(db):
+    service = MoodService()
+    service.db = CannedDatabase(db, {"distribution": [], "daily": [], "weekly": [], "streaks": []})
+    assert await service.get_mood_insights(str(ObjectId())) == {"total_entries": 0}
+
+
+async def test_insights_are_cached_per_range_until_a_new_entry(db):
+    user_id = str(ObjectId())
+    service = MoodService()
+    service.db = CannedDatabase(db, facets(last_day=TODAY))
+    aggregations = service.db.mood_history.pipelines
+
+    await service.get_mood_insights(user_id)
+    await service.get_mood_insights(user_id)
+    assert len(aggregations) == 1
+
+    await service.get_mood_insights(user_id, start=TODAY - timedelta(days=7))
+    assert len(aggregations) == 2
+
+    await service.save_mood_entry(user_id, {"mood": "calm"})
+    await service.get_mood_insights(user_id)
+    assert len(aggregations) == 3
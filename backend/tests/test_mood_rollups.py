@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+
+import main
+from services.mood_service import MoodService, rollup_day, rollup_key
+
+
+def test_rollup_day_is_utc_midnight():
+    berlin = timezone(timedelta(hours=1))
+    assert rollup_day(datetime(2026, 3, 2, 0, 30, tzinfo=berlin)) == datetime(2026, 3, 1)
+    assert rollup_day(datetime(2026, 3, 2, 23, 59, 59)) == datetime(2026, 3, 2)
+
+
+@pytest.mark.parametrize("mood, key", [("happy", "happy"), ("so.so", "so_so"), ("$set", "set"), ("$", "unknown")])
+def test_rollup_key_is_a_safe_field_name(mood, key):
+    assert rollup_key(mood) == key
+
+
+async def test_saving_entries_folds_them_into_one_rollup_per_day(db):
+    user_id = str(ObjectId())
+    service = MoodService()
+    for mood in ("happy", "happy", "so.so"):
+        await service.save_mood_entry(user_id, {"mood": mood})
+
+    rollup, = await db.mood_daily.find({"user_id": ObjectId(user_id)}).to_list(None)
+    assert rollup["day"] == rollup_day(datetime.utcnow())
+    assert rollup["entries"] == 3
+    assert rollup["counts"] == {"happy": 2, "so_so": 1}
+    assert rollup["first_timestamp"] <= rollup["last_timestamp"]
+    assert await db.mood_history.count_documents({"user_id": ObjectId(user_id)}) == 3
+
+
+async def test_daily_rollups_are_read_oldest_first_within_the_range(db):
+    user_id = ObjectId()
+    for days_ago in (40, 2, 1):
+        day = rollup_day(datetime.utcnow() - timedelta(days=days_ago))
+        await db.mood_daily.insert_one({
+            "user_id": user_id, "day": day, "entries": 1, "counts": {"calm": 1},
+            "first_timestamp": day, "last_timestamp": day
+        })
+
+    days = await MoodService().get_daily_rollups(str(user_id), start=datetime.utcnow() - timedelta(days=30))
+    assert [entry["day"] for entry in days] == [
+        (datetime.utcnow() - timedelta(days=offset)).date().isoformat() for offset in (2, 1)
+    ]
+    assert set(days[0]) == {"day", "entries", "counts", "first_timestamp", "last_timestamp"}
+
+
+async def test_mood_endpoint_rejects_non_string_moods_before_saving(db, make_user, client, monkeypatch):
+    user_id, token = await make_user()
+    monkeypatch.setattr(main, "mood_service", MoodService())
+    headers = {"Authorization": f"Bearer {token}"}
+
+    rejected = await client.post("/mood", json={"mood": ["happy"]}, headers=headers)
+    assert rejected.status_code == 400
+    assert await db.mood_history.count_documents({}) == 0
+    assert await db.mood_daily.count_documents({}) == 0
+
+    saved = await client.post("/mood", json={"mood": "happy"}, headers=headers)
+    assert saved.status_code == 200
+    daily = await client.get("/mood/daily", headers=headers)
+    assert daily.json()["days"][0]["counts"] == {"happy": 1}
@@ -0,0 +1,78 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from services.password_hasher import PasswordHasher
+
+
+def make_hasher(**limits):
+    return PasswordHasher(CryptContext(schemes=["bcrypt"]), **limits)
+
+
+class Slow:
+    """A blocking job that records how many copies run at once."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.running = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, value):
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(self.seconds)
+        with self._lock:
+            self.running -= 1
+        return value
+
+
+async def test_hash_and_verify_round_trip():
+    hasher = make_hasher()
+    hashed = await hasher.hash("correct horse")
+    assert await hasher.verify("correct horse", hashed)
+    assert not await hasher.verify("wrong horse", hashed)
+
+
+async def test_at_most_max_workers_jobs_run_at_once():
+    hasher = make_hasher(max_workers=2, max_wait=5)
+    job = Slow(0.02)
+    assert await asyncio.gather(*[hasher._run(job, i) for i in range(6)]) == list(range(6))
+    assert job.peak == 2
+    assert hasher.stats()["completed"] == 6
+
+
+async def test_full_queue_is_rejected_with_503():
+    # Callers count as queued until their acquire completes, the first one included
+    hasher = make_hasher(max_workers=1, max_queue=2, max_wait=5)
+    job = Slow(0.05)
+    results = await asyncio.gather(*[hasher._run(job, i) for i in range(3)], return_exceptions=True)
+    rejected = [result for result in results if isinstance(result, HTTPException)]
+    assert [error.status_code for error in rejected] == [503]
+    assert hasher.rejected == 1
+
+
+async def test_timed_out_waiters_do_not_leak_slots():
+    hasher = make_hasher(max_workers=1, max_wait=0.01)
+    job = Slow(0.05)
+    results = await asyncio.gather(*[hasher._run(job, i) for i in range(4)], return_exceptions=True)
+    assert results[0] == 0
+    assert all(isinstance(result, HTTPException) for result in results[1:])
+    await asyncio.sleep(0)
+    assert hasher._slots._value == 1
+
+
+async def test_slot_granted_as_the_wait_is_abandoned_is_handed_back():
+    hasher = make_hasher(max_workers=1)
+    acquire = asyncio.ensure_future(hasher._slots.acquire())
+    await asyncio.sleep(0)
+    assert acquire.done() and hasher._slots.locked()
+
+    hasher._abandon(acquire)
+    await asyncio.sleep(0)
+    assert not hasher._slots.locked()
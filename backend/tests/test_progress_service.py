@@ -0,0 +1,92 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from services.progress_service import ProgressService
+
+
+@pytest.fixture
+def progress(db):
+    return ProgressService()
+
+
+def entry(user_id, duration, timestamp, category="meditation"):
+    return {"user_id": str(user_id), "type": "meditation", "category": category, "duration": duration, "timestamp": timestamp}
+
+
+async def test_saving_progress_increments_the_category_counters(progress, db):
+    user_id = ObjectId()
+    await progress.save_progress(entry(user_id, 10, "2024-03-02T08:00:00Z"))
+    await progress.save_progress(entry(user_id, 15, "2024-03-01T08:00:00Z"))
+    await progress.save_progress(entry(user_id, 5, "2024-03-01T09:00:00Z", category="sleep-hygiene"))
+
+    counters = await db.category_progress.find_one({"user_id": user_id, "category": "meditation"})
+    assert counters["total_sessions"] == 2
+    assert counters["total_minutes"] == 25
+    # An older entry arriving late does not move last_session back
+    assert counters["last_session"] == datetime(2024, 3, 2, 8)
+    assert await db.category_progress.count_documents({"user_id": user_id}) == 2
+
+
+async def test_rebuild_replaces_drifted_counters_with_totals_from_progress(progress, db):
+    user_id = ObjectId()
+    await progress.save_progress(entry(user_id, 10, "2024-03-01T08:00:00Z"))
+    await progress.save_progress(entry(user_id, 20, "2024-03-02T08:00:00Z"))
+    await db.category_progress.update_one(
+        {"user_id": user_id, "category": "meditation"},
+        {"$set": {"total_sessions": 7, "total_minutes": 1}}
+    )
+    # An entry written without going through save_progress has no counters yet
+    await db.progress.insert_one({
+        "user_id": user_id, "type": "exercise", "category": "stress-relief",
+        "duration": 5, "timestamp": datetime(2024, 3, 3)
+    })
+
+    stats = await progress.rebuild_category_progress(str(user_id), batch_size=1)
+    assert stats == {"groups": 2, "upserted": 1, "modified": 1}
+    meditation = await db.category_progress.find_one({"user_id": user_id, "category": "meditation"})
+    assert (meditation["total_sessions"], meditation["total_minutes"]) == (2, 30)
+    stress = await db.category_progress.find_one({"user_id": user_id, "category": "stress-relief"})
+    assert (stress["total_sessions"], stress["last_session"]) == (1, datetime(2024, 3, 3))
+
+
+async def test_rebuild_for_one_user_leaves_others_alone(progress, db):
+    user_id, other_id = ObjectId(), ObjectId()
+    await progress.save_progress(entry(user_id, 10, "2024-03-01T08:00:00Z"))
+    await progress.save_progress(entry(other_id, 10, "2024-03-01T08:00:00Z"))
+    await db.category_progress.update_many({}, {"$set": {"total_sessions": 9}})
+
+    await progress.rebuild_category_progress(str(user_id))
+    assert (await db.category_progress.find_one({"user_id": user_id}))["total_sessions"] == 1
+    assert (await db.category_progress.find_one({"user_id": other_id}))["total_sessions"] == 9
+
+
+async def test_category_read_uses_the_counters(progress, db):
+    user_id = ObjectId()
+    await db.category_progress.insert_one({
+        "user_id": user_id, "category": "meditation",
+        "total_sessions": 3, "total_minutes": 45, "last_session": datetime(2024, 3, 1)
+    })
+    assert await progress.get_progress_by_category(str(user_id), "meditation") == {
+        "total_sessions": 3, "total_minutes": 45, "last_session": datetime(2024, 3, 1)
+    }
+
+
+async def test_category_read_without_counters_aggregates_and_writes_nothing(progress, db):
+    user_id = ObjectId()
+    await db.progress.insert_many([
+        {"user_id": user_id, "category": "meditation", "duration": 10, "timestamp": datetime(2024, 3, 1)},
+        {"user_id": user_id, "category": "meditation", "duration": 20, "timestamp": datetime(2024, 3, 2)},
+    ])
+    assert await progress.get_progress_by_category(str(user_id), "meditation") == {
+        "total_sessions": 2, "total_minutes": 30, "last_session": datetime(2024, 3, 2)
+    }
+    assert await db.category_progress.count_documents({}) == 0
+
+
+async def test_category_read_for_unknown_or_invalid_users_is_empty(progress, db):
+    empty = {"total_sessions": 0, "total_minutes": 0, "last_session": None}
+    assert await progress.get_progress_by_category(str(ObjectId()), "meditation") == empty
+    assert await progress.get_progress_by_category("not-an-id", "meditation") == empty
+    assert await db.category_progress.count_documents({}) == 0
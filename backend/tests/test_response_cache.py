@@ -0,0 +1,51 @@
+from services.response_cache import ResponseCache, normalize_message
+
+
+def test_normalization_ignores_case_spacing_and_punctuation():
+    assert normalize_message("  How do I   sleep better?! ") == "how do i sleep better"
+
+
+async def test_exact_hits_skip_the_embedding_model(embeddings):
+    cache = ResponseCache(semantic=False)
+    cached, context = await cache.lookup("How can I relax?")
+    assert cached is None
+    cache.store(context, "Try slow breathing.")
+
+    cached, context = await cache.lookup("how can i relax")
+    assert (cached, context) == ("Try slow breathing.", None)
+    assert embeddings.embedded == []
+    assert cache.stats()["exact_hits"] == 1
+
+
+async def test_similar_questions_reuse_an_answer_above_the_threshold(embeddings):
+    cache = ResponseCache(threshold=0.8)
+    _, context = await cache.lookup("tips to sleep better at night")
+    cache.store(context, "Keep a regular bedtime.")
+
+    cached, _ = await cache.lookup("tips to sleep better at night please")
+    assert cached == "Keep a regular bedtime."
+    cached, context = await cache.lookup("what is a panic attack")
+    assert cached is None and context is not None
+
+    stats = cache.stats()
+    assert (stats["exact_hits"], stats["semantic_hits"], stats["misses"]) == (0, 1, 2)
+    # The semantic hit is promoted to the exact layer
+    assert await cache.lookup("Tips to sleep better at night, please!") == ("Keep a regular bedtime.", None)
+
+
+async def test_crisis_messages_are_never_cached_or_served(embeddings):
+    cache = ResponseCache()
+    _, context = await cache.lookup("I want to die")
+    assert context is None
+    cache.store(context, "generic answer")
+    assert await cache.lookup("I want to die") == (None, None)
+    assert cache.stats()["bypassed"] == 2
+    assert embeddings.embedded == []
+
+
+async def test_semantic_entries_expire_with_the_ttl(embeddings):
+    cache = ResponseCache(ttl=0.0, threshold=0.8)
+    _, context = await cache.lookup("how to focus when studying")
+    cache.store(context, "Work in short blocks.")
+    assert len(cache.semantic) == 0
+    assert (await cache.lookup("how to focus when studying today"))[0] is None
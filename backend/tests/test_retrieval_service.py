@@ -0,0 +1,100 @@
+import time
+
+import numpy as np
+import pytest
+from bson import ObjectId
+
+import services.retrieval_service as retrieval_module
+from services.chat_service import ChatService
+from services.context_builder import count_tokens
+from services.fake_chat_model import FakeChatModel
+from services.retrieval_service import RetrievalService
+from services.vector_index import NumpyBackend
+
+PASSAGES = [
+    "slow deep breathing calms anxiety before exams",
+    "a regular bedtime helps you sleep better",
+    "talk to a trusted adult when you feel unsafe",
+]
+
+
+class CountingBackend(NumpyBackend):
+    def __init__(self, *args, delay=0.0):
+        super().__init__(*args)
+        self.searches = 0
+        self.delay = delay
+
+    def search_batch(self, queries, k):
+        self.searches += 1
+        time.sleep(self.delay)
+        return super().search_batch(queries, k)
+
+
+@pytest.fixture
+def retrieval(embeddings, monkeypatch):
+    # The store never changes during a test
+    monkeypatch.setattr(retrieval_module, "RETRIEVAL_REFRESH_SECONDS", 3600.0)
+    vectors = np.asarray(embeddings.embed_documents(PASSAGES), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    service = RetrievalService(top_k=1, use_mmr=False, timeout=1.0, enabled=True)
+    service.backend = CountingBackend(vectors, [f"chunk-{i}" for i in range(len(PASSAGES))], PASSAGES)
+    service._checked_at = time.monotonic()
+    return service
+
+
+async def test_retrieve_returns_the_closest_passage_and_caches_it(retrieval):
+    assert await retrieval.retrieve("how do I sleep better") == [PASSAGES[1]]
+    assert await retrieval.retrieve("how do I sleep better") == [PASSAGES[1]]
+    assert retrieval.backend.searches == 1
+    assert retrieval.stats()["cache"]["hits"] == 1
+
+    retrieval.invalidate()
+    await retrieval.retrieve("how do I sleep better")
+    assert retrieval.backend.searches == 2
+
+
+async def test_passages_beyond_the_token_budget_are_dropped(retrieval):
+    retrieval.top_k = 3
+    retrieval.token_budget = count_tokens(PASSAGES[0])
+    passages = await retrieval.retrieve("breathing before exams")
+    assert passages == [PASSAGES[0]]
+
+
+async def test_slow_searches_give_up_without_context(retrieval):
+    retrieval.backend.delay = 0.2
+    retrieval.timeout = 0.01
+    assert await retrieval.retrieve("anything") == []
+    assert retrieval.timed_out == 1
+
+
+async def test_unloaded_retrieval_returns_nothing():
+    assert await RetrievalService(enabled=False).retrieve("anything") == []
+
+
+async def test_chat_prompt_includes_retrieved_passages(retrieval, db):
+    model = FakeChatModel(latency_ms=0, latency_distribution="constant", token_latency_ms=0, response_tokens=3)
+    chat = ChatService(chat_model=model, retrieval=retrieval)
+    messages, _ = await chat._build_messages(str(ObjectId()), "I am anxious about exams and breathing")
+    assert PASSAGES[0] in messages[0].content
+
+
+async def test_cached_results_are_dropped_when_ingestion_changes_the_store(retrieval, monkeypatch):
+    class Store:
+        collection = None
+
+        def load(self, backend):
+            return retrieval.backend
+
+    signature = ["v1"]
+    monkeypatch.setattr(retrieval_module, "store_signature", lambda directory, collection: signature[0])
+    monkeypatch.setattr(retrieval_module, "RETRIEVAL_REFRESH_SECONDS", 0.0)
+    retrieval.store = Store()
+    retrieval._signature = "v1"
+
+    await retrieval.retrieve("how do I sleep better")
+    await retrieval.retrieve("how do I sleep better")
+    assert (retrieval.backend.searches, retrieval.invalidations) == (1, 0)
+
+    signature[0] = "v2"
+    await retrieval.retrieve("how do I sleep better")
+    assert (retrieval.backend.searches, retrieval.invalidations) == (2, 1)
@@ -0,0 +1,73 @@
+import pytest
+from bson import ObjectId
+
+import main
+import services.sync_service as sync_module
+from indexes import INDEXES
+from services.sync_service import SyncService
+
+USER_ID = str(ObjectId())
+
+
+@pytest.fixture
+async def sync(db):
+    for collection in ("mood_history", "progress", "exercises", "achievements"):
+        await db[collection].create_indexes(INDEXES[collection])
+    return SyncService()
+
+
+def event(key, type_, **data):
+    return {"key": key, "type": type_, "data": data}
+
+
+BATCH = [
+    event("m1", "mood", mood="happy", timestamp="2026-03-01T08:00:00Z"),
+    event("m2", "mood", mood="calm", timestamp="2026-03-01T20:00:00Z"),
+    event("p1", "progress", type="meditation", category="meditation", duration=15, timestamp="2026-03-01T09:00:00Z"),
+    event("e1", "exercise", _id="exercise-1", name="Body scan", category="meditation", duration=15),
+    event("bad", "mood", mood=""),
+]
+
+
+async def test_a_batch_is_applied_once_and_replays_are_duplicates(sync, db):
+    first = await sync.sync(USER_ID, BATCH)
+    assert [result["status"] for result in first["results"]] == ["created"] * 4 + ["invalid"]
+    assert [award["rule_id"] for award in first["achievements"]] == ["meditation-beginner"]
+
+    rollup = await db.mood_daily.find_one({"user_id": ObjectId(USER_ID)})
+    assert (rollup["entries"], rollup["counts"]) == (2, {"happy": 1, "calm": 1})
+    progress = await db.category_progress.find_one({"user_id": ObjectId(USER_ID), "category": "meditation"})
+    assert progress["total_minutes"] == 15
+
+    replay = await sync.sync(USER_ID, BATCH)
+    assert [result["status"] for result in replay["results"]] == ["duplicate"] * 4 + ["invalid"]
+    assert replay["achievements"] == []
+    assert await db.mood_history.count_documents({}) == 2
+    rollup = await db.mood_daily.find_one({"user_id": ObjectId(USER_ID)})
+    assert rollup["entries"] == 2
+
+
+async def test_exercises_created_offline_can_be_completed_later(sync, db):
+    started = await sync.sync(USER_ID, [event("e1", "exercise", _id="exercise-1", name="Body scan", completed=False)])
+    assert started["results"][0]["status"] == "created" and started["achievements"] == []
+
+    finished = await sync.sync(USER_ID, [event("e2", "exercise", _id="exercise-1", name="Body scan", duration=5)])
+    assert finished["results"][0]["status"] == "updated"
+    assert [award["rule_id"] for award in finished["achievements"]] == ["meditation-beginner"]
+    assert (await db.exercises.find_one({"_id": "exercise-1"}))["completed"] is True
+
+
+async def test_another_users_exercise_id_is_invalid(sync, db):
+    await sync.sync(USER_ID, [event("e1", "exercise", _id="exercise-1", name="Body scan")])
+    taken = await sync.sync(str(ObjectId()), [event("e1", "exercise", _id="exercise-1", name="Mine now")])
+    assert taken["results"][0]["status"] == "invalid"
+    assert (await db.exercises.find_one({"_id": "exercise-1"}))["name"] == "Body scan"
+
+
+async def test_oversized_batches_are_rejected_with_413(sync, make_user, client, monkeypatch):
+    monkeypatch.setattr(sync_module, "SYNC_MAX_EVENTS", 2)
+    monkeypatch.setattr(main, "sync_service", sync)
+    _, token = await make_user()
+    events = [event(f"m{index}", "mood", mood="happy") for index in range(3)]
+    response = await client.post("/sync", json=events, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 413
@@ -0,0 +1,48 @@
+from bson import ObjectId
+
+from services.sync_service import SyncService
+
+USER_ID = str(ObjectId())
+
+
+def validate(events):
+    # _validate only builds documents, so no database is needed
+    return SyncService.__new__(SyncService)._validate(USER_ID, events)
+
+
+def mood(key, mood="happy"):
+    return {"key": key, "type": "mood", "data": {"mood": mood, "timestamp": "2024-03-01T12:30:00Z"}}
+
+
+def test_repeated_key_in_one_batch_is_a_duplicate_and_built_once():
+    results, pending = validate([mood("a"), mood("b"), mood("a", "sad")])
+    assert [result.get("status") for result in results] == [None, None, "duplicate"]
+    assert [position for position, _ in pending["mood_history"]] == [0, 1]
+    assert pending["mood_history"][0][1]["mood"] == "happy"
+
+
+def test_key_is_shared_across_event_types():
+    exercise = {"key": "a", "type": "exercise", "data": {"name": "Breathing", "duration": 5}}
+    results, pending = validate([mood("a"), exercise])
+    assert results[1]["status"] == "duplicate"
+    assert "exercises" not in pending
+
+
+def test_invalid_event_does_not_claim_its_key():
+    broken = {"key": "a", "type": "mood", "data": {"mood": ""}}
+    results, pending = validate([broken, mood("a")])
+    assert results[0]["status"] == "invalid"
+    assert "status" not in results[1]
+    assert [position for position, _ in pending["mood_history"]] == [1]
+
+
+def test_malformed_events_are_invalid():
+    results, pending = validate([
+        {"key": "", "type": "mood", "data": {"mood": "happy"}},
+        {"key": "b", "type": "diary", "data": {}},
+        {"key": "c", "type": "mood", "data": "happy"},
+        {"key": "d", "type": "mood", "data": {"mood": "happy", "timestamp": "yesterday"}},
+        "not an event"
+    ])
+    assert [result["status"] for result in results] == ["invalid"] * 5
+    assert pending == {}
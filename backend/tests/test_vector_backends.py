@@ -0,0 +1,85 @@
+import sys
+
+import numpy as np
+import pytest
+
+from services.vector_index import HNSWBackend, LocalIndexStore, NumpyBackend, VectorBackend
+
+
+class MemoryCollection:
+    """The slice of the Chroma collection API the index export reads."""
+
+    def __init__(self, vectors):
+        self.ids = [f"chunk-{index}" for index in range(len(vectors))]
+        self.vectors = [list(map(float, vector)) for vector in vectors]
+        self.reads = 0
+
+    def count(self):
+        return len(self.ids)
+
+    def get(self, include=None):
+        self.reads += 1
+        return {"ids": list(self.ids), "embeddings": list(self.vectors), "documents": [f"text of {id_}" for id_ in self.ids]}
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(7).normal(size=(200, 16)).astype(np.float32)
+
+
+def exact_top(vectors, query, k):
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return [f"chunk-{index}" for index in np.argsort(-(unit @ (query / np.linalg.norm(query))))[:k]]
+
+
+def test_numpy_backend_matches_brute_force(tmp_path, vectors):
+    backend = LocalIndexStore(str(tmp_path), MemoryCollection(vectors)).load("numpy")
+    assert isinstance(backend, NumpyBackend) and len(backend) == 200
+    query = vectors[3] + 0.1
+    results = backend.search(query, 5)
+    assert [id_ for id_, _, _ in results] == exact_top(vectors, query, 5)
+    assert results[0][1] == "text of chunk-3"
+
+    ranked, candidate_vectors = backend.search_with_vectors(query, 5)
+    assert candidate_vectors.shape == (5, 16)
+    assert [round(score, 4) for _, _, score in ranked] == [
+        round(float(candidate @ (query / np.linalg.norm(query))), 4) for candidate in candidate_vectors
+    ]
+
+
+def test_hnsw_backend_finds_the_nearest_neighbours(tmp_path, vectors):
+    store = LocalIndexStore(str(tmp_path), MemoryCollection(vectors))
+    backend = store.load("hnsw")
+    assert isinstance(backend, HNSWBackend)
+    query = vectors[42]
+    assert [id_ for id_, _, _ in backend.search(query, 3)] == exact_top(vectors, query, 3)
+    # The graph is saved with the export and loaded on the next start
+    assert (tmp_path / "local_index" / "hnsw.bin").exists()
+    assert [id_ for id_, _, _ in store.load("hnsw").search(query, 3)] == exact_top(vectors, query, 3)
+
+
+def test_hnsw_falls_back_to_numpy_without_hnswlib(tmp_path, vectors, monkeypatch):
+    monkeypatch.setitem(sys.modules, "hnswlib", None)
+    assert isinstance(LocalIndexStore(str(tmp_path), MemoryCollection(vectors)).load("hnsw"), NumpyBackend)
+
+
+def test_export_is_reused_until_the_store_changes(tmp_path, vectors):
+    collection = MemoryCollection(vectors)
+    LocalIndexStore(str(tmp_path), collection).load("numpy")
+    LocalIndexStore(str(tmp_path), collection).load("numpy")
+    assert collection.reads == 1
+
+    collection.ids.append("chunk-new")
+    collection.vectors.append([1.0] * 16)
+    assert len(LocalIndexStore(str(tmp_path), collection).load("numpy")) == 201
+    assert collection.reads == 2
+
+
+def test_unknown_backends_are_rejected(tmp_path, vectors):
+    with pytest.raises(ValueError, match="Unknown vector backend"):
+        LocalIndexStore(str(tmp_path), MemoryCollection(vectors)).load("faiss")
+
+
+def test_backends_must_implement_search():
+    with pytest.raises(TypeError):
+        VectorBackend()
@@ -0,0 +1,37 @@
+import numpy as np
+
+from services.vector_index import NumpyBackend, mmr
+
+
+def unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+QUERY = unit(1, 0.2, 0)
+CANDIDATES = [
+    unit(1, 0, 0),      # relevant, near-duplicate of the next one
+    unit(1, 0.05, 0),   # most relevant
+    unit(0.7, 0, 0.7),  # partly relevant
+    unit(0, 1, 0),      # barely relevant, unlike the others
+]
+
+
+def test_mmr_prefers_diverse_candidates_over_near_duplicates():
+    assert mmr(QUERY, CANDIDATES, 3) == [1, 3, 2]
+
+
+def test_mmr_without_diversity_is_relevance_order():
+    assert mmr(QUERY, CANDIDATES, 3, lambda_mult=1.0) == [1, 0, 2]
+
+
+def test_mmr_returns_each_candidate_at_most_once():
+    assert sorted(mmr(QUERY, CANDIDATES, 10)) == [0, 1, 2, 3]
+    assert mmr(QUERY, [], 3) == []
+    assert mmr(QUERY, CANDIDATES, 0) == []
+
+
+def test_empty_numpy_backend_returns_no_results():
+    backend = NumpyBackend(np.zeros((0, 0), dtype=np.float32), [], [])
+    assert backend.search(QUERY, 5) == []
+    assert backend.search_batch(np.stack([QUERY, QUERY]), 5) == [[], []]
@@ -0,0 +1,41 @@
+import asyncio
+import time
+
+import pytest
+
+import services.warmup as warmup_module
+from services.warmup import WarmUp
+
+
+async def test_warmup_runs_stages_in_order_and_survives_failures():
+    ran = []
+
+    def broken():
+        ran.append("broken")
+        raise RuntimeError("model download failed")
+
+    warmup = WarmUp([("first", lambda: ran.append("first")), ("broken", broken), ("last", lambda: ran.append("last"))])
+    warmup.start()
+    assert warmup.status in ("pending", "running")
+    await warmup._task
+
+    stats = warmup.stats()
+    assert ran == ["first", "broken", "last"]
+    assert stats["status"] == "done"
+    assert stats["errors"] == {"broken": "model download failed"}
+    assert set(stats["stage_seconds"]) == {"first", "broken", "last"}
+
+
+async def test_warmup_can_be_disabled_or_cancelled(monkeypatch):
+    monkeypatch.setattr(warmup_module, "WARMUP_ENABLED", False)
+    disabled = WarmUp([("never", lambda: pytest.fail("stage ran"))])
+    disabled.start()
+    assert disabled.status == "disabled"
+    await disabled.cancel()
+
+    monkeypatch.setattr(warmup_module, "WARMUP_ENABLED", True)
+    slow = WarmUp([("slow", lambda: time.sleep(0.05)), ("after", lambda: pytest.fail("stage ran"))])
+    slow.start()
+    await asyncio.sleep(0)
+    await slow.cancel()
+    assert slow._task.cancelled()